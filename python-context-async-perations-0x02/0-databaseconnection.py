@@ -1,5 +1,7 @@
 import sqlite3
 
+from connection_pool import get_pool
+
 
 class DatabaseConnection:
     """Class-based context manager for database connections"""
@@ -42,6 +44,54 @@ class DatabaseConnection:
         return False
 
 
+class PooledDatabaseConnection:
+    """DatabaseConnection that borrows a warm connection from a pool"""
+
+    def __init__(self, database, pool=None, timeout=None):
+        """
+        Initialize the context manager with database path
+
+        Args:
+            database: Path to the SQLite database file
+            pool: SQLitePool to borrow from (defaults to the shared pool
+                for database)
+            timeout: Seconds to wait for a free connection (defaults to
+                the pool's checkout_timeout)
+        """
+        self.database = database
+        self.pool = pool if pool is not None else get_pool(database)
+        self.timeout = timeout
+        self.connection = None
+
+    def __enter__(self):
+        """
+        Check out a pooled connection when entering the context
+
+        Returns:
+            connection: The database connection object
+
+        Raises:
+            PoolTimeoutError: If no connection became free in time
+        """
+        self.connection = self.pool.acquire(self.timeout)
+        return self.connection
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """
+        Return the connection to the pool when exiting the context
+
+        Uncommitted work is rolled back, as closing the connection would
+        have discarded it.
+
+        Returns:
+            False to propagate exceptions (if any)
+        """
+        if self.connection:
+            self.pool.release(self.connection)
+            self.connection = None
+        return False
+
+
 if __name__ == "__main__":
     # Use the context manager to perform a query
     with DatabaseConnection('users.db') as conn:
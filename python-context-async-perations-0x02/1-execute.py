@@ -1,10 +1,52 @@
 import sqlite3
+import keyword
+from collections import namedtuple
+from dataclasses import make_dataclass
+
+from columnar import fetch_columnar, iter_columnar
+
+
+def _field_names(description):
+    """Column names usable as Python identifiers (others become col0, col1, ...)"""
+    names = []
+    for index, column in enumerate(description):
+        name = column[0]
+        if not name.isidentifier() or keyword.iskeyword(name) or name in names:
+            name = f"col{index}"
+        names.append(name)
+    return names
+
+
+def make_row_factory(kind, description):
+    """
+    Builds a function converting result tuples into rows of the given kind
+
+    Args:
+        kind: 'tuple', 'namedtuple', 'dataclass' (slotted), or a callable
+            taking the cursor description and returning a converter
+        description: cursor.description of the executed query
+
+    Returns:
+        callable or None: Converter for one row, None for plain tuples
+    """
+    if kind is None or kind == 'tuple':
+        return None
+    if callable(kind):
+        return kind(description)
+    names = _field_names(description)
+    if kind == 'namedtuple':
+        return namedtuple('Row', names)._make
+    if kind == 'dataclass':
+        row_class = make_dataclass('Row', names, slots=True)
+        return lambda row: row_class(*row)
+    raise ValueError(f"Unknown row factory: {kind!r}")
 
 
 class ExecuteQuery:
     """Class-based context manager for executing database queries"""
     
-    def __init__(self, database, query, params=None):
+    def __init__(self, database, query, params=None, stream=False, arraysize=1000,
+                 row_factory=None, columnar=False):
         """
         Initialize the context manager with database, query, and parameters
         
@@ -12,33 +54,79 @@ class ExecuteQuery:
             database: Path to the SQLite database file
             query: SQL query string to execute
             params: Parameters to pass to the query (optional)
+            stream: Yield rows lazily instead of fetching them all up front
+            arraysize: Rows fetched per fetchmany() call when streaming or columnar
+            row_factory: 'tuple' (default), 'namedtuple', 'dataclass' or a
+                callable (see make_row_factory)
+            columnar: Return a columnar.ColumnarResult filled arraysize rows
+                at a time instead of row tuples (record batches when streaming)
         """
+        if columnar and row_factory not in (None, 'tuple'):
+            raise ValueError("row_factory does not apply to columnar results")
         self.database = database
         self.query = query
         self.params = params if params is not None else ()
+        self.stream = stream
+        self.arraysize = arraysize
+        self.row_factory = row_factory
+        self.columnar = columnar
         self.connection = None
         self.cursor = None
         self.results = None
+        self.rows_streamed = 0
     
     def __enter__(self):
         """
         Open connection, execute query, and return results
         
         Returns:
-            results: The query results (fetchall())
+            results: The query results (fetchall()), or in stream mode an
+            iterator over them that stays valid until the block exits;
+            with columnar, a ColumnarResult (an iterator of them when streaming)
         """
         # Open database connection
         self.connection = sqlite3.connect(self.database)
         self.cursor = self.connection.cursor()
+        self.cursor.arraysize = self.arraysize
         
         # Execute the query with parameters
         self.cursor.execute(self.query, self.params)
+        if self.columnar:
+            self.results = self._iter_batches() if self.stream else fetch_columnar(self.cursor)
+            return self.results
+        convert = make_row_factory(self.row_factory, self.cursor.description)
+        
+        if self.stream:
+            # Only one batch of rows is held in memory at a time
+            self.results = self._iter_rows(convert)
+            return self.results
         
         # Fetch and store results
         self.results = self.cursor.fetchall()
+        if convert is not None:
+            self.results = [convert(row) for row in self.results]
         
         return self.results
     
+    def _iter_rows(self, convert):
+        """Yields rows batch by batch with fetchmany(arraysize)"""
+        fetchmany = self.cursor.fetchmany
+        while True:
+            batch = fetchmany()
+            if not batch:
+                return
+            # Counted per row handed out, so a consumer that stops part way
+            # through a batch is not credited with the rest of it
+            for row in (batch if convert is None else map(convert, batch)):
+                self.rows_streamed += 1
+                yield row
+    
+    def _iter_batches(self):
+        """Yields one ColumnarResult per fetchmany(arraysize) batch"""
+        for batch in iter_columnar(self.cursor):
+            self.rows_streamed += len(batch)
+            yield batch
+    
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
         Close cursor and connection when exiting the context
@@ -1,33 +1,91 @@
 import asyncio
-import aiosqlite
 
+from connection_pool import get_async_pool
 
-async def async_fetch_users():
+
+DATABASE = 'users.db'
+
+
+async def _fetch(pool, query, params=()):
+    """Runs a query on a pooled connection and returns all rows"""
+    async with pool.connection() as db:
+        try:
+            async with db.execute(query, params) as cursor:
+                return await cursor.fetchall()
+        except asyncio.CancelledError:
+            # Timed out or cancelled: stop the statement on the worker thread too
+            await db.interrupt()
+            raise
+
+
+async def async_fetch_users(pool=None):
     """
     Asynchronously fetch all users from the database
     
+    Args:
+        pool: AsyncSQLitePool to borrow from (defaults to the loop's shared pool)
+    
     Returns:
         list: All users from the users table
     """
-    async with aiosqlite.connect('users.db') as db:
-        cursor = await db.execute("SELECT * FROM users")
-        results = await cursor.fetchall()
-        print(f"Fetched {len(results)} users")
-        return results
+    results = await _fetch(pool or get_async_pool(DATABASE), "SELECT * FROM users")
+    print(f"Fetched {len(results)} users")
+    return results
 
 
-async def async_fetch_older_users():
+async def async_fetch_older_users(pool=None):
     """
     Asynchronously fetch users older than 40 from the database
     
+    Args:
+        pool: AsyncSQLitePool to borrow from (defaults to the loop's shared pool)
+    
     Returns:
         list: Users older than 40
     """
-    async with aiosqlite.connect('users.db') as db:
-        cursor = await db.execute("SELECT * FROM users WHERE age > ?", (40,))
-        results = await cursor.fetchall()
-        print(f"Fetched {len(results)} users older than 40")
-        return results
+    results = await _fetch(pool or get_async_pool(DATABASE),
+                           "SELECT * FROM users WHERE age > ?", (40,))
+    print(f"Fetched {len(results)} users older than 40")
+    return results
+
+
+async def fan_out(queries, limit=10, timeout=5.0, pool=None):
+    """
+    Runs many queries with bounded concurrency, yielding results as they finish
+
+    At most `limit` queries run at once, sharing the pool's connections, so
+    the number of threads stays fixed however many queries are submitted.
+
+    Args:
+        queries: Iterable of SQL strings or (sql, params) pairs
+        limit: Maximum number of queries in flight
+        timeout: Seconds each query may run (None for no limit); a query
+            that overruns reports asyncio.TimeoutError
+        pool: AsyncSQLitePool to use (defaults to the loop's shared pool)
+
+    Yields:
+        tuple: (index of the query, rows) in completion order, with the
+        exception in place of rows for a query that failed
+    """
+    pool = pool or get_async_pool(DATABASE)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(index, query):
+        sql, params = (query, ()) if isinstance(query, str) else query
+        async with semaphore:
+            try:
+                return index, await asyncio.wait_for(_fetch(pool, sql, params), timeout)
+            except Exception as e:
+                return index, e
+
+    tasks = [asyncio.ensure_future(run(index, query)) for index, query in enumerate(queries)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        # The consumer stopped early: don't leave queries running
+        for task in tasks:
+            task.cancel()
 
 
 async def fetch_concurrently():
@@ -54,6 +112,13 @@ async def fetch_concurrently():
     return all_users, older_users
 
 
+async def main():
+    try:
+        await fetch_concurrently()
+    finally:
+        await get_async_pool(DATABASE).close()
+
+
 if __name__ == "__main__":
     # Run the concurrent fetch
-    asyncio.run(fetch_concurrently())
+    asyncio.run(main())
@@ -0,0 +1,296 @@
+"""
+Benchmarks for the context managers
+
+    python3 benchmark.py pool --transactions 5000 --threads 8
+    python3 benchmark.py stream --users 1000000
+    python3 benchmark.py fanout --concurrency 10 100 1000
+    python3 benchmark.py parallel --users 3000000
+    python3 benchmark.py columnar --users 1000000
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:
+    import aiosqlite
+except ImportError:  # only needed by the fanout benchmark
+    aiosqlite = None
+
+import columnar as columnar_module
+import parallel_query
+from connection_pool import AsyncSQLitePool, SQLitePool
+
+
+def _make_users_db(path, rows):
+    """Creates a users table with rows generated users"""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                     ((f"user{i}", f"user{i}@example.com", 18 + i % 70) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def _throughput(run_one, total, threads):
+    """Calls run_one() total times across threads; returns calls per second"""
+    per_thread = total // threads
+
+    def worker():
+        for _ in range(per_thread):
+            run_one()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def bench_pool(args):
+    """Short-transaction throughput: DatabaseConnection vs PooledDatabaseConnection"""
+    module = importlib.import_module('0-databaseconnection')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.users)
+        pool = SQLitePool(path, max_size=args.pool_size)
+
+        def transaction(manager):
+            user_id = random.randint(1, args.users)
+            with manager as conn:
+                age = conn.execute("SELECT age FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+                conn.execute("UPDATE users SET age = ? WHERE id = ?", (age, user_id))
+                conn.commit()
+
+        variants = [
+            ("connect per block", lambda: transaction(module.DatabaseConnection(path))),
+            ("pooled", lambda: transaction(module.PooledDatabaseConnection(path, pool))),
+        ]
+        print(f"{'variant':<20} {'tx/s':>10}")
+        for label, run_one in variants:
+            rate = _throughput(run_one, args.transactions, args.threads)
+            print(f"{label:<20} {rate:>10.0f}")
+        print("pool stats:", pool.stats())
+        pool.close()
+
+
+def bench_stream(args):
+    """Peak memory and time to first row: fetchall() vs streaming ExecuteQuery"""
+    ExecuteQuery = importlib.import_module('1-execute').ExecuteQuery
+    query = "SELECT * FROM users WHERE age > ?"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.users)
+        variants = [
+            ("fetchall", {}),
+            ("stream tuple", dict(stream=True)),
+            ("stream namedtuple", dict(stream=True, row_factory='namedtuple')),
+            ("stream dataclass", dict(stream=True, row_factory='dataclass')),
+        ]
+        print(f"{'variant':<18} {'rows':>9} {'first row ms':>13} {'total s':>8} {'peak MiB':>9}")
+        for label, options in variants:
+            tracemalloc.start()
+            start = time.perf_counter()
+            first = None
+            rows = 0
+            with ExecuteQuery(path, query, (25,), arraysize=args.arraysize, **options) as results:
+                for _ in results:
+                    if first is None:
+                        first = time.perf_counter() - start
+                    rows += 1
+            total = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:<18} {rows:>9} {first * 1000:>13.1f} {total:>8.2f} {peak / 2**20:>9.1f}")
+
+
+async def _peak_threads(run):
+    """Awaits run() while sampling the process thread count; returns (seconds, peak)"""
+    peak = threading.active_count()
+    done = False
+
+    async def sample():
+        nonlocal peak
+        while not done:
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.001)
+
+    sampler = asyncio.ensure_future(sample())
+    start = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - start
+    done = True
+    await sampler
+    return elapsed, peak
+
+
+def bench_fanout(args):
+    """Latency and thread count of N concurrent queries: gather + connect vs pooled fan_out"""
+    if aiosqlite is None:
+        raise SystemExit("the fanout benchmark needs aiosqlite")
+    fan_out = importlib.import_module('3-concurrent').fan_out
+    query = ("SELECT * FROM users WHERE age > ? LIMIT 50", (40,))
+
+    async def connect_each(n, path):
+        async def one():
+            async with aiosqlite.connect(path) as db:
+                async with db.execute(*query) as cursor:
+                    return await cursor.fetchall()
+        await asyncio.gather(*(one() for _ in range(n)))
+
+    async def pooled(n, pool):
+        async for _, rows in fan_out([query] * n, limit=args.limit, timeout=args.timeout,
+                                     pool=pool):
+            if isinstance(rows, Exception):
+                raise rows
+
+    async def run(path):
+        pool = AsyncSQLitePool(path, max_size=args.pool_size)
+        print(f"{'queries':>8} {'variant':<18} {'total ms':>9} {'per query ms':>13} {'peak threads':>13}")
+        for n in args.concurrency:
+            for label, make in (("gather + connect", lambda: connect_each(n, path)),
+                                ("pooled fan_out", lambda: pooled(n, pool))):
+                elapsed, peak = await _peak_threads(make)
+                print(f"{n:>8} {label:<18} {elapsed * 1000:>9.1f} "
+                      f"{elapsed * 1000 / n:>13.3f} {peak:>13}")
+        print("pool stats:", pool.stats())
+        await pool.close()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.users)
+        asyncio.run(run(path))
+
+
+def bench_parallel(args):
+    """Speedup of rowid-range process-parallel scans over one connection, per worker count"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.users)
+        conn = sqlite3.connect(path)
+
+        def serial():
+            conn.execute("SELECT COUNT(age), SUM(age), MIN(age), MAX(age) FROM users "
+                         "WHERE age > ?", (25,)).fetchone()
+            return len(conn.execute("SELECT * FROM users WHERE age > ?", (40,)).fetchall())
+
+        def parallel(workers):
+            parallel_query.parallel_aggregate(path, where="age > ?", params=(25,),
+                                              workers=workers, immutable=True)
+            return sum(1 for _ in parallel_query.parallel_scan(
+                path, where="age > ?", params=(40,), workers=workers, immutable=True))
+
+        def timed(run, *run_args):
+            start = time.perf_counter()
+            rows = run(*run_args)
+            return time.perf_counter() - start, rows
+
+        baseline, expected = timed(serial)
+        print(f"{os.cpu_count()} CPUs, {args.users} users")
+        print(f"{'workers':<10} {'seconds':>8} {'speedup':>8}")
+        print(f"{'serial':<10} {baseline:>8.2f} {1:>8.2f}")
+        for workers in args.workers or sorted({1, 2, 4, os.cpu_count() or 1}):
+            elapsed, rows = timed(parallel, workers)
+            if rows != expected:
+                raise SystemExit(f"parallel scan returned {rows} rows, expected {expected}")
+            print(f"{workers:<10} {elapsed:>8.2f} {baseline / elapsed:>8.2f}")
+        conn.close()
+
+
+def bench_columnar(args):
+    """Time and memory to get columns: fetchall() + transpose vs columnar ExecuteQuery"""
+    ExecuteQuery = importlib.import_module('1-execute').ExecuteQuery
+    query = "SELECT * FROM users WHERE age > ?"
+
+    def fetchall_columns(path):
+        with ExecuteQuery(path, query, (25,)) as rows:
+            return rows, list(zip(*rows))
+
+    def columnar(path):
+        with ExecuteQuery(path, query, (25,), arraysize=args.arraysize, columnar=True) as result:
+            return result
+
+    def columnar_numpy(path):
+        result = columnar(path)
+        return result, result.to_numpy()
+
+    def columnar_arrow(path):
+        result = columnar(path)
+        return result, result.to_arrow()
+
+    variants = [("fetchall + zip", fetchall_columns), ("columnar", columnar)]
+    if columnar_module.numpy is not None:
+        variants.append(("columnar + numpy", columnar_numpy))
+    if columnar_module.pyarrow is not None:
+        variants.append(("columnar + arrow", columnar_arrow))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.users)
+        print(f"{'variant':<18} {'total s':>8} {'peak MiB':>9} {'held MiB':>9}")
+        for label, run in variants:
+            # Timed and traced separately: tracemalloc slows every allocation
+            start = time.perf_counter()
+            kept = run(path)
+            total = time.perf_counter() - start
+            del kept
+            tracemalloc.start()
+            kept = run(path)
+            held, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del kept
+            print(f"{label:<18} {total:>8.2f} {peak / 2**20:>9.1f} {held / 2**20:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pool = commands.add_parser("pool", help=bench_pool.__doc__)
+    pool.add_argument("--transactions", type=int, default=5000)
+    pool.add_argument("--threads", type=int, default=8)
+    pool.add_argument("--users", type=int, default=10000)
+    pool.add_argument("--pool-size", type=int, default=8)
+    pool.set_defaults(func=bench_pool)
+
+    stream = commands.add_parser("stream", help=bench_stream.__doc__)
+    stream.add_argument("--users", type=int, default=1000000)
+    stream.add_argument("--arraysize", type=int, default=1000)
+    stream.set_defaults(func=bench_stream)
+
+    fanout = commands.add_parser("fanout", help=bench_fanout.__doc__)
+    fanout.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 1000])
+    fanout.add_argument("--users", type=int, default=10000)
+    fanout.add_argument("--limit", type=int, default=20, help="queries in flight")
+    fanout.add_argument("--pool-size", type=int, default=4)
+    fanout.add_argument("--timeout", type=float, default=10.0)
+    fanout.set_defaults(func=bench_fanout)
+
+    parallel = commands.add_parser("parallel", help=bench_parallel.__doc__)
+    parallel.add_argument("--users", type=int, default=3000000)
+    parallel.add_argument("--workers", type=int, nargs="*",
+                          help="worker counts to try (default 1, 2, 4 and the CPU count)")
+    parallel.set_defaults(func=bench_parallel)
+
+    columnar = commands.add_parser("columnar", help=bench_columnar.__doc__)
+    columnar.add_argument("--users", type=int, default=1000000)
+    columnar.add_argument("--arraysize", type=int, default=10000)
+    columnar.set_defaults(func=bench_columnar)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
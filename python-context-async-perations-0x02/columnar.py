@@ -0,0 +1,287 @@
+"""
+Columnar export of query results
+
+Rows are pulled from the cursor with fetchmany() and appended straight into
+one contiguous buffer per column, so the full list of row tuples is never
+built:
+
+    INTEGER / REAL    array('q') / array('d') of values
+    TEXT / BLOB       int64 offsets plus one bytes buffer (Arrow's
+                      large_string / large_binary layout, UTF-8 text)
+    NULL              Arrow-style validity bitmap (bit set = not NULL),
+                      only allocated once a column actually holds a NULL
+
+Every buffer is exposed as a memoryview, and to_numpy() / to_arrow() wrap
+the same memory instead of copying it. numpy and pyarrow are optional.
+"""
+
+from array import array
+from itertools import accumulate, islice
+
+try:
+    import numpy
+except ImportError:  # only needed by to_numpy()
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:  # only needed by to_arrow()
+    pyarrow = None
+
+
+# Placeholder stored in the value buffer for a NULL row, per column kind
+_NULL_VALUE = {'int64': 0, 'float64': 0.0, 'string': '', 'binary': b''}
+
+
+class Column:
+    """
+    One result column being filled batch by batch
+
+    SQLite columns are dynamically typed, so the kind ('int64', 'float64',
+    'string' or 'binary') is taken from the first non-NULL value. An
+    integer column that later meets a REAL is widened to float64; any
+    other mix of types raises TypeError. A column holding only NULLs keeps
+    kind None and has no value buffer.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.kind = None
+        self.length = 0
+        self.null_count = 0
+        self._values = None    # array of numbers, or bytearray of string/blob bytes
+        self._offsets = None   # array('q') of length + 1 offsets into _values
+        self._validity = None  # bytearray bitmap, bit i set when row i is not NULL
+
+    def extend(self, values):
+        """
+        Appends one batch of values (a tuple, None for NULL)
+
+        Raises:
+            TypeError: If the values do not fit the column's kind
+        """
+        nulls = values.count(None)
+        if self.kind is None and nulls < len(values):
+            self._start(next(value for value in values if value is not None))
+        if nulls or self._validity is not None:
+            self._mark(values)
+            self.null_count += nulls
+        if self.kind is not None:
+            if nulls:
+                placeholder = _NULL_VALUE[self.kind]
+                values = [placeholder if value is None else value for value in values]
+            self._append(values)
+        self.length += len(values)
+
+    def _start(self, first):
+        """Picks the kind from the first non-NULL value and pads earlier NULL rows"""
+        if isinstance(first, int):
+            self.kind, self._values = 'int64', array('q', [0]) * self.length
+        elif isinstance(first, float):
+            self.kind, self._values = 'float64', array('d', [0.0]) * self.length
+        else:
+            self.kind = 'string' if isinstance(first, str) else 'binary'
+            self._values = bytearray()
+            self._offsets = array('q', [0]) * (self.length + 1)
+
+    def _mark(self, values):
+        """Extends the validity bitmap for one batch (per row, so NULL-free columns skip it)"""
+        if self._validity is None:
+            # Every row so far was valid
+            full, rest = divmod(self.length, 8)
+            self._validity = bytearray(b'\xff' * full + (bytes([(1 << rest) - 1]) if rest else b''))
+        bitmap = self._validity
+        index = self.length
+        bitmap.extend(bytes((index + len(values) + 7) // 8 - len(bitmap)))
+        for value in values:
+            if value is not None:
+                bitmap[index >> 3] |= 1 << (index & 7)
+            index += 1
+
+    def _append(self, values):
+        if self.kind in ('int64', 'float64'):
+            size = len(self._values)
+            try:
+                self._values.extend(values)
+                return
+            except TypeError:
+                # extend() stops at the bad value; drop what it appended
+                del self._values[size:]
+            if self.kind == 'int64' and all(isinstance(value, (int, float)) for value in values):
+                self.kind, self._values = 'float64', array('d', self._values)
+                self._values.extend(values)
+                return
+        else:
+            try:
+                if self.kind == 'string':
+                    # One encode per batch; byte and character lengths only
+                    # agree when the batch is pure ASCII, else encode per value
+                    data = ''.join(values).encode()
+                    encoded = values if data.isascii() else [value.encode() for value in values]
+                else:
+                    encoded = values
+                    data = b''.join(values)
+            except TypeError:
+                pass
+            else:
+                self._offsets.extend(
+                    islice(accumulate(map(len, encoded), initial=self._offsets[-1]), 1, None)
+                )
+                self._values += data
+                return
+        found = sorted({type(value).__name__ for value in values})
+        raise TypeError(f"Column {self.name!r} holds {self.kind} values but got {', '.join(found)}")
+
+    @property
+    def values(self):
+        """memoryview of the int64/float64 values, or of the string/blob bytes"""
+        return None if self._values is None else memoryview(self._values)
+
+    @property
+    def offsets(self):
+        """memoryview of the int64 offsets into values (string and blob columns only)"""
+        return None if self._offsets is None else memoryview(self._offsets)
+
+    @property
+    def validity(self):
+        """memoryview of the validity bitmap, None when the column has no NULLs"""
+        return None if self._validity is None else memoryview(self._validity)
+
+    @property
+    def nbytes(self):
+        return sum(view.nbytes for view in (self.values, self.offsets, self.validity) if view)
+
+    def to_numpy(self):
+        """
+        Wraps the buffers as numpy arrays without copying them
+
+        Returns:
+            ndarray: int64/float64 values, as a masked array when the column
+            has NULLs; (offsets, data) int64 and uint8 arrays for string and
+            blob columns; None for an all-NULL column
+        """
+        if numpy is None:
+            raise RuntimeError("to_numpy() needs the numpy package")
+        if self.kind is None:
+            return None
+        if self._offsets is not None:
+            return (numpy.frombuffer(self._offsets, dtype=numpy.int64),
+                    numpy.frombuffer(self._values, dtype=numpy.uint8))
+        values = numpy.frombuffer(self._values, dtype=self.kind)
+        if self._validity is None:
+            return values
+        valid = numpy.unpackbits(numpy.frombuffer(self._validity, dtype=numpy.uint8),
+                                 count=self.length, bitorder='little')
+        return numpy.ma.MaskedArray(values, mask=valid == 0)
+
+    def to_arrow(self):
+        """Wraps the buffers as a pyarrow Array without copying them"""
+        if pyarrow is None:
+            raise RuntimeError("to_arrow() needs the pyarrow package")
+        if self.kind is None:
+            return pyarrow.nulls(self.length)
+        arrow_type = {
+            'int64': pyarrow.int64(),
+            'float64': pyarrow.float64(),
+            'string': pyarrow.large_string(),
+            'binary': pyarrow.large_binary(),
+        }[self.kind]
+        buffers = [None if self._validity is None else pyarrow.py_buffer(self._validity)]
+        if self._offsets is not None:
+            buffers.append(pyarrow.py_buffer(self._offsets))
+        buffers.append(pyarrow.py_buffer(self._values))
+        return pyarrow.Array.from_buffers(arrow_type, self.length, buffers,
+                                          null_count=self.null_count)
+
+
+class ColumnarResult:
+    """Query result held as one Column per selected column"""
+
+    def __init__(self, names):
+        self.columns = [Column(name) for name in names]
+        self.num_rows = 0
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+    @property
+    def nbytes(self):
+        """Total size of the column buffers"""
+        return sum(column.nbytes for column in self.columns)
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, key):
+        """Column by position or by name"""
+        if isinstance(key, int):
+            return self.columns[key]
+        for column in self.columns:
+            if column.name == key:
+                return column
+        raise KeyError(key)
+
+    def append_rows(self, rows):
+        """Transposes one batch of row tuples into the column buffers"""
+        if not rows:
+            return
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(values)
+        self.num_rows += len(rows)
+
+    def to_numpy(self):
+        """
+        Returns:
+            dict: column name -> Column.to_numpy() result
+        """
+        return {column.name: column.to_numpy() for column in self.columns}
+
+    def to_arrow(self):
+        """
+        Returns:
+            pyarrow.Table: Sharing the column buffers
+        """
+        if pyarrow is None:
+            raise RuntimeError("to_arrow() needs the pyarrow package")
+        return pyarrow.Table.from_arrays([column.to_arrow() for column in self.columns],
+                                         names=self.names)
+
+
+def fetch_columnar(cursor, arraysize=None):
+    """
+    Drains an executed cursor into a ColumnarResult
+
+    Args:
+        cursor: sqlite3 cursor after execute()
+        arraysize: Rows per fetchmany() call (defaults to cursor.arraysize)
+
+    Returns:
+        ColumnarResult: All remaining rows
+    """
+    result = ColumnarResult([column[0] for column in cursor.description])
+    size = arraysize or cursor.arraysize
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return result
+        result.append_rows(rows)
+
+
+def iter_columnar(cursor, arraysize=None):
+    """
+    Generator yielding one ColumnarResult (a record batch) per fetchmany() call
+
+    Args:
+        cursor: sqlite3 cursor after execute()
+        arraysize: Rows per batch (defaults to cursor.arraysize)
+    """
+    names = [column[0] for column in cursor.description]
+    size = arraysize or cursor.arraysize
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        batch = ColumnarResult(names)
+        batch.append_rows(rows)
+        yield batch
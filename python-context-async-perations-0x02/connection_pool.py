@@ -0,0 +1,422 @@
+import os
+import time
+import asyncio
+import sqlite3
+import weakref
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import aiosqlite
+except ImportError:  # only needed by AsyncSQLitePool
+    aiosqlite = None
+
+
+# Applied once to every pooled connection when it is opened
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+}
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+class SQLitePool:
+    """
+    Bounded pool of warm SQLite connections to one database file
+
+    Connections are opened lazily, tuned with PRAGMAs once, and handed back
+    rolled back to a clean state. When every connection is checked out,
+    callers wait up to checkout_timeout seconds for one to be released.
+    Connections left idle longer than idle_timeout are closed, as are
+    connections released after the pool itself was closed.
+    """
+
+    def __init__(self, database, max_size=5, checkout_timeout=30, idle_timeout=300,
+                 pragmas=None):
+        """
+        Initialize an empty pool; connections are opened lazily
+
+        Args:
+            database: Path to the SQLite database file
+            max_size: Maximum number of open connections
+            checkout_timeout: Seconds to wait for a free connection
+            idle_timeout: Seconds an unused connection stays open
+            pragmas: PRAGMA name -> value applied to new connections
+        """
+        self.database = database
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self._idle = deque()  # (connection, released_at) pairs, most recent last
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'evicted': 0,
+            'broken': 0,
+        }
+
+    def _connect(self):
+        # Connections move between threads, but only one thread uses each at a time
+        connection = sqlite3.connect(self.database, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name}={value}")
+        return connection
+
+    def acquire(self, timeout=None):
+        """
+        Checks out a connection, opening one if the pool has room
+
+        Args:
+            timeout: Seconds to wait for a free connection (defaults to checkout_timeout)
+
+        Returns:
+            connection: sqlite3 connection object
+
+        Raises:
+            PoolTimeoutError: If no connection became free in time
+            RuntimeError: If the pool is closed
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        stale = []
+        try:
+            with self._lock:
+                stale = self._evict_idle()
+                connection = self._next_idle_or_slot(deadline)
+        finally:
+            for old in stale:
+                old.close()
+        if connection is None:
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._stats['created'] += 1
+        with self._lock:
+            self._stats['checkouts'] += 1
+        return connection
+
+    def _evict_idle(self):
+        """Removes connections idle past idle_timeout; caller holds the lock and closes them"""
+        stale = []
+        cutoff = time.monotonic() - self.idle_timeout
+        # The least recently released connections are at the left
+        while self._idle and self._idle[0][1] < cutoff:
+            stale.append(self._idle.popleft()[0])
+            self._size -= 1
+            self._stats['evicted'] += 1
+        if stale:
+            self._lock.notify(len(stale))
+        return stale
+
+    def _next_idle_or_slot(self, deadline):
+        """Pops an idle connection or reserves a slot (returns None); caller holds the lock"""
+        waited = False
+        start = time.monotonic()
+        while not self._idle and self._size >= self.max_size:
+            if self._closed:
+                raise RuntimeError("Pool is closed")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats['timeouts'] += 1
+                raise PoolTimeoutError(
+                    f"No pooled connection available after waiting {time.monotonic() - start:.1f}s"
+                )
+            waited = True
+            self._lock.wait(remaining)
+        if self._closed:
+            raise RuntimeError("Pool is closed")
+        if waited:
+            self._stats['waits'] += 1
+            self._stats['wait_time'] += time.monotonic() - start
+        if self._idle:
+            return self._idle.pop()[0]
+        self._size += 1
+        return None
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool
+
+        Any open transaction is rolled back so the next borrower starts from
+        a clean session; a connection that cannot be rolled back, or that
+        comes back after close(), is closed.
+
+        Args:
+            connection: Connection previously returned by acquire
+        """
+        with self._lock:
+            closed = self._closed
+            if closed:
+                self._size -= 1
+        if closed:
+            connection.close()
+            return
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except sqlite3.Error:
+            try:
+                connection.close()
+            except sqlite3.Error:
+                pass
+            with self._lock:
+                self._stats['broken'] += 1
+                self._size -= 1
+                self._lock.notify()
+            return
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always releases it"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool counters
+
+        Returns:
+            dict: checkouts, waits, wait_time, timeouts, created, evicted,
+            broken, plus the current size and idle count
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['size'] = self._size
+            snapshot['idle'] = len(self._idle)
+        return snapshot
+
+    def close(self):
+        """Closes every idle connection; checked-out ones are closed on release"""
+        with self._lock:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for connection in idle:
+            connection.close()
+
+
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def get_pool(database, **kwargs):
+    """
+    Returns the process-wide pool for a database file, creating it on first use
+
+    A forked child gets fresh pools instead of sharing its parent's
+    connections. kwargs (SQLitePool arguments) only apply on creation.
+
+    Returns:
+        SQLitePool: The shared pool
+    """
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(database)
+        if pool is None or pool._closed:
+            pool = _pools[database] = SQLitePool(database, **kwargs)
+        return pool
+
+
+class AsyncSQLitePool:
+    """
+    Bounded pool of aiosqlite connections for one event loop
+
+    Every aiosqlite connection runs on its own thread, so sharing a few
+    connections bounds both the thread count and the connect cost no matter
+    how many coroutines query at once.
+    """
+
+    def __init__(self, database, max_size=5, checkout_timeout=30, pragmas=None):
+        """
+        Args:
+            database: Path to the SQLite database file
+            max_size: Maximum number of open connections (and threads)
+            checkout_timeout: Seconds to wait for a free connection
+            pragmas: PRAGMA name -> value applied to new connections
+        """
+        if aiosqlite is None:
+            raise RuntimeError("AsyncSQLitePool needs the aiosqlite package")
+        self.database = database
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self._idle = []  # most recently released last
+        self._size = 0
+        self._closed = False
+        self._waiters = deque()  # futures of acquirers waiting for a connection or a slot
+        self._stats = {'checkouts': 0, 'waits': 0, 'wait_time': 0.0, 'timeouts': 0,
+                       'created': 0, 'broken': 0}
+
+    def _can_checkout(self):
+        return self._closed or self._idle or self._size < self.max_size
+
+    def _wake(self):
+        """Wakes the longest-waiting acquirer"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    async def acquire(self, timeout=None):
+        """
+        Checks out a connection, opening one if the pool has room
+
+        A connect that fails or is cancelled half-way gives its slot back.
+
+        Raises:
+            PoolTimeoutError: If no connection became free in time
+            RuntimeError: If the pool is (or gets) closed
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited = False
+        while not self._can_checkout():
+            remaining = start + timeout - time.monotonic()
+            if remaining <= 0:
+                self._stats['timeouts'] += 1
+                raise PoolTimeoutError(
+                    f"No pooled connection available after waiting {time.monotonic() - start:.1f}s"
+                )
+            waited = True
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass  # re-checked (and reported) at the top of the loop
+            except BaseException:
+                # Cancelled after being woken: pass the wake-up on
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+        if self._closed:
+            raise RuntimeError("AsyncSQLitePool is closed")
+        if waited:
+            self._stats['waits'] += 1
+            self._stats['wait_time'] += time.monotonic() - start
+        if self._idle:
+            self._stats['checkouts'] += 1
+            return self._idle.pop()
+
+        self._size += 1
+        db = aiosqlite.connect(self.database)
+        try:
+            await db
+            for name, value in self.pragmas.items():
+                await db.execute(f"PRAGMA {name}={value}")
+        except BaseException:
+            await self._discard(db)
+            raise
+        self._stats['created'] += 1
+        self._stats['checkouts'] += 1
+        return db
+
+    async def _discard(self, db):
+        """Frees db's slot, wakes a waiter and closes db even if the caller is cancelled"""
+        self._size -= 1
+        self._wake()
+        try:
+            await asyncio.shield(db.close())
+        except Exception:
+            pass
+
+    async def release(self, db):
+        """
+        Returns a connection, rolling back any open transaction
+
+        A connection whose rollback fails or is cancelled is closed, since
+        its session state is unknown, and its slot is freed.
+        """
+        try:
+            if db.in_transaction:
+                await db.rollback()
+        except BaseException as e:
+            self._stats['broken'] += 1
+            await self._discard(db)
+            if isinstance(e, Exception):
+                return
+            raise
+        if self._closed:
+            await self._discard(db)
+            return
+        self._idle.append(db)
+        self._wake()
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """Borrows a connection for the block and always releases it"""
+        db = await self.acquire(timeout)
+        try:
+            yield db
+        finally:
+            await self.release(db)
+
+    def stats(self):
+        """
+        Returns:
+            dict: pool counters plus the current size and idle count
+        """
+        snapshot = dict(self._stats)
+        snapshot['size'] = self._size
+        snapshot['idle'] = len(self._idle)
+        return snapshot
+
+    async def close(self):
+        """Closes every idle connection and fails acquirers still waiting"""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        self._size -= len(idle)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+        for db in idle:
+            await db.close()
+
+
+_async_pools = weakref.WeakKeyDictionary()  # event loop -> database -> AsyncSQLitePool
+
+
+def get_async_pool(database, **kwargs):
+    """
+    Returns the running event loop's pool for a database file
+
+    kwargs (AsyncSQLitePool arguments) only apply on creation.
+    """
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(database)
+    if pool is None or pool._closed:
+        pool = pools[database] = AsyncSQLitePool(database, **kwargs)
+    return pool
@@ -0,0 +1,206 @@
+"""
+Process-parallel, read-only scans of a SQLite table split by rowid range
+
+The table's rowid span is cut into contiguous ranges and each range is read
+by a process-pool worker on its own read-only connection (mode=ro, or
+immutable=1 for files nothing writes to), so a scan uses every core instead
+of one. Rows come back per range; aggregates are computed by SQLite inside
+each worker and only the partial results are combined in the parent.
+"""
+
+import os
+import sqlite3
+from collections import deque
+from itertools import islice
+from urllib.parse import quote
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+def read_only_uri(database, immutable=False):
+    """
+    URI opening database read-only
+
+    Args:
+        database: Path to the SQLite database file
+        immutable: Also promise SQLite that nothing modifies the file, which
+            skips locking and change detection entirely; only safe when no
+            process writes to it during the scan
+    """
+    uri = f"file:{quote(os.path.abspath(database))}?mode=ro"
+    return uri + "&immutable=1" if immutable else uri
+
+
+def _check_identifier(name):
+    if not name.isidentifier():
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
+
+
+_connections = {}  # (pid, uri) -> connection, reused by a worker across ranges
+
+
+def _connection(uri):
+    key = (os.getpid(), uri)
+    connection = _connections.get(key)
+    if connection is None:
+        connection = _connections[key] = sqlite3.connect(uri, uri=True)
+        connection.execute("PRAGMA query_only=1")
+    return connection
+
+
+def rowid_ranges(database, table='users', partitions=None):
+    """
+    Splits a table's rowid span into contiguous ranges
+
+    MIN and MAX of the rowid are read from the b-tree ends, so this costs
+    two index lookups whatever the table size.
+
+    Args:
+        database: Path to the SQLite database file
+        table: Table to split
+        partitions: Number of ranges (defaults to the CPU count)
+
+    Returns:
+        list: (low, high) inclusive rowid bounds; empty for an empty table
+    """
+    connection = sqlite3.connect(read_only_uri(database), uri=True)
+    try:
+        low, high = connection.execute(
+            f"SELECT MIN(rowid), MAX(rowid) FROM {_check_identifier(table)}"
+        ).fetchone()
+    finally:
+        connection.close()
+    if low is None:
+        return []
+    partitions = max(1, min(partitions or os.cpu_count() or 1, high - low + 1))
+    step = (high - low + 1) / partitions
+    bounds = [low + round(step * index) for index in range(partitions)] + [high + 1]
+    return [(bounds[index], bounds[index + 1] - 1) for index in range(partitions)]
+
+
+def _range_query(select, table, where):
+    query = f"SELECT {select} FROM {table} WHERE rowid BETWEEN ? AND ?"
+    return f"{query} AND ({where})" if where else query
+
+
+def scan_range(uri, table, rowid_range, columns, where, params):
+    """
+    Worker: reads the matching rows of one rowid range
+
+    Returns:
+        list: Row tuples in rowid order
+    """
+    query = _range_query(columns, table, where) + " ORDER BY rowid"
+    return _connection(uri).execute(query, tuple(rowid_range) + tuple(params)).fetchall()
+
+
+def aggregate_range(uri, table, rowid_range, column, where, params):
+    """
+    Worker: count, sum, min and max of column over one rowid range
+
+    Returns:
+        tuple: (count, sum, min, max); sum/min/max are None for no rows
+    """
+    select = f"COUNT({column}), SUM({column}), MIN({column}), MAX({column})"
+    query = _range_query(select, table, where)
+    return _connection(uri).execute(query, tuple(rowid_range) + tuple(params)).fetchone()
+
+
+def _run_ranges(func, uri, table, ranges, args, workers, ordered, max_pending=None):
+    """
+    Runs func(uri, table, range, *args) for every range and yields the results
+
+    At most max_pending ranges (2 per worker by default) are queued,
+    running or finished-but-unconsumed at a time; the next range is only
+    submitted as a result is taken, so a slow consumer throttles the
+    workers instead of letting finished ranges pile up in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    ranges = iter(ranges)
+
+    def submit_next(count=1):
+        return [executor.submit(func, uri, table, rowid_range, *args)
+                for rowid_range in islice(ranges, count)]
+
+    try:
+        initial = submit_next(max_pending or 2 * workers)
+        if ordered:
+            window = deque(initial)
+            while window:
+                result = window.popleft().result()
+                window.extend(submit_next())
+                yield result
+        else:
+            running = set(initial)
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    running.update(submit_next())
+                    yield result
+    finally:
+        # Consumer stopped early or a range failed: drop the queued ranges
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def parallel_scan(database, where=None, params=(), columns='*', table='users',
+                  workers=None, partitions=None, immutable=False, ordered=True):
+    """
+    Generator that streams the rows matching where, read in parallel ranges
+
+    Args:
+        database: Path to the SQLite database file
+        where: SQL condition with ? placeholders (all rows when None)
+        params: Values for the placeholders
+        columns: Select list
+        table: Table to scan
+        workers: Worker processes (defaults to the CPU count)
+        partitions: Rowid ranges (defaults to 4 per worker, to even out skew)
+        immutable: Open the file with immutable=1 (see read_only_uri)
+        ordered: Yield in rowid order; False yields each range as it completes
+
+    Yields:
+        tuple: One matching row
+    """
+    workers = workers or os.cpu_count()
+    ranges = rowid_ranges(database, table, partitions or 4 * workers)
+    uri = read_only_uri(database, immutable)
+    for rows in _run_ranges(scan_range, uri, _check_identifier(table), ranges,
+                            (columns, where, params), workers, ordered):
+        yield from rows
+
+
+def parallel_aggregate(database, column='age', where=None, params=(), table='users',
+                       workers=None, partitions=None, immutable=False):
+    """
+    count/sum/min/max/avg of a column over the rows matching where
+
+    Every worker aggregates its rowid ranges inside SQLite; the parent only
+    adds up the partial counts and sums and keeps the extreme min/max.
+
+    Returns:
+        dict: count, sum, min, max and avg (None when nothing matched)
+    """
+    workers = workers or os.cpu_count()
+    ranges = rowid_ranges(database, table, partitions or 4 * workers)
+    uri = read_only_uri(database, immutable)
+    args = (_check_identifier(column), where, params)
+    count, total, low, high = 0, None, None, None
+    for part_count, part_sum, part_min, part_max in _run_ranges(
+            aggregate_range, uri, _check_identifier(table), ranges, args, workers, ordered=False):
+        if not part_count:
+            continue
+        count += part_count
+        total = part_sum if total is None else total + part_sum
+        low = part_min if low is None else min(low, part_min)
+        high = part_max if high is None else max(high, part_max)
+    return {'count': count, 'sum': total, 'min': low, 'max': high,
+            'avg': total / count if count else None}
+
+
+if __name__ == "__main__":
+    # The queries from 1-execute.py and 3-concurrent.py, scanned in parallel
+    print("Users older than 25:", parallel_aggregate('users.db', where="age > ?", params=(25,)))
+    older = list(parallel_scan('users.db', where="age > ?", params=(40,)))
+    print(f"Fetched {len(older)} users older than 40")
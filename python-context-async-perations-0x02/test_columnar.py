@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Unit tests for columnar.py"""
+
+import sqlite3
+import unittest
+from parameterized import parameterized
+from columnar import Column, ColumnarResult, fetch_columnar, iter_columnar
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def filled(batches, name='c'):
+    column = Column(name)
+    for batch in batches:
+        column.extend(tuple(batch))
+    return column
+
+
+class TestColumn(unittest.TestCase):
+    @parameterized.expand([
+        ([[1, 2], [3]], 'int64', [1, 2, 3]),
+        ([[1.5, 2.0]], 'float64', [1.5, 2.0]),
+        ([[1, 2], [2.5]], 'float64', [1.0, 2.0, 2.5]),
+        ([[None, None], [4]], 'int64', [0, 0, 4]),
+    ])
+    def test_numeric_kinds(self, batches, kind, values):
+        column = filled(batches)
+        self.assertEqual(column.kind, kind)
+        self.assertEqual(column.values.tolist(), values)
+
+    @parameterized.expand([
+        ([['ab', ''], ['cde']], 'string', [0, 2, 2, 5], b'abcde'),
+        ([['é', 'x']], 'string', [0, 2, 3], 'éx'.encode()),
+        ([[None, 'ab']], 'string', [0, 0, 2], b'ab'),
+        ([[b'\x00\x01', b'z']], 'binary', [0, 2, 3], b'\x00\x01z'),
+    ])
+    def test_variable_width_kinds(self, batches, kind, offsets, data):
+        column = filled(batches)
+        self.assertEqual(column.kind, kind)
+        self.assertEqual(column.offsets.tolist(), offsets)
+        self.assertEqual(bytes(column.values), data)
+
+    def test_validity_bitmap_tracks_nulls(self):
+        column = filled([[1] * 9, [None, 2, None]])
+        self.assertEqual((column.length, column.null_count), (12, 2))
+        self.assertEqual(bytes(column.validity), bytes([0xff, 0b101]))
+
+    def test_column_without_nulls_has_no_bitmap(self):
+        self.assertIsNone(filled([[1, 2]]).validity)
+
+    def test_all_null_column(self):
+        column = filled([[None, None]])
+        self.assertEqual((column.kind, column.values, column.null_count), (None, None, 2))
+
+    @parameterized.expand([
+        ([[1], ['a']],),
+        ([['a'], [b'b']],),
+        ([[1.5], [2, 'x']],),
+    ])
+    def test_mixed_types_raise(self, batches):
+        with self.assertRaises(TypeError):
+            filled(batches)
+
+    def test_failed_batch_leaves_the_column_unchanged(self):
+        column = filled([[1, 2]])
+        with self.assertRaises(TypeError):
+            column.extend((3, 'x'))
+        self.assertEqual(column.values.tolist(), [1, 2])
+
+
+class TestColumnarResult(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age REAL)")
+        self.rows = [(i, f"user{i}" if i % 4 else None, 20.5 + i) for i in range(1, 26)]
+        self.conn.executemany("INSERT INTO users VALUES (?, ?, ?)", self.rows)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_fetch_columnar_holds_every_row(self):
+        result = fetch_columnar(self.conn.execute("SELECT * FROM users"), arraysize=7)
+        self.assertEqual((len(result), result.names), (25, ['id', 'name', 'age']))
+        self.assertEqual(result['id'].values.tolist(), list(range(1, 26)))
+        self.assertIs(result[2], result['age'])
+        with self.assertRaises(KeyError):
+            result['missing']
+
+    def test_iter_columnar_yields_record_batches(self):
+        batches = list(iter_columnar(self.conn.execute("SELECT id FROM users"), arraysize=10))
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 5])
+
+    def test_empty_result(self):
+        result = ColumnarResult(['id'])
+        result.append_rows([])
+        self.assertEqual((len(result), result.nbytes), (0, 0))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_to_numpy_shares_the_buffers(self):
+        result = fetch_columnar(self.conn.execute("SELECT * FROM users"))
+        arrays = result.to_numpy()
+        self.assertFalse(arrays['id'].flags.owndata)
+        self.assertEqual(arrays['id'].tolist(), list(range(1, 26)))
+        offsets, data = arrays['name']
+        self.assertEqual(bytes(data[offsets[0]:offsets[1]]), b'user1')
+        self.assertEqual(offsets[3], offsets[4])  # NULL rows take no bytes
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_to_numpy_masks_nulls(self):
+        values = filled([[1.5, None, 2.5]]).to_numpy()
+        self.assertEqual(values.mask.tolist(), [False, True, False])
+        self.assertEqual(values.sum(), 4.0)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_to_arrow_round_trips_the_rows(self):
+        result = fetch_columnar(self.conn.execute("SELECT * FROM users"), arraysize=4)
+        table = result.to_arrow()
+        self.assertEqual(list(zip(*(table.column(name).to_pylist() for name in result.names))),
+                         self.rows)
+        self.assertEqual(table.column('name').null_count, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
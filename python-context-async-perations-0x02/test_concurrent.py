@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Unit tests for fan_out in 3-concurrent.py"""
+
+import asyncio
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from connection_pool import AsyncSQLitePool
+
+fan_out = importlib.import_module('3-concurrent').fan_out
+
+
+class TestFanOut(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, age INTEGER)")
+        conn.executemany("INSERT INTO users (age) VALUES (?)", ((20 + i,) for i in range(30)))
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def asyncSetUp(self):
+        self.pool = AsyncSQLitePool(self.path, max_size=3)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    async def test_results_are_tagged_with_their_query(self):
+        queries = [("SELECT COUNT(*) FROM users WHERE age > ?", (age,)) for age in range(20, 50, 3)]
+        results = dict([result async for result in fan_out(queries, limit=4, pool=self.pool)])
+        self.assertEqual(results, {index: [(29 - 3 * index,)] for index in range(len(queries))})
+
+    async def test_connections_stay_within_the_pool(self):
+        queries = ["SELECT * FROM users"] * 20
+        results = [result async for result in fan_out(queries, limit=10, pool=self.pool)]
+        self.assertEqual(len(results), 20)
+        self.assertLessEqual(self.pool.stats()['created'], 3)
+
+    async def test_failed_query_is_reported_in_place(self):
+        queries = ["SELECT COUNT(*) FROM users", "SELECT * FROM missing"]
+        results = dict([result async for result in fan_out(queries, pool=self.pool)])
+        self.assertEqual(results[0], [(30,)])
+        self.assertIsInstance(results[1], sqlite3.OperationalError)
+
+    async def test_stopping_early_cancels_the_rest(self):
+        stream = fan_out(["SELECT COUNT(*) FROM users"] * 10, limit=1, pool=self.pool)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.05)  # let the cancelled queries hand their connections back
+        stats = self.pool.stats()
+        self.assertEqual(stats['size'], stats['idle'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Unit tests for connection_pool.py"""
+
+import asyncio
+import importlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from connection_pool import AsyncSQLitePool, PoolTimeoutError, SQLitePool
+
+fan_out = importlib.import_module('3-concurrent').fan_out
+
+
+class TestSQLitePool(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        self.pool = SQLitePool(self.path, max_size=1, checkout_timeout=0.05)
+
+    def tearDown(self):
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def test_released_connection_is_rolled_back_and_reused(self):
+        with self.pool.connection() as first:
+            first.execute("CREATE TABLE t (x)")
+            first.execute("INSERT INTO t VALUES (1)")
+            self.assertTrue(first.in_transaction)
+        with self.pool.connection() as second:
+            self.assertIs(second, first)
+            self.assertFalse(second.in_transaction)
+            self.assertEqual(second.execute("SELECT COUNT(*) FROM t").fetchone(), (0,))
+
+    def test_waiter_gets_the_released_connection(self):
+        held = self.pool.acquire()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.pool.acquire(timeout=5)))
+        waiter.start()
+        time.sleep(0.01)
+        self.pool.release(held)
+        waiter.join(5)
+        self.assertEqual(got, [held])
+        self.pool.release(held)
+
+    def test_stale_connections_are_closed_when_checkout_times_out(self):
+        pool = SQLitePool(self.path, max_size=2, checkout_timeout=0.05, idle_timeout=0.01)
+        idle, busy = pool.acquire(), pool.acquire()
+        pool.release(idle)
+        time.sleep(0.02)
+        # Evicting idle frees a slot, so fill it and the next checkout times out
+        pool.max_size = 1
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            idle.execute("SELECT 1")
+        self.assertEqual(pool.stats()['evicted'], 1)
+        pool.release(busy)
+        pool.close()
+
+    def test_release_after_close_closes_the_connection(self):
+        connection = self.pool.acquire()
+        self.pool.close()
+        self.pool.release(connection)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            connection.execute("SELECT 1")
+        self.assertEqual(self.pool.stats()['size'], 0)
+        with self.assertRaises(RuntimeError):
+            self.pool.acquire()
+
+    def test_close_fails_waiters(self):
+        held = self.pool.acquire()
+        errors = []
+
+        def wait():
+            try:
+                self.pool.acquire(timeout=5)
+            except RuntimeError as e:
+                errors.append(e)
+
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.01)
+        self.pool.close()
+        waiter.join(5)
+        self.assertEqual(len(errors), 1)
+        self.pool.release(held)
+
+
+class TestAsyncSQLitePool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        sqlite3.connect(self.path).close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def asyncSetUp(self):
+        self.pool = AsyncSQLitePool(self.path, max_size=2, checkout_timeout=1)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+
+    async def test_connections_are_reused(self):
+        async with self.pool.connection() as first:
+            pass
+        async with self.pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(self.pool.stats()['created'], 1)
+
+    async def test_checkout_times_out_when_full(self):
+        held = [await self.pool.acquire(), await self.pool.acquire()]
+        with self.assertRaises(PoolTimeoutError):
+            await self.pool.acquire(timeout=0.05)
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+        for db in held:
+            await self.pool.release(db)
+
+    async def test_waiter_is_woken_on_release(self):
+        held = [await self.pool.acquire(), await self.pool.acquire()]
+        waiter = asyncio.ensure_future(self.pool.acquire())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiter.done())
+        await self.pool.release(held[0])
+        self.assertIs(await asyncio.wait_for(waiter, 1), held[0])
+        await self.pool.release(held[0])
+        await self.pool.release(held[1])
+
+    async def test_cancelled_connect_gives_the_slot_back(self):
+        results = [result async for result in fan_out(["SELECT 1"] * 4, timeout=0.0001,
+                                                       pool=self.pool)]
+        self.assertEqual(len(results), 4)
+        stats = self.pool.stats()
+        self.assertEqual(stats['size'], stats['idle'])
+        rows = [rows async for _, rows in fan_out(["SELECT 1"] * 4, pool=self.pool)]
+        self.assertEqual(rows, [[(1,)]] * 4)
+
+    async def test_cancelled_rollback_frees_the_slot(self):
+        db = await self.pool.acquire()
+        await db.execute("BEGIN")
+        task = asyncio.ensure_future(self.pool.release(db))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(self.pool.stats()['size'], 0)
+        async with self.pool.connection(timeout=0.5) as fresh:
+            self.assertIsNot(fresh, db)
+
+    async def test_close_fails_waiters(self):
+        held = [await self.pool.acquire(), await self.pool.acquire()]
+        waiter = asyncio.ensure_future(self.pool.acquire())
+        await asyncio.sleep(0.01)
+        await self.pool.close()
+        with self.assertRaises(RuntimeError):
+            await waiter
+        for db in held:
+            await self.pool.release(db)
+        self.assertEqual(self.pool.stats()['size'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Unit tests for 0-databaseconnection.py"""
+
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from connection_pool import PoolTimeoutError, SQLitePool
+
+databaseconnection = importlib.import_module('0-databaseconnection')
+DatabaseConnection = databaseconnection.DatabaseConnection
+PooledDatabaseConnection = databaseconnection.PooledDatabaseConnection
+
+
+class TestDatabaseConnection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('ann')")
+        conn.commit()
+        conn.close()
+        self.pool = SQLitePool(self.path, max_size=1, checkout_timeout=0.05)
+
+    def tearDown(self):
+        self.pool.close()
+        self.tmp.cleanup()
+
+    def count(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_plain_connection_is_closed_on_exit(self):
+        with DatabaseConnection(self.path) as conn:
+            self.assertEqual(conn.execute("SELECT name FROM users").fetchall(), [('ann',)])
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+    def test_pooled_connection_is_reused(self):
+        with PooledDatabaseConnection(self.path, pool=self.pool) as first:
+            pass
+        with PooledDatabaseConnection(self.path, pool=self.pool) as second:
+            self.assertIs(second, first)
+            self.assertEqual(second.execute("SELECT COUNT(*) FROM users").fetchone(), (1,))
+        self.assertEqual(self.pool.stats()['created'], 1)
+
+    def test_uncommitted_work_is_rolled_back(self):
+        with PooledDatabaseConnection(self.path, pool=self.pool) as conn:
+            conn.execute("INSERT INTO users (name) VALUES ('bob')")
+        self.assertEqual(self.count(), 1)
+
+    def test_exception_propagates_and_releases(self):
+        with self.assertRaises(ValueError):
+            with PooledDatabaseConnection(self.path, pool=self.pool):
+                raise ValueError
+        self.assertEqual(self.pool.stats()['idle'], 1)
+
+    def test_checkout_timeout(self):
+        with PooledDatabaseConnection(self.path, pool=self.pool):
+            with self.assertRaises(PoolTimeoutError):
+                with PooledDatabaseConnection(self.path, pool=self.pool, timeout=0.01):
+                    pass
+
+
+if __name__ == "__main__":
+    unittest.main()
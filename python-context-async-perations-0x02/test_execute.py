@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Unit tests for 1-execute.py"""
+
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from parameterized import parameterized
+
+execute = importlib.import_module('1-execute')
+ExecuteQuery = execute.ExecuteQuery
+
+QUERY = "SELECT id, name, age FROM users WHERE age > ?"
+
+
+class TestExecuteQuery(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                         ((f"user{i}", 20 + i) for i in range(25)))
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @parameterized.expand([
+        ('tuple', tuple),
+        ('namedtuple', None),
+        ('dataclass', None),
+    ])
+    def test_row_factories(self, kind, row_type):
+        with ExecuteQuery(self.path, QUERY, (40,), row_factory=kind) as rows:
+            self.assertEqual(len(rows), 4)
+            if row_type is not None:
+                self.assertIsInstance(rows[0], row_type)
+            else:
+                self.assertEqual((rows[0].id, rows[0].name, rows[0].age), (22, 'user21', 41))
+
+    @parameterized.expand([
+        (0,),
+        (3,),
+        (10,),
+        (11,),
+        (25,),
+    ])
+    def test_rows_streamed_counts_rows_handed_out(self, taken):
+        context = ExecuteQuery(self.path, "SELECT * FROM users", stream=True, arraysize=10)
+        with context as rows:
+            for _ in range(taken):
+                next(rows)
+        self.assertEqual(context.rows_streamed, taken)
+
+    def test_columnar_stream_counts_batches_handed_out(self):
+        context = ExecuteQuery(self.path, "SELECT * FROM users", stream=True, arraysize=10,
+                               columnar=True)
+        with context as batches:
+            sizes = [len(batch) for batch in batches]
+        self.assertEqual(sizes, [10, 10, 5])
+        self.assertEqual(context.rows_streamed, 25)
+
+    def test_columnar_rejects_row_factory(self):
+        with self.assertRaises(ValueError):
+            ExecuteQuery(self.path, QUERY, columnar=True, row_factory='namedtuple')
+
+
+if __name__ == "__main__":
+    unittest.main()
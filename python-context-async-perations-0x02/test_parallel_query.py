@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Unit tests for parallel_query.py"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from parameterized import parameterized
+import parallel_query
+from parallel_query import (_run_ranges, parallel_aggregate, parallel_scan, read_only_uri,
+                            rowid_ranges)
+
+
+def count_range(uri, table, rowid_range):
+    """Worker used by the _run_ranges tests"""
+    return rowid_range[1] - rowid_range[0] + 1
+
+
+class TestParallelQuery(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, age) VALUES (?, ?)",
+                         ((f"user{i}", 18 + i * 7 % 60) for i in range(500)))
+        conn.execute("CREATE TABLE empty (id INTEGER PRIMARY KEY)")
+        conn.commit()
+        self.rows = conn.execute("SELECT * FROM users ORDER BY rowid").fetchall()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @parameterized.expand([(1,), (3,), (7,), (1000,)])
+    def test_ranges_cover_the_table_once(self, partitions):
+        ranges = rowid_ranges(self.path, partitions=partitions)
+        self.assertEqual(len(ranges), min(partitions, 500))
+        self.assertEqual(ranges[0][0], 1)
+        self.assertEqual(ranges[-1][1], 500)
+        for (_, high), (low, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(low, high + 1)
+
+    def test_empty_table_has_no_ranges(self):
+        self.assertEqual(rowid_ranges(self.path, 'empty'), [])
+
+    def test_rejects_injected_identifiers(self):
+        with self.assertRaises(ValueError):
+            rowid_ranges(self.path, 'users; DROP TABLE users')
+
+    def test_connections_are_read_only(self):
+        conn = parallel_query._connection(read_only_uri(self.path))
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM users")
+
+    @parameterized.expand([
+        (None, (), True),
+        ("age > ?", (40,), True),
+        ("age > ?", (40,), False),
+    ])
+    def test_scan_matches_a_serial_scan(self, where, params, ordered):
+        rows = list(parallel_scan(self.path, where, params, workers=2, partitions=5,
+                                  ordered=ordered))
+        expected = [row for row in self.rows if where is None or row[2] > params[0]]
+        self.assertEqual(rows if ordered else sorted(rows), expected)
+
+    def test_aggregate_matches_a_serial_pass(self):
+        result = parallel_aggregate(self.path, 'age', "age < ?", (30,), workers=2,
+                                    partitions=6, immutable=True)
+        ages = [row[2] for row in self.rows if row[2] < 30]
+        self.assertEqual(result, {'count': len(ages), 'sum': sum(ages), 'min': min(ages),
+                                  'max': max(ages), 'avg': sum(ages) / len(ages)})
+
+    def test_aggregate_without_matches(self):
+        result = parallel_aggregate(self.path, where="age > 1000", workers=2)
+        self.assertEqual(result, {'count': 0, 'sum': None, 'min': None, 'max': None, 'avg': None})
+
+    @parameterized.expand([(True,), (False,)])
+    def test_window_bounds_the_ranges_taken(self, ordered):
+        taken = []
+
+        def ranges():
+            for index in range(20):
+                taken.append(index)
+                yield (index * 10, index * 10 + 9)
+
+        results = _run_ranges(count_range, None, 'users', ranges(), (), 1, ordered, max_pending=2)
+        self.assertEqual(next(results), 10)
+        self.assertLessEqual(len(taken), 3)
+        results.close()
+        self.assertLessEqual(len(taken), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,30 +1,17 @@
+import json
 import sqlite3
-import functools
-from datetime import datetime
-
-
-def log_queries(func):
-    """Decorator to log SQL queries before executing them"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Extract the query from arguments
-        # Check if 'query' is in kwargs
-        if 'query' in kwargs:
-            query = kwargs['query']
-        # Otherwise, assume it's the first positional argument
-        elif args:
-            query = args[0]
-        else:
-            query = "No query provided"
-        
-        # Log the query with timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] Executing query: {query}")
-        
-        # Execute the original function
-        return func(*args, **kwargs)
-    
-    return wrapper
+
+from query_metrics import configure_sink, instrument, metrics
+
+
+def log_queries(func=None, *, sample_rate=0.01, sink=None):
+    """Decorator to log SQL queries and record how they performed
+
+    Latency, row count and errors are aggregated per query fingerprint in
+    query_metrics.metrics; only a sampled fraction of calls is written out,
+    as JSON lines, by a background sink (see query_metrics.configure_sink).
+    """
+    return instrument(func, sample_rate=sample_rate, sink=sink)
 
 
 @log_queries
@@ -39,5 +26,8 @@ def fetch_all_users(query):
 
 # Fetch users while logging the query
 if __name__ == "__main__":
+    sink = configure_sink('query_log.jsonl')
     users = fetch_all_users(query="SELECT * FROM users")
     print(f"Fetched {len(users)} users")
+    print(json.dumps(metrics.snapshot(), indent=2))
+    sink.close()
@@ -1,23 +1,5 @@
-import sqlite3
-import functools
-
-
-def with_db_connection(func):
-    """Decorator to automatically handle database connections"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('users.db')
-        
-        try:
-            # Pass connection to the function
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            # Always close the connection
-            conn.close()
-    
-    return wrapper
+from batch_loader import fetch_by_ids
+from connection_manager import with_db_connection
 
 
 @with_db_connection
@@ -27,6 +9,12 @@ def get_user_by_id(conn, user_id):
     return cursor.fetchone()
 
 
+@with_db_connection
+def get_users_by_ids(conn, user_ids):
+    """Looks up many users with chunked IN queries; returns a dict id -> row"""
+    return fetch_by_ids(conn, user_ids)
+
+
 # Fetch user by ID with automatic connection handling
 if __name__ == "__main__":
     user = get_user_by_id(user_id=1)
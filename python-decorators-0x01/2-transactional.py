@@ -1,44 +1,76 @@
-import sqlite3
+import inspect
 import functools
 
+from cache_backends import async_track_writes, invalidate_statements, track_writes
+from connection_manager import async_savepoint, savepoint, with_db_connection
 
-def with_db_connection(func):
-    """Decorator to automatically handle database connections"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('users.db')
-        
-        try:
-            # Pass connection to the function
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            # Always close the connection
-            conn.close()
-    
-    return wrapper
+
+# id() of the connections an outermost transactional call is running on
+_outer = set()
 
 
 def transactional(func):
-    """Decorator to manage database transactions with commit/rollback"""
+    """Decorator to manage database transactions with commit/rollback
+
+    Works on coroutine functions taking an aiosqlite connection too.
+    """
+    if inspect.iscoroutinefunction(func):
+        return _async_transactional(func)
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        if conn.in_transaction or id(conn) in _outer:
+            # Nested in an outer transaction (or a write batch): a failure only
+            # undoes this call's work and whoever owns the transaction commits
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            with savepoint(conn):
+                return func(conn, *args, **kwargs)
+        _outer.add(id(conn))
         try:
             # Execute the function
-            result = func(conn, *args, **kwargs)
+            with track_writes(conn) as writes:
+                result = func(conn, *args, **kwargs)
             # If successful, commit the transaction
             conn.commit()
+            # Drop cached results that depend on the rows/tables just written
+            invalidate_statements(writes)
             return result
         except Exception as e:
             # If error occurs, rollback the transaction
             conn.rollback()
             # Re-raise the exception for proper error handling
             raise e
+        finally:
+            _outer.discard(id(conn))
     
     return wrapper
 
 
+def _async_transactional(func):
+    @functools.wraps(func)
+    async def wrapper(conn, *args, **kwargs):
+        if conn.in_transaction or id(conn) in _outer:
+            if not conn.in_transaction:
+                await conn.execute("BEGIN")
+            async with async_savepoint(conn):
+                return await func(conn, *args, **kwargs)
+        _outer.add(id(conn))
+        try:
+            async with async_track_writes(conn) as writes:
+                result = await func(conn, *args, **kwargs)
+            await conn.commit()
+            invalidate_statements(writes)
+            return result
+        except Exception as e:
+            await conn.rollback()
+            raise e
+        finally:
+            _outer.discard(id(conn))
+
+    return wrapper
+
+
 @with_db_connection
 @transactional
 def update_user_email(conn, user_id, new_email):
@@ -1,67 +1,194 @@
-import time
+import asyncio
+import inspect
 import sqlite3
 import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    import aiosqlite
+except ImportError:  # only needed for coroutine functions
+    aiosqlite = None
 
-query_cache = {}
+from cache_backends import _MISSING, LRUTTLCache, set_if_unchanged, write_generation
+from connection_manager import get_async_pool, get_manager, with_db_connection
+from single_flight import AsyncSingleFlight, SingleFlight
+from sql_utils import make_cache_key, query_dependencies
 
 
-def with_db_connection(func):
-    """Decorator to automatically handle database connections"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        # Open database connection
-        conn = sqlite3.connect('users.db')
-        
-        try:
-            # Pass connection to the function
-            result = func(conn, *args, **kwargs)
-            return result
-        finally:
-            # Always close the connection
-            conn.close()
-    
-    return wrapper
+# Bounded, thread-safe replacement for the old module-level dict; swap in
+# cache_backends.SQLiteCache to share results between worker processes
+query_cache = LRUTTLCache(max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300)
 
+# Concurrent misses for the same key run the query once
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+_refresher = None
+_refresher_lock = threading.Lock()
+_refresh_tasks = set()
 
-def cache_query(func):
-    """Decorator to cache database query results"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
+
+def _refresh_executor():
+    """Threads that re-run queries for stale entries in the background"""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+        return _refresher
+
+
+def cache_query(func=None, *, cache=None, ttl=None, database=None, verbose=True,
+                single_flight=True, wait_timeout=30.0, stale_ttl=0):
+    """Decorator to cache database query results
+
+    Usable bare (@cache_query) or configured (@cache_query(cache=..., ttl=...)).
+    Results go to `cache` (the module-level query_cache by default), which
+    bounds size, expires entries and counts hits, misses and evictions.
+    Keys combine the target database, the normalized query text and every
+    other argument (bound parameters, extra kwargs), so equivalent SQL shares
+    an entry and different parameters never collide. Coroutine functions
+    are awaited; the backends never block long enough to stall the loop.
+
+    With single_flight, concurrent misses on one key run the query once:
+    the other callers wait (up to wait_timeout seconds, then TimeoutError)
+    and get the same result or exception (callers inside a transaction
+    always run their own query). A result is not cached if a table it
+    depends on was written while it ran. An entry that expired less than
+    stale_ttl seconds ago is still returned while one background refresh
+    (on its own connection) replaces it.
+    """
+    if func is None:
+        return lambda f: cache_query(f, cache=cache, ttl=ttl, database=database,
+                                     verbose=verbose, single_flight=single_flight,
+                                     wait_timeout=wait_timeout, stale_ttl=stale_ttl)
+
+    def lookup(args, kwargs):
+        """Returns (query, key, params, cached result or _MISSING, stale)"""
+        backend = query_cache if cache is None else cache
         # Extract the query from arguments
         # Check if 'query' is in kwargs
         if 'query' in kwargs:
             query = kwargs['query']
+            rest = args[1:]
         # Otherwise, check positional arguments (skip conn which is first)
         elif len(args) > 1:
             query = args[1]
+            rest = args[2:]
         else:
-            query = None
-        
+            return None, None, None, _MISSING, False
+        if not query:
+            return None, None, None, _MISSING, False
+
         # If query is found, check cache
-        if query:
-            if query in query_cache:
+        if len(kwargs) > ('query' in kwargs):
+            extra = {k: v for k, v in kwargs.items() if k != 'query'}
+            key = make_cache_key(query, (rest, extra), database or get_manager().path)
+        else:
+            key = make_cache_key(query, rest, database or get_manager().path)
+        params = kwargs['params'] if 'params' in kwargs else (rest[0] if rest else None)
+        result, stale = backend.lookup(key, stale_ttl)
+        if verbose:
+            if result is _MISSING:
+                print("Executing query and caching result:", query)
+            else:
                 print("Using cached result for query:", query)
-                return query_cache[query]
-        
+        return query, key, params, result, stale
+
+    def begin(query, params):
+        """Returns the query's dependency tags and their tables' write generation"""
+        if not query:
+            return None, None
+        tags = query_dependencies(query, params)
+        return tags, write_generation({table for table, _ in tags})
+
+    def store(query, key, tags, generation, result):
+        # Cache the result, tagged with the tables (or primary-key rows) it
+        # was read from so writes to them invalidate it; skipped when one of
+        # them was written while the query ran, as the result may predate it
+        if query:
+            backend = query_cache if cache is None else cache
+            options = {'tags': tags} if ttl is None else {'ttl': ttl, 'tags': tags}
+            set_if_unchanged(backend, key, result, {table for table, _ in tags}, generation,
+                             **options)
+
+    def in_transaction(args):
+        # A caller inside a transaction may see its own uncommitted writes,
+        # so it must not share a result read on another connection
+        return bool(args) and bool(getattr(args[0], 'in_transaction', False))
+
+    if inspect.iscoroutinefunction(func):
+        async def run(query, key, params, args, kwargs):
+            tags, generation = begin(query, params)
+            result = await func(*args, **kwargs)
+            store(query, key, tags, generation, result)
+            return result
+
+        async def refresh(query, key, params, args, kwargs):
+            # The caller keeps its connection; refresh on a pooled one to
+            # the database the cache key names (key[0])
+            if args and aiosqlite is not None and isinstance(args[0], aiosqlite.Connection):
+                async with get_async_pool(path=key[0]).connection() as db:
+                    return await run(query, key, params, (db,) + args[1:], kwargs)
+            return await run(query, key, params, args, kwargs)
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query, key, params, result, stale = lookup(args, kwargs)
+            if result is not _MISSING:
+                if stale and not _async_flights.in_flight(key):
+                    task = asyncio.get_running_loop().create_task(_async_flights.do(
+                        key, lambda: refresh(query, key, params, args, kwargs)))
+                    _refresh_tasks.add(task)
+                    # Retrieve any error; the stale value stays until the next try
+                    task.add_done_callback(lambda t: _refresh_tasks.discard(t)
+                                           or t.cancelled() or t.exception())
+                return result
+            if not (query and single_flight) or in_transaction(args):
+                return await run(query, key, params, args, kwargs)
+            return await _async_flights.do(
+                key, lambda: run(query, key, params, args, kwargs), wait_timeout)
+
+        return async_wrapper
+
+    def run(query, key, params, args, kwargs):
         # Execute the function if not cached
-        print("Executing query and caching result:", query)
+        tags, generation = begin(query, params)
         result = func(*args, **kwargs)
-        
-        # Cache the result
-        if query:
-            query_cache[query] = result
-        
+        store(query, key, tags, generation, result)
         return result
-    
+
+    def refresh(query, key, params, args, kwargs):
+        # The caller keeps its connection; refresh on this thread's own one
+        # to the database the cache key names (key[0])
+        if args and isinstance(args[0], sqlite3.Connection):
+            conn = get_manager(key[0]).connection()
+            try:
+                return run(query, key, params, (conn,) + args[1:], kwargs)
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+        return run(query, key, params, args, kwargs)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        query, key, params, result, stale = lookup(args, kwargs)
+        if result is not _MISSING:
+            if stale and not _flights.in_flight(key):
+                _refresh_executor().submit(
+                    _flights.do, key, lambda: refresh(query, key, params, args, kwargs))
+            return result
+        if not (query and single_flight) or in_transaction(args):
+            return run(query, key, params, args, kwargs)
+        return _flights.do(key, lambda: run(query, key, params, args, kwargs), wait_timeout)
+
     return wrapper
 
 
 @with_db_connection
 @cache_query
-def fetch_users_with_cache(conn, query):
+def fetch_users_with_cache(conn, query, params=()):
     cursor = conn.cursor()
-    cursor.execute(query)
+    cursor.execute(query, params)
     return cursor.fetchall()
 
 
@@ -75,3 +202,4 @@ if __name__ == "__main__":
     print("Second call:")
     users_again = fetch_users_with_cache(query="SELECT * FROM users")
     print(f"Fetched {len(users_again)} users")
+    print("Cache stats:", query_cache.stats.as_dict())
@@ -0,0 +1,213 @@
+import asyncio
+import inspect
+from contextlib import contextmanager
+from concurrent.futures import Future
+
+from connection_manager import get_manager
+from sql_utils import PRIMARY_KEYS, DEFAULT_PRIMARY_KEY
+
+
+# Keys per IN (...) query; well under SQLite's and MySQL's placeholder limits
+MAX_IN_PARAMS = 500
+
+
+def _in_query(table, key, count):
+    placeholders = ", ".join("?" * count)
+    return f"SELECT * FROM {table} WHERE {key} IN ({placeholders})"
+
+
+def _index_rows(description, rows, key):
+    column = [field[0] for field in description].index(key)
+    return {row[column]: row for row in rows}
+
+
+def fetch_by_ids(conn, ids, table='users', key=None, chunk_size=MAX_IN_PARAMS):
+    """
+    Fetches many rows by primary key with one IN query per chunk
+
+    Args:
+        conn: sqlite3 connection
+        ids: Keys to look up (duplicates are fetched once)
+        table: Table to read
+        key: Key column (the table's primary key by default)
+        chunk_size: Keys per query
+
+    Returns:
+        dict: key -> row, for the keys that exist
+    """
+    key = key or PRIMARY_KEYS.get(table, DEFAULT_PRIMARY_KEY)
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        cursor = conn.execute(_in_query(table, key, len(chunk)), chunk)
+        found.update(_index_rows(cursor.description, cursor.fetchall(), key))
+    return found
+
+
+async def async_fetch_by_ids(db, ids, table='users', key=None, chunk_size=MAX_IN_PARAMS):
+    """fetch_by_ids for an aiosqlite connection"""
+    key = key or PRIMARY_KEYS.get(table, DEFAULT_PRIMARY_KEY)
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        async with db.execute(_in_query(table, key, len(chunk)), chunk) as cursor:
+            found.update(_index_rows(cursor.description, await cursor.fetchall(), key))
+    return found
+
+
+class BatchLoader:
+    """
+    DataLoader-style coalescing of single-key lookups
+
+    load() calls made together are answered by one call to `batch_fn` per
+    `max_batch` distinct keys, and every key is cached for the loader's
+    lifetime, so repeated lookups cost nothing. Create one loader per
+    request (or unit of work); loaders are not thread-safe.
+
+    Sync callers group lookups with `with loader.batch():` and read the
+    returned futures after the block; outside a batch scope each load()
+    is dispatched at once. Asyncio callers `await loader.aload(key)`: all
+    lookups made in the same event-loop tick are dispatched together.
+    """
+
+    def __init__(self, batch_fn, max_batch=MAX_IN_PARAMS, cache=True):
+        """
+        Args:
+            batch_fn: Function (or coroutine function) taking a list of keys
+                and returning a dict key -> value; missing keys load as None
+            max_batch: Most keys passed to one batch_fn call
+            cache: Remember loaded keys for later load() calls
+        """
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.cache = cache
+        self.batches = 0
+        self._futures = {}
+        self._pending = []
+        self._depth = 0
+        self._async_futures = {}
+        self._async_pending = []
+        self._dispatch_tasks = set()  # strong references until each dispatch finishes
+
+    @contextmanager
+    def batch(self):
+        """Collects the load() calls in the block into as few queries as possible"""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                self.dispatch()
+
+    def load(self, key):
+        """
+        Returns:
+            Future: Resolves to the value for key once its batch has run
+        """
+        future = self._futures.get(key)
+        if future is None:
+            future = Future()
+            if self.cache:
+                self._futures[key] = future
+            self._pending.append((key, future))
+        if not self._depth:
+            self.dispatch()
+        return future
+
+    def load_many(self, keys):
+        """Loads several keys in one go and returns their values in order"""
+        with self.batch():
+            futures = [self.load(key) for key in keys]
+        return [future.result() for future in futures]
+
+    def dispatch(self):
+        """Runs batch_fn for every pending key"""
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.max_batch):
+            chunk = pending[start:start + self.max_batch]
+            self.batches += 1
+            try:
+                found = self.batch_fn([key for key, _ in chunk])
+            except Exception as e:
+                for key, future in chunk:
+                    self._futures.pop(key, None)  # let a later load retry
+                    future.set_exception(e)
+                continue
+            for key, future in chunk:
+                future.set_result(found.get(key))
+
+    async def aload(self, key):
+        """Loads key, sharing one batch with every aload() of this loop tick"""
+        future = self._async_futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            if self.cache:
+                self._async_futures[key] = future
+            if not self._async_pending:
+                loop.call_soon(self._start_async_dispatch, loop)
+            self._async_pending.append((key, future))
+        return await asyncio.shield(future)
+
+    async def aload_many(self, keys):
+        return await asyncio.gather(*(self.aload(key) for key in keys))
+
+    def _start_async_dispatch(self, loop):
+        # The loop only keeps a weak reference to tasks
+        task = loop.create_task(self._async_dispatch())
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _async_dispatch(self):
+        pending, self._async_pending = self._async_pending, []
+        for start in range(0, len(pending), self.max_batch):
+            chunk = pending[start:start + self.max_batch]
+            keys = [key for key, _ in chunk]
+            self.batches += 1
+            try:
+                if inspect.iscoroutinefunction(self.batch_fn):
+                    found = await self.batch_fn(keys)
+                else:
+                    # Blocking batch function: keep the event loop free
+                    found = await asyncio.to_thread(self.batch_fn, keys)
+            except Exception as e:
+                for key, future in chunk:
+                    self._async_futures.pop(key, None)
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for key, future in chunk:
+                if not future.done():
+                    future.set_result(found.get(key))
+
+    def clear(self, key=None):
+        """Forgets one cached key, or all of them"""
+        if key is None:
+            self._futures.clear()
+            self._async_futures.clear()
+        else:
+            self._futures.pop(key, None)
+            self._async_futures.pop(key, None)
+
+
+def user_loader(conn=None, **kwargs):
+    """
+    BatchLoader of users rows by id
+
+    Args:
+        conn: sqlite3 connection; defaults to the calling thread's
+            with_db_connection connection at dispatch time
+    """
+    if conn is not None:
+        return BatchLoader(lambda ids: fetch_by_ids(conn, ids), **kwargs)
+    return BatchLoader(lambda ids: fetch_by_ids(get_manager().connection(), ids), **kwargs)
+
+
+def async_user_loader(db, **kwargs):
+    """BatchLoader of users rows by id over an aiosqlite connection"""
+    async def load(ids):
+        return await async_fetch_by_ids(db, ids)
+    return BatchLoader(load, **kwargs)
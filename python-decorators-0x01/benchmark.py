@@ -0,0 +1,415 @@
+"""
+Benchmarks for the query decorators
+
+    python3 benchmark.py cache-key --iterations 200000
+    python3 benchmark.py connection --db users.db --iterations 20000
+    python3 benchmark.py instrument --iterations 200000
+    python3 benchmark.py writes --writes 5000 --threads 16
+    python3 benchmark.py loader --lookups 5000
+    python3 benchmark.py async-stack --tasks 200 --operations 5000
+    python3 benchmark.py herd --threads 64 --seconds 3
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import importlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import timeit
+from datetime import datetime
+
+try:
+    import aiosqlite
+except ImportError:  # only needed by the async benchmarks
+    aiosqlite = None
+
+import connection_manager
+import query_metrics
+from batch_loader import async_user_loader, user_loader
+from cache_backends import LRUTTLCache
+from sql_utils import make_cache_key
+from retry_policy import retry_on_failure
+from write_batcher import WriteBatcher
+
+
+def _per_call(statement, iterations, **names):
+    """Mean seconds per call of a zero-argument callable"""
+    return timeit.timeit(statement, number=iterations, globals=names) / iterations
+
+
+def bench_cache_key(args):
+    """Cost of building a cache key versus the rest of a cache hit"""
+    cache_query = importlib.import_module('4-cache_query')
+    query = """
+        SELECT id, name, email
+          FROM users
+         WHERE age > ? AND email LIKE ?
+    """
+    params = (25, '%@example.com')
+
+    conn = sqlite3.connect(':memory:')
+    backend = LRUTTLCache()
+
+    @cache_query.cache_query(cache=backend, verbose=False)
+    def fetch(conn, query, params=()):
+        return [(1, 'name', 'email')]
+
+    fetch(conn, query, params)  # populate
+    key = make_cache_key(query, (params,), 'users.db')
+
+    rows = [
+        ("make_cache_key", _per_call("make_cache_key(query, (params,), 'users.db')",
+                                     args.iterations, make_cache_key=make_cache_key,
+                                     query=query, params=params)),
+        ("backend.get", _per_call("backend.get(key)", args.iterations,
+                                  backend=backend, key=key)),
+        ("cached call", _per_call("fetch(conn, query, params)", args.iterations,
+                                  fetch=fetch, conn=conn, query=query, params=params)),
+    ]
+    print(f"{'step':<16} {'ns/call':>10}")
+    for label, seconds in rows:
+        print(f"{label:<16} {seconds * 1e9:>10.0f}")
+
+
+def _connect_per_call(path):
+    """The original with_db_connection: a fresh connection for every call"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            conn = sqlite3.connect(path)
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                conn.close()
+        return wrapper
+    return decorator
+
+
+def bench_connection(args):
+    """Per-call latency of a primary-key lookup: connect per call vs persistent"""
+    connection_manager.configure(args.db)
+
+    def get_user_by_id(conn, user_id):
+        return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+    variants = [
+        ("connect per call", _connect_per_call(args.db)(get_user_by_id)),
+        ("persistent", connection_manager.with_db_connection(get_user_by_id)),
+    ]
+    print(f"{'strategy':<18} {'us/call':>10}")
+    for label, fetch in variants:
+        fetch(1)  # warm up (opens the persistent connection)
+        seconds = _per_call("fetch(1)", args.iterations, fetch=fetch)
+        print(f"{label:<18} {seconds * 1e6:>10.1f}")
+    connection_manager.get_manager().close_all()
+
+
+def _print_every_call(func):
+    """The original log_queries: timestamp and print on every call"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        query = kwargs['query'] if 'query' in kwargs else args[0]
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[{timestamp}] Executing query: {query}")
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def bench_instrument(args):
+    """Per-call overhead of query instrumentation on a no-op query function"""
+    def run(query):
+        return [(1,)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = query_metrics.JSONLinesSink(os.path.join(tmp, 'log.jsonl'))
+        variants = [
+            ("bare", run),
+            ("print per call", _print_every_call(run)),
+            ("sampled out", query_metrics.instrument(run, sample_rate=0,
+                                                     registry=query_metrics.QueryMetrics())),
+            ("1% sampled", query_metrics.instrument(run, sample_rate=0.01, sink=sink,
+                                                    registry=query_metrics.QueryMetrics())),
+            ("every call", query_metrics.instrument(run, sample_rate=1.0, sink=sink,
+                                                    registry=query_metrics.QueryMetrics())),
+        ]
+        query = "SELECT * FROM users WHERE age > 25"
+        baseline = None
+        print(f"{'variant':<16} {'ns/call':>10} {'overhead':>10}")
+        for label, fetch in variants:
+            # The print variant writes to a discarded buffer, not the terminal
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds = _per_call("fetch(query=query)", args.iterations,
+                                    fetch=fetch, query=query)
+            baseline = seconds if baseline is None else baseline
+            print(f"{label:<16} {seconds * 1e9:>10.0f} {(seconds - baseline) * 1e9:>10.0f}")
+        sink.close()
+        print(f"sink dropped {sink.dropped} events")
+
+
+def _make_users_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                     ((f"user{i}", f"user{i}@example.com", 20 + i % 60) for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def _writes_per_second(write, writes, threads):
+    """Runs `writes` calls of write(user_id, email) spread over `threads` threads"""
+    per_thread = writes // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            write(offset + i % 1000 + 1, f"w{offset}-{i}@example.com")
+
+    pool = [threading.Thread(target=worker, args=(t * 1000,)) for t in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def bench_writes(args):
+    """Writes/sec of per-call commits versus group commit at several windows"""
+    transactional = importlib.import_module('2-transactional').transactional
+    pragmas = dict(connection_manager.DEFAULT_PRAGMAS, synchronous=args.synchronous)
+
+    def update_email(conn, user_id, email):
+        conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user_id))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.threads * 1000)
+        print(f"{'strategy':<22} {'writes/s':>10} {'mean batch':>11}")
+
+        connection_manager.configure(path, pragmas)
+        per_call = connection_manager.with_db_connection(transactional(update_email))
+        rate = _writes_per_second(per_call, args.writes, args.threads)
+        print(f"{'commit per call':<22} {rate:>10.0f} {1:>11.1f}")
+        connection_manager.get_manager().close_all()
+
+        for window in args.windows:
+            batcher = WriteBatcher(path, window=window / 1000, pragmas=pragmas)
+            rate = _writes_per_second(functools.partial(batcher.call, update_email),
+                                      args.writes, args.threads)
+            batcher.close()
+            label = f"group commit {window:g}ms"
+            print(f"{label:<22} {rate:>10.0f} {batcher.stats()['mean_batch']:>11.1f}")
+
+
+def bench_loader(args):
+    """Lookups/sec of per-id get_user_by_id versus the batched loader"""
+    if aiosqlite is None:
+        raise SystemExit("the loader benchmark needs aiosqlite")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.users)
+        connection_manager.configure(path)
+        ids = [random.randint(1, args.users) for _ in range(args.lookups)]
+
+        def get_user_by_id(conn, user_id):
+            return conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+
+        def timed(run):
+            start = time.perf_counter()
+            run()
+            return args.lookups / (time.perf_counter() - start)
+
+        per_connect = _connect_per_call(path)(get_user_by_id)
+        persistent = connection_manager.with_db_connection(get_user_by_id)
+
+        def batched():
+            user_loader().load_many(ids)
+
+        async def async_per_id():
+            async with aiosqlite.connect(path) as db:
+                for user_id in ids:
+                    async with db.execute("SELECT * FROM users WHERE id = ?", (user_id,)) as cursor:
+                        await cursor.fetchone()
+
+        async def async_batched():
+            async with aiosqlite.connect(path) as db:
+                await async_user_loader(db).aload_many(ids)
+
+        rows = [
+            ("per id, connect per call", timed(lambda: [per_connect(i) for i in ids])),
+            ("per id, persistent conn", timed(lambda: [persistent(i) for i in ids])),
+            ("loader (IN batches)", timed(batched)),
+            ("async per id", timed(lambda: asyncio.run(async_per_id()))),
+            ("async loader", timed(lambda: asyncio.run(async_batched()))),
+        ]
+        print(f"{'path':<26} {'lookups/s':>12}")
+        for label, rate in rows:
+            print(f"{label:<26} {rate:>12.0f}")
+        connection_manager.get_manager().close_all()
+
+
+def bench_async_stack(args):
+    """Concurrent reads and writes through the coroutine versions of every decorator"""
+    if aiosqlite is None:
+        raise SystemExit("the async-stack benchmark needs aiosqlite")
+    transactional = importlib.import_module('2-transactional').transactional
+    cache_query = importlib.import_module('4-cache_query').cache_query
+    log_queries = importlib.import_module('0-log_queries').log_queries
+    with_db_connection = connection_manager.with_db_connection
+
+    @with_db_connection
+    @cache_query(cache=LRUTTLCache(), verbose=False)
+    @log_queries(sample_rate=0)
+    async def fetch_age(conn, query, params=()):
+        async with conn.execute(query, params) as cursor:
+            return await cursor.fetchone()
+
+    @with_db_connection
+    @retry_on_failure(retries=5, delay=0.01, verbose=False)
+    @transactional
+    async def birthday(conn, user_id):
+        await conn.execute("UPDATE users SET age = age + 1 WHERE id = ?", (user_id,))
+
+    async def run():
+        users = 10
+        query = "SELECT age FROM users WHERE id = ?"
+        before = {i: (await fetch_age(query, (i,)))[0] for i in range(1, users + 1)}
+        semaphore = asyncio.Semaphore(args.tasks)
+        expected = dict.fromkeys(before, 0)
+
+        async def operation(n):
+            user_id = n % users + 1
+            async with semaphore:
+                if n % 4 == 0:
+                    await birthday(user_id)
+                    expected[user_id] += 1
+                else:
+                    await fetch_age(query, (user_id,))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(operation(n) for n in range(args.operations)))
+        elapsed = time.perf_counter() - start
+        # Every write invalidated the cached reads, so these are fresh
+        after = {i: (await fetch_age(query, (i,)))[0] for i in before}
+        stale = [i for i in before if after[i] != before[i] + expected[i]]
+        pool = connection_manager.get_async_pool().stats()
+        await connection_manager.close_async_pool()
+        print(f"{args.operations} operations ({args.tasks} concurrent): "
+              f"{args.operations / elapsed:.0f} ops/s, pool {pool}")
+        print("consistent" if not stale else f"stale or lost writes for users {stale}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, 100)
+        connection_manager.configure(path)
+        asyncio.run(run())
+
+
+def bench_herd(args):
+    """Many threads on one hot key: plain misses vs single-flight vs stale-while-revalidate"""
+    cache_query = importlib.import_module('4-cache_query').cache_query
+    query = "SELECT age % 7, COUNT(*), AVG(LENGTH(email)) FROM users GROUP BY age % 7"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'users.db')
+        _make_users_db(path, args.users)
+        connection_manager.configure(path)
+        modes = [
+            ("no coalescing", dict(single_flight=False)),
+            ("single-flight", dict(single_flight=True)),
+            ("single-flight + SWR", dict(single_flight=True, stale_ttl=60)),
+        ]
+        print(f"{'mode':<22} {'calls':>8} {'queries':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for label, options in modes:
+            executed = [0]
+
+            @connection_manager.with_db_connection
+            @cache_query(cache=LRUTTLCache(ttl=args.ttl), verbose=False, **options)
+            def hot(conn, query):
+                executed[0] += 1
+                return conn.execute(query).fetchall()
+
+            latencies = []
+            stop = time.monotonic() + args.seconds
+
+            def worker():
+                mine = []
+                while time.monotonic() < stop:
+                    start = time.perf_counter()
+                    hot(query)
+                    mine.append(time.perf_counter() - start)
+                    # Request handling between lookups; a tight loop of pure-Python
+                    # cache hits would starve the querying threads of the GIL
+                    time.sleep(args.think)
+                latencies.extend(mine)
+
+            pool = [threading.Thread(target=worker) for _ in range(args.threads)]
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            latencies.sort()
+            pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+            print(f"{label:<22} {len(latencies):>8} {executed[0]:>8} "
+                  f"{pick(0.5):>8.3f} {pick(0.99):>8.3f} {latencies[-1] * 1000:>8.1f}")
+        connection_manager.get_manager().close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cache_key = commands.add_parser("cache-key", help=bench_cache_key.__doc__)
+    cache_key.add_argument("--iterations", type=int, default=200000)
+    cache_key.set_defaults(func=bench_cache_key)
+
+    connection = commands.add_parser("connection", help=bench_connection.__doc__)
+    connection.add_argument("--db", default=connection_manager.DEFAULT_DATABASE)
+    connection.add_argument("--iterations", type=int, default=20000)
+    connection.set_defaults(func=bench_connection)
+
+    instrument = commands.add_parser("instrument", help=bench_instrument.__doc__)
+    instrument.add_argument("--iterations", type=int, default=200000)
+    instrument.set_defaults(func=bench_instrument)
+
+    writes = commands.add_parser("writes", help=bench_writes.__doc__)
+    writes.add_argument("--writes", type=int, default=5000)
+    writes.add_argument("--threads", type=int, default=16)
+    writes.add_argument("--windows", type=float, nargs="+", default=[0, 1, 5, 20],
+                        help="batch windows in milliseconds")
+    writes.add_argument("--synchronous", default="FULL",
+                        help="PRAGMA synchronous for both strategies")
+    writes.set_defaults(func=bench_writes)
+
+    loader = commands.add_parser("loader", help=bench_loader.__doc__)
+    loader.add_argument("--lookups", type=int, default=5000)
+    loader.add_argument("--users", type=int, default=100000)
+    loader.set_defaults(func=bench_loader)
+
+    async_stack = commands.add_parser("async-stack", help=bench_async_stack.__doc__)
+    async_stack.add_argument("--tasks", type=int, default=200)
+    async_stack.add_argument("--operations", type=int, default=5000)
+    async_stack.set_defaults(func=bench_async_stack)
+
+    herd = commands.add_parser("herd", help=bench_herd.__doc__)
+    herd.add_argument("--threads", type=int, default=64)
+    herd.add_argument("--seconds", type=float, default=3.0)
+    herd.add_argument("--users", type=int, default=200000)
+    herd.add_argument("--ttl", type=float, default=0.5, help="cache ttl in seconds")
+    herd.add_argument("--think", type=float, default=0.001,
+                      help="seconds each thread sleeps between lookups")
+    herd.set_defaults(func=bench_herd)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
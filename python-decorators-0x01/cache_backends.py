@@ -0,0 +1,496 @@
+import os
+import sys
+import time
+import pickle
+import sqlite3
+import weakref
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+from sql_utils import write_target
+
+
+_MISSING = object()
+
+# Every cache created in this process, so writes can invalidate all of them
+_caches = weakref.WeakSet()
+
+
+# table -> invalidations so far; lets a query that started before a write
+# notice the write and not cache what it read
+_generations = {}
+_generations_lock = threading.RLock()
+
+
+def invalidate(table, row=None):
+    """
+    Drops cached results that depend on a written table
+
+    Args:
+        table: Name of the table that was written
+        row: Primary key of the only row written (as text), or None when the
+            write may have touched any row. Row writes only drop entries for
+            that row and entries that depend on the whole table.
+    """
+    with _generations_lock:
+        _generations[table] = _generations.get(table, 0) + 1
+        for cache in list(_caches):
+            cache.invalidate(table, row)
+
+
+def write_generation(tables):
+    """Snapshot of the tables' invalidation counters, taken before running a query"""
+    with _generations_lock:
+        return tuple(_generations.get(table, 0) for table in sorted(tables))
+
+
+def set_if_unchanged(cache, key, value, tables, generation, **kwargs):
+    """
+    Caches value unless one of tables was invalidated since generation was taken
+
+    The check and the set happen under the invalidation lock, so a write
+    committed while the query ran can never leave its stale result behind.
+
+    Returns:
+        bool: Whether the value was stored
+    """
+    with _generations_lock:
+        if write_generation(tables) != generation:
+            return False
+        cache.set(key, value, **kwargs)
+        return True
+
+
+def invalidate_statements(statements):
+    """Invalidates the caches for every write among the executed SQL statements"""
+    for sql in statements:
+        target = write_target(sql)
+        if target is not None:
+            invalidate(*target)
+
+
+_trackers = {}  # id(connection) -> statement lists of the active track_writes blocks
+_trackers_lock = threading.Lock()
+
+
+def _is_write(sql):
+    return sql.lstrip()[:7].upper().startswith(
+        ('UPDATE', 'INSERT', 'DELETE', 'REPLACE', 'DROP', 'ALTER', 'CREATE')
+    )
+
+
+@contextmanager
+def track_writes(conn):
+    """
+    Records the write statements a sqlite3 connection executes in the block
+
+    Uses the connection's trace callback, which sees statements with their
+    parameters already bound. Blocks may be nested on the same connection.
+
+    Yields:
+        list: SQL text of each write statement, in execution order
+    """
+    statements = []
+    key = id(conn)
+    with _trackers_lock:
+        active = _trackers.get(key)
+        if active is None:
+            active = _trackers[key] = []
+
+            def record(sql):
+                if _is_write(sql):
+                    for listener in active:
+                        listener.append(sql)
+
+            conn.set_trace_callback(record)
+        active.append(statements)
+    try:
+        yield statements
+    finally:
+        with _trackers_lock:
+            active.remove(statements)
+            if not active:
+                del _trackers[key]
+                conn.set_trace_callback(None)
+
+
+@asynccontextmanager
+async def async_track_writes(db):
+    """track_writes for an aiosqlite connection"""
+    statements = []
+    key = id(db)
+    with _trackers_lock:
+        active = _trackers.get(key)
+        install = active is None
+        if install:
+            active = _trackers[key] = []
+        active.append(statements)
+    if install:
+        def record(sql):
+            if _is_write(sql):
+                for listener in active:
+                    listener.append(sql)
+
+        await db.set_trace_callback(record)
+    try:
+        yield statements
+    finally:
+        with _trackers_lock:
+            active.remove(statements)
+            uninstall = not active and _trackers.get(key) is active
+            if uninstall:
+                del _trackers[key]
+        if uninstall:
+            await db.set_trace_callback(None)
+
+
+def approx_size(value):
+    """Approximate memory footprint in bytes of a query result (rows of scalars)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += approx_size(item)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            size += approx_size(key) + approx_size(item)
+    return size
+
+
+class CacheStats:
+    """Hit/miss/eviction counters shared by the cache backends"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_hits = 0
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
+
+
+class LRUTTLCache:
+    """Thread-safe in-memory cache with LRU eviction, per-entry TTL and size limits"""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300,
+                 sizeof=approx_size):
+        """
+        Args:
+            max_entries: Maximum number of cached results
+            max_bytes: Maximum approximate total size of cached results
+            ttl: Default seconds a result stays valid (None for no expiry)
+            sizeof: Function estimating the size of a value in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.stats = CacheStats()
+        self._entries = OrderedDict()  # key -> (value, expires_at, size, tags)
+        self._tables = {}  # table -> row (or None) -> keys depending on it
+        self._bytes = 0
+        self._lock = threading.RLock()
+        _caches.add(self)
+
+    def get(self, key, default=None):
+        """Returns the cached value, or default if missing or expired"""
+        value, stale = self.lookup(key)
+        return default if value is _MISSING or stale else value
+
+    def lookup(self, key, stale_ttl=0):
+        """
+        Returns (value, stale) for key
+
+        An entry that expired less than stale_ttl seconds ago is returned
+        with stale True (and kept, so it can be served until refreshed);
+        a missing or older entry gives (_MISSING, False).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return _MISSING, False
+            value, expires_at = entry[0], entry[1]
+            if expires_at is not None and expires_at <= time.monotonic():
+                if time.monotonic() < expires_at + stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stats.stale_hits += 1
+                    return value, True
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return _MISSING, False
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return value, False
+
+    def set(self, key, value, ttl=_MISSING, tags=()):
+        """
+        Caches value under key, evicting least recently used entries to fit
+
+        Args:
+            key: Hashable cache key
+            value: Result to cache
+            ttl: Seconds the entry stays valid (defaults to the cache ttl)
+            tags: (table, row) dependencies used by invalidate; row None
+                means the entry depends on the whole table
+        """
+        ttl = self.ttl if ttl is _MISSING else ttl
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size, tags)
+            self._bytes += size
+            for table, row in tags:
+                self._tables.setdefault(table, {}).setdefault(row, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def delete(self, key):
+        """Drops key if it is cached"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate(self, table, row=None):
+        """Drops entries depending on table (see cache_backends.invalidate)"""
+        with self._lock:
+            rows = self._tables.get(table)
+            if not rows:
+                return
+            if row is None:
+                keys = set().union(*rows.values())
+            else:
+                keys = rows.get(None, set()) | rows.get(row, set())
+            for key in keys:
+                self._remove(key)
+                self.stats.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tables.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, _, size, tags = self._entries.pop(key)
+        self._bytes -= size
+        for table, row in tags:
+            keys = self._tables[table][row]
+            keys.discard(key)
+            if not keys:
+                del self._tables[table][row]
+                if not self._tables[table]:
+                    del self._tables[table]
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+
+class SQLiteCache:
+    """
+    Cache stored in a SQLite file so several worker processes share results
+
+    Values are pickled. Expired rows are ignored on read and swept when the
+    cache is over its limits, least recently used first. Counters in
+    `stats` are per process.
+    """
+
+    def __init__(self, path='query_cache.db', max_entries=10000,
+                 max_bytes=256 * 1024 * 1024, ttl=300):
+        """
+        Args:
+            path: SQLite file shared by the processes
+            max_entries: Maximum number of cached results
+            max_bytes: Maximum total size of the pickled results
+            ttl: Default seconds a result stays valid (None for no expiry)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache (last_access)")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_tags (key TEXT NOT NULL, tbl TEXT NOT NULL, row TEXT)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_tags_tbl ON cache_tags (tbl, row)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_tags_key ON cache_tags (key)")
+        conn.commit()
+        _caches.add(self)
+
+    def _connection(self):
+        """One connection per thread and process"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key_text(key):
+        return key if isinstance(key, str) else repr(key)
+
+    def get(self, key, default=None):
+        """Returns the cached value, or default if missing or expired"""
+        value, stale = self.lookup(key)
+        return default if value is _MISSING or stale else value
+
+    def lookup(self, key, stale_ttl=0):
+        """Returns (value, stale) for key (see LRUTTLCache.lookup)"""
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (self._key_text(key),)
+        ).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return _MISSING, False
+        stale = row[1] is not None and row[1] <= now
+        if stale and now >= row[1] + stale_ttl:
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return _MISSING, False
+        with conn:
+            conn.execute("UPDATE cache SET last_access = ? WHERE key = ?",
+                         (now, self._key_text(key)))
+        if stale:
+            self.stats.stale_hits += 1
+        else:
+            self.stats.hits += 1
+        return pickle.loads(row[0]), stale
+
+    def set(self, key, value, ttl=_MISSING, tags=()):
+        """Caches value under key, sweeping expired and LRU entries to fit"""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        key_text = self._key_text(key)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key_text, blob, len(blob), now + ttl if ttl is not None else None, now)
+            )
+            conn.execute("DELETE FROM cache_tags WHERE key = ?", (key_text,))
+            conn.executemany("INSERT INTO cache_tags (key, tbl, row) VALUES (?, ?, ?)",
+                             [(key_text, table, row) for table, row in tags])
+            self._enforce_limits(conn, now)
+
+    def _enforce_limits(self, conn, now):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        expired = conn.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+        ).rowcount
+        conn.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache)")
+        self.stats.expirations += expired
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            oldest = conn.execute(
+                "SELECT key, size FROM cache ORDER BY last_access LIMIT ?",
+                (max(count - self.max_entries, 1),)
+            ).fetchall()
+            for key, size in oldest:
+                self._drop(conn, key)
+                count -= 1
+                total -= size
+                self.stats.evictions += 1
+
+    @staticmethod
+    def _drop(conn, key_text):
+        conn.execute("DELETE FROM cache WHERE key = ?", (key_text,))
+        conn.execute("DELETE FROM cache_tags WHERE key = ?", (key_text,))
+
+    def delete(self, key):
+        conn = self._connection()
+        with conn:
+            self._drop(conn, self._key_text(key))
+
+    def invalidate(self, table, row=None):
+        """Drops entries depending on table, for every process sharing the file"""
+        conn = self._connection()
+        with conn:
+            if row is None:
+                keys = conn.execute(
+                    "SELECT DISTINCT key FROM cache_tags WHERE tbl = ?", (table,)
+                ).fetchall()
+            else:
+                keys = conn.execute(
+                    "SELECT DISTINCT key FROM cache_tags WHERE tbl = ? AND (row IS NULL OR row = ?)",
+                    (table, row)
+                ).fetchall()
+            for (key_text,) in keys:
+                self._drop(conn, key_text)
+            self.stats.invalidations += len(keys)
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM cache")
+            conn.execute("DELETE FROM cache_tags")
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def __contains__(self, key):
+        row = self._connection().execute(
+            "SELECT expires_at FROM cache WHERE key = ?", (self._key_text(key),)
+        ).fetchone()
+        return row is not None and (row[0] is None or row[0] > time.time())
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
@@ -0,0 +1,368 @@
+import os
+import asyncio
+import inspect
+import sqlite3
+import weakref
+import functools
+import itertools
+import threading
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+
+from cache_backends import async_track_writes, invalidate_statements, track_writes
+
+try:
+    import aiosqlite
+except ImportError:  # only needed for coroutine functions
+    aiosqlite = None
+
+
+DEFAULT_DATABASE = os.environ.get('USERS_DB', 'users.db')
+
+# Applied once to every new connection
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',        # readers don't block the writer
+    'synchronous': 'NORMAL',      # fsync at checkpoints only; safe with WAL
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,     # negative means KiB: 64 MiB page cache
+    'busy_timeout': 5000,
+}
+
+
+class ConnectionManager:
+    """
+    Hands out one long-lived SQLite connection per thread
+
+    Connection setup and pragma tuning happen once per thread instead of on
+    every call, and the page cache stays warm between calls. A forked child
+    never reuses its parent's connections (SQLite handles must not cross a
+    fork); it silently starts with fresh ones.
+    """
+
+    def __init__(self, path=DEFAULT_DATABASE, pragmas=None, timeout=5.0):
+        """
+        Args:
+            path: SQLite database file
+            pragmas: PRAGMA name -> value applied to each new connection
+                (defaults to DEFAULT_PRAGMAS)
+            timeout: Seconds to wait for a locked database
+        """
+        self.path = path
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() and ref()._reset())
+
+    def _reset(self):
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def connection(self):
+        """Returns the calling thread's connection, opening it on first use"""
+        if self._pid != os.getpid():
+            self._reset()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Only the owning thread uses it; close_all may close it from elsewhere
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name}={value}")
+            self._local.conn = conn
+            self._local.depth = 0
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """Closes the calling thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.conn = None
+            with self._lock:
+                self._connections.remove(conn)
+            conn.close()
+
+    def close_all(self):
+        """Closes every connection handed out by this manager"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class AsyncConnectionPool:
+    """
+    Pool of aiosqlite connections for one event loop
+
+    Each aiosqlite connection owns a worker thread, so reusing a few of them
+    keeps both connect cost and thread count bounded however many
+    coroutines query at once. Connections get the same pragmas as
+    ConnectionManager's and come back rolled back to a clean state.
+    """
+
+    def __init__(self, path=DEFAULT_DATABASE, size=5, pragmas=None, timeout=5.0,
+                 checkout_timeout=30.0):
+        """
+        Args:
+            path: SQLite database file
+            size: Most connections open at once; further acquirers wait
+            pragmas: PRAGMA name -> value (defaults to DEFAULT_PRAGMAS)
+            timeout: Seconds to wait for a locked database
+            checkout_timeout: Seconds acquire() waits for a free connection
+        """
+        if aiosqlite is None:
+            raise RuntimeError("AsyncConnectionPool needs the aiosqlite package")
+        self.path = path
+        self.size = size
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+        self.checkout_timeout = checkout_timeout
+        self._idle = []  # most recently released last
+        self._all = []
+        self._opening = 0
+        self._closed = False
+        # Notified whenever a connection is released or a slot frees up
+        self._available = asyncio.Condition()
+
+    async def _connect(self):
+        db = await aiosqlite.connect(self.path, timeout=self.timeout)
+        for name, value in self.pragmas.items():
+            await db.execute(f"PRAGMA {name}={value}")
+        return db
+
+    def _can_checkout(self):
+        return self._closed or self._idle or len(self._all) + self._opening < self.size
+
+    async def acquire(self, timeout=None):
+        """
+        Checks out an idle connection, opening one if the pool has room
+
+        Args:
+            timeout: Seconds to wait for a free connection (defaults to checkout_timeout)
+
+        Raises:
+            TimeoutError: If no connection became free in time
+            RuntimeError: If the pool is (or gets) closed
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        async with self._available:
+            try:
+                await asyncio.wait_for(self._available.wait_for(self._can_checkout), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(
+                    f"No pooled connection to {self.path} became free within {timeout}s"
+                ) from None
+            if self._closed:
+                raise RuntimeError("AsyncConnectionPool is closed")
+            if self._idle:
+                return self._idle.pop()
+            self._opening += 1
+        try:
+            db = await self._connect()
+        except BaseException:
+            async with self._available:
+                self._opening -= 1
+                self._available.notify()
+            raise
+        async with self._available:
+            self._opening -= 1
+            if not self._closed:
+                self._all.append(db)
+                return db
+        await db.close()
+        raise RuntimeError("AsyncConnectionPool is closed")
+
+    async def release(self, db):
+        """Returns a connection, rolling back anything left uncommitted"""
+        try:
+            if db.in_transaction:
+                await db.rollback()
+            broken = False
+        except Exception:
+            broken = True
+        async with self._available:
+            keep = not (broken or self._closed)
+            if keep:
+                self._idle.append(db)
+            elif db in self._all:
+                # Broken connection: drop it so a waiter can open a fresh one
+                self._all.remove(db)
+            self._available.notify()
+        if not keep:
+            try:
+                await db.close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        db = await self.acquire(timeout)
+        try:
+            yield db
+        finally:
+            await self.release(db)
+
+    def stats(self):
+        """
+        Returns:
+            dict: open and idle connection counts
+        """
+        return {'open': len(self._all), 'idle': len(self._idle), 'size': self.size}
+
+    async def close(self):
+        """Closes every connection and fails anyone still waiting for one"""
+        async with self._available:
+            self._closed = True
+            connections, self._all, self._idle = self._all, [], []
+            self._available.notify_all()
+        for db in connections:
+            await db.close()
+
+
+_manager = ConnectionManager()
+_managers = {}  # path -> ConnectionManager for databases other than the default
+_managers_lock = threading.Lock()
+_async_pools = weakref.WeakKeyDictionary()  # event loop -> path -> AsyncConnectionPool
+# (connection, task) held by the async with_db_connection call running in this context
+_async_connection = contextvars.ContextVar('async_connection', default=None)
+
+
+def get_async_pool(size=5, path=None):
+    """Returns the running event loop's pool for path (default: with_db_connection's database)"""
+    path = path or _manager.path
+    pools = _async_pools.setdefault(asyncio.get_running_loop(), {})
+    pool = pools.get(path)
+    if pool is None:
+        pool = pools[path] = AsyncConnectionPool(path, size, _manager.pragmas, _manager.timeout)
+    return pool
+
+
+async def close_async_pool():
+    """Closes the running event loop's pools"""
+    pools = _async_pools.pop(asyncio.get_running_loop(), {})
+    for pool in pools.values():
+        await pool.close()
+
+
+_savepoint_ids = itertools.count()
+
+
+@contextmanager
+def savepoint(conn):
+    """
+    Runs the block in a SAVEPOINT on conn
+
+    An exception rolls back only the block's own work, leaving the
+    enclosing transaction (if any) intact, and is re-raised.
+    """
+    name = f"sp_{next(_savepoint_ids)}"
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    conn.execute(f"RELEASE {name}")
+
+
+@asynccontextmanager
+async def async_savepoint(db):
+    """savepoint for an aiosqlite connection"""
+    name = f"sp_{next(_savepoint_ids)}"
+    await db.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except BaseException:
+        await db.execute(f"ROLLBACK TO {name}")
+        await db.execute(f"RELEASE {name}")
+        raise
+    await db.execute(f"RELEASE {name}")
+
+
+def get_manager(path=None):
+    """Returns the manager used by with_db_connection, or a shared one for another path"""
+    manager = _manager
+    if path is None or path == manager.path:
+        return manager
+    with _managers_lock:
+        other = _managers.get(path)
+        if other is None:
+            other = _managers[path] = ConnectionManager(path, manager.pragmas, manager.timeout)
+        return other
+
+
+def configure(path=DEFAULT_DATABASE, pragmas=None, timeout=5.0):
+    """
+    Points with_db_connection at another database or pragma set
+
+    Returns:
+        ConnectionManager: The new default manager
+    """
+    global _manager
+    old, _manager = _manager, ConnectionManager(path, pragmas, timeout)
+    old.close_all()
+    return _manager
+
+
+def with_db_connection(func):
+    """Decorator to automatically handle database connections
+
+    The connection comes from the thread's persistent connection instead of
+    being opened and closed per call. Work the function leaves uncommitted is
+    rolled back when the outermost decorated call returns, just as closing
+    the connection used to discard it. Coroutine functions get an aiosqlite
+    connection from the event loop's AsyncConnectionPool instead.
+    """
+    if inspect.iscoroutinefunction(func):
+        return _async_with_db_connection(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        manager = _manager
+        conn = manager.connection()
+        local = manager._local
+        local.depth += 1
+
+        try:
+            # Pass connection to the function, recording the writes it makes
+            with track_writes(conn) as writes:
+                result = func(conn, *args, **kwargs)
+            # Writes that were committed make cached reads of those tables stale
+            if writes and not conn.in_transaction:
+                invalidate_statements(writes)
+            return result
+        finally:
+            local.depth -= 1
+            if local.depth == 0 and conn.in_transaction:
+                conn.rollback()
+
+    return wrapper
+
+
+def _async_with_db_connection(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        task = asyncio.current_task()
+        held = _async_connection.get()
+        if held is not None and held[1] is task:
+            # Nested call in the same task: share its connection and transaction
+            return await func(held[0], *args, **kwargs)
+
+        async with get_async_pool().connection() as db:
+            token = _async_connection.set((db, task))
+            try:
+                async with async_track_writes(db) as writes:
+                    result = await func(db, *args, **kwargs)
+                if writes and not db.in_transaction:
+                    invalidate_statements(writes)
+                return result
+            finally:
+                _async_connection.reset(token)
+
+    return wrapper
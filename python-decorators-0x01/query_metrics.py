@@ -0,0 +1,293 @@
+import re
+import json
+import time
+import queue
+import random
+import bisect
+import inspect
+import functools
+import threading
+
+from sql_utils import normalize_sql
+
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """
+    Groups statements that differ only in literal values
+
+    Normalizes the SQL, replaces string and number literals with `?` and
+    collapses IN lists, so `WHERE id = 1` and `WHERE id = 2` share a
+    fingerprint. Memoised on the raw text.
+    """
+    return _IN_LIST.sub("(?)", _LITERAL.sub("?", normalize_sql(sql)))
+
+
+# Latency bucket upper bounds in seconds: 1-2-5 steps from 10us to 10s
+LATENCY_BUCKETS = tuple(
+    base * scale for scale in (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0) for base in (1, 2, 5)
+) + (10.0,)
+
+
+class QueryStats:
+    """Calls, errors, rows and a latency histogram for one fingerprint"""
+
+    __slots__ = ('calls', 'errors', 'rows', 'total_time', 'max_time', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        # One count per LATENCY_BUCKETS bound plus an overflow bucket
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def percentile(self, p):
+        """
+        Upper bound of the bucket holding the p-th percentile latency (0-100)
+
+        Returns:
+            float: Seconds, or None if nothing was recorded
+        """
+        if not self.calls:
+            return None
+        target = p / 100 * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max_time
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'mean_ms': self.total_time / self.calls * 1000 if self.calls else None,
+            'max_ms': self.max_time * 1000,
+            'p50_ms': _ms(self.percentile(50)),
+            'p99_ms': _ms(self.percentile(99)),
+            'histogram': {f"le_{bound * 1000:g}ms": count
+                          for bound, count in zip(LATENCY_BUCKETS + (float('inf'),),
+                                                  self.buckets) if count},
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class QueryMetrics:
+    """Thread-safe per-fingerprint query statistics kept in memory"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed, rows=None, error=False):
+        """
+        Records one execution
+
+        Args:
+            sql: Statement text (fingerprinted before aggregation)
+            elapsed: Duration in seconds
+            rows: Rows returned, if known
+            error: Whether the execution raised
+        """
+        key = fingerprint(sql)
+        index = bisect.bisect_left(LATENCY_BUCKETS, elapsed)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats()
+            stats.calls += 1
+            stats.total_time += elapsed
+            if elapsed > stats.max_time:
+                stats.max_time = elapsed
+            stats.buckets[index] += 1
+            if rows:
+                stats.rows += rows
+            if error:
+                stats.errors += 1
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: fingerprint -> statistics dict
+        """
+        with self._lock:
+            return {key: stats.as_dict() for key, stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+class JSONLinesSink:
+    """
+    Writes events to a JSON-lines file from a background thread
+
+    emit() never blocks the caller: events are queued and dropped (and
+    counted) when the queue is full. If a QueryMetrics is given, a snapshot
+    of it is also written every `interval` seconds.
+    """
+
+    def __init__(self, path, metrics=None, interval=10.0, max_queue=10000):
+        """
+        Args:
+            path: File to append to
+            metrics: QueryMetrics to snapshot periodically, or None
+            interval: Seconds between snapshots
+            max_queue: Events buffered before new ones are dropped
+        """
+        self.path = path
+        self.metrics = metrics
+        self.interval = interval
+        self.dropped = 0
+        self._queue = queue.Queue(max_queue)
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='query-log-sink', daemon=True)
+        self._thread.start()
+
+    def emit(self, event):
+        """Queues one event (a JSON-serialisable dict)"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        next_snapshot = time.monotonic() + self.interval
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            while True:
+                # Without a registry there is nothing to snapshot: just wait for events
+                timeout = (None if self.metrics is None
+                           else max(0.0, next_snapshot - time.monotonic()))
+                try:
+                    event = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    event = None
+                # Write whatever else is ready before flushing; None only wakes us up
+                while event is not None or not self._queue.empty():
+                    if event is not None:
+                        handle.write(json.dumps(event, default=str) + "\n")
+                    try:
+                        event = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if time.monotonic() >= next_snapshot or self._closed.is_set():
+                    if self.metrics is not None:
+                        handle.write(json.dumps({'ts': time.time(),
+                                                 'metrics': self.metrics.snapshot(),
+                                                 'dropped': self.dropped}) + "\n")
+                    next_snapshot = time.monotonic() + self.interval
+                handle.flush()
+                if self._closed.is_set() and self._queue.empty():
+                    return
+
+    def close(self, timeout=5.0):
+        """Writes out queued events (and a final snapshot) and stops the thread"""
+        self._closed.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # the thread is busy draining and will see the flag
+        self._thread.join(timeout)
+
+
+# Shared by every instrumented function unless told otherwise
+metrics = QueryMetrics()
+_sink = None
+
+
+def configure_sink(path, interval=10.0, max_queue=10000):
+    """
+    Sends sampled query events and periodic metric snapshots to a JSON-lines file
+
+    Returns:
+        JSONLinesSink: The new default sink (any previous one is closed)
+    """
+    global _sink
+    old, _sink = _sink, JSONLinesSink(path, metrics, interval, max_queue)
+    if old is not None:
+        old.close()
+    return _sink
+
+
+def instrument(func=None, *, registry=None, sample_rate=0.01, sink=None):
+    """Decorator recording latency, row count and errors of the query it runs
+
+    The query is taken from the `query` keyword or the first positional
+    argument that is a string. Every call updates the in-memory statistics;
+    a `sample_rate` fraction of calls also sends a detailed event to `sink`
+    (the configure_sink() default when omitted). Calls that are not sampled
+    do no formatting or I/O.
+    """
+    if func is None:
+        return lambda f: instrument(f, registry=registry, sample_rate=sample_rate, sink=sink)
+
+    def find_query(args, kwargs):
+        query = kwargs.get('query')
+        if query is None:
+            for arg in args:
+                if isinstance(arg, str):
+                    return arg
+        return query
+
+    def finish(query, start, result, error):
+        elapsed = time.perf_counter() - start
+        rows = len(result) if isinstance(result, (list, tuple)) else None
+        (metrics if registry is None else registry).record(
+            query, elapsed, rows, error is not None)
+        if sample_rate and random.random() < sample_rate:
+            target = _sink if sink is None else sink
+            if target is not None:
+                target.emit({
+                    'ts': time.time(),
+                    'function': func.__qualname__,
+                    'query': query,
+                    'fingerprint': fingerprint(query),
+                    'elapsed_ms': elapsed * 1000,
+                    'rows': rows,
+                    'error': None if error is None else repr(error),
+                })
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            query = find_query(args, kwargs)
+            if query is None:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                finish(query, start, None, e)
+                raise
+            finish(query, start, result, None)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        query = find_query(args, kwargs)
+        if query is None:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            finish(query, start, None, e)
+            raise
+        finish(query, start, result, None)
+        return result
+
+    return wrapper
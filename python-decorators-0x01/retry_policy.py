@@ -0,0 +1,227 @@
+import time
+import random
+import sqlite3
+import asyncio
+import inspect
+import functools
+import threading
+
+
+# sqlite3.OperationalError messages that clear up once the other writer is done
+TRANSIENT_SQLITE_MESSAGES = ('database is locked', 'database table is locked', 'busy')
+
+# MySQL error numbers worth retrying: lock wait timeout, deadlock,
+# server has gone away, lost connection during query
+TRANSIENT_MYSQL_ERRNOS = frozenset({1205, 1213, 2006, 2013})
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the database while the circuit breaker is open"""
+
+
+def is_transient(exc):
+    """
+    Whether an exception is worth retrying
+
+    Lock contention and dropped connections are; syntax errors, constraint
+    violations and other programming errors are not.
+    """
+    if isinstance(exc, CircuitOpenError):
+        return False
+    if isinstance(exc, sqlite3.OperationalError):
+        message = str(exc).lower()
+        return any(text in message for text in TRANSIENT_SQLITE_MESSAGES)
+    errno = getattr(exc, 'errno', None)
+    if errno is None and exc.args and isinstance(exc.args[0], int):
+        errno = exc.args[0]  # PyMySQL/MySQLdb put the code first in args
+    if errno in TRANSIENT_MYSQL_ERRNOS:
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Fails fast while the database keeps failing
+
+    After `failure_threshold` consecutive transient failures the circuit
+    opens and calls raise CircuitOpenError without touching the database.
+    Once `reset_timeout` seconds have passed a single trial call is let
+    through (half-open); its success closes the circuit, its failure
+    reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        """
+        Raises CircuitOpenError unless a call may go ahead
+
+        Returns:
+            bool: True if this call is the half-open trial, whose outcome
+            must be recorded (or abandon_trial() called)
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+                raise CircuitOpenError(
+                    f"circuit open after {self.failures} consecutive failures"
+                )
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def abandon_trial(self):
+        """Lets another trial through after one ended without an outcome (e.g. cancelled)"""
+        with self._lock:
+            self._trial_running = False
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class _Attempts:
+    """Retry bookkeeping shared by the sync and async wrappers"""
+
+    def __init__(self, retries, delay, max_delay, deadline, retry_on, breaker, verbose):
+        self.retries = retries
+        self.delay = delay
+        self.max_delay = max_delay
+        self.deadline = None if deadline is None else time.monotonic() + deadline
+        self.retry_on = retry_on
+        self.breaker = breaker
+        self.verbose = verbose
+        self.trial = False
+
+    def before(self):
+        if self.breaker is not None:
+            self.trial = self.breaker.before_call()
+
+    def interrupted(self):
+        """The attempt ended in a BaseException (cancellation, KeyboardInterrupt)"""
+        if self.trial:
+            self.breaker.abandon_trial()
+
+    def succeeded(self):
+        if self.breaker is not None:
+            self.breaker.record_success()
+
+    def failed(self, attempt, exc):
+        """
+        Returns the seconds to wait before the next attempt, or None to give up
+        """
+        transient = self.retry_on(exc)
+        if self.breaker is not None:
+            # A non-transient error still means the database answered
+            if transient:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+        if self.verbose:
+            print(f"Attempt {attempt + 1} failed: {exc}")
+        if not transient:
+            return None
+        if attempt >= self.retries - 1:
+            if self.verbose:
+                print(f"All {self.retries} attempts failed.")
+            return None
+        wait = backoff_delay(attempt, self.delay, self.max_delay)
+        if self.deadline is not None and time.monotonic() + wait >= self.deadline:
+            if self.verbose:
+                print("Retry deadline exceeded.")
+            return None
+        if self.verbose:
+            print(f"Retrying in {wait:.2f} seconds...")
+        return wait
+
+
+def retry_on_failure(retries=3, delay=2, *, max_delay=30.0, deadline=None,
+                     retry_on=is_transient, breaker=None, verbose=True):
+    """Decorator to retry database operations on failure
+
+    Only errors `retry_on` classifies as transient are retried, after a
+    full-jitter exponential backoff (so contending clients spread out
+    instead of retrying in lockstep). Gives up after `retries` attempts or
+    once the next wait would pass `deadline` seconds from the first call,
+    re-raising the last error. An optional shared CircuitBreaker makes
+    calls fail fast with CircuitOpenError while the database is down.
+    Coroutine functions get an async wrapper that awaits instead of sleeping.
+    """
+    if retries < 1:
+        raise ValueError(f"retries must be at least 1, got {retries}")
+
+    def decorator(func):
+        def attempts():
+            return _Attempts(retries, delay, max_delay, deadline, retry_on, breaker, verbose)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                state = attempts()
+                for attempt in range(retries):
+                    state.before()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        wait = state.failed(attempt, e)
+                        if wait is None:
+                            raise
+                        await asyncio.sleep(wait)
+                    except BaseException:
+                        state.interrupted()
+                        raise
+                    else:
+                        state.succeeded()
+                        return result
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            state = attempts()
+            for attempt in range(retries):
+                state.before()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    wait = state.failed(attempt, e)
+                    if wait is None:
+                        raise
+                    time.sleep(wait)
+                except BaseException:
+                    state.interrupted()
+                    raise
+                else:
+                    state.succeeded()
+                    return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,126 @@
+import asyncio
+import weakref
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one
+
+    The first caller for a key (the leader) runs the function; callers
+    arriving while it runs wait for and share its result or exception
+    instead of running it again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=None):
+        """
+        Returns fn() for key, running it only if no call for key is in flight
+
+        Args:
+            key: Hashable key identifying the work
+            fn: Zero-argument function to run as leader
+            timeout: Seconds a follower waits for the leader (None: forever)
+
+        Raises:
+            TimeoutError: A follower waited longer than timeout
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"gave up waiting {timeout}s for an in-flight call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self, key):
+        return key in self._calls
+
+
+class _LeaderCancelled(Exception):
+    """Set on an async call's future when its leader is cancelled, so followers retry"""
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines; in-flight calls are tracked per event loop"""
+
+    def __init__(self):
+        self._calls = weakref.WeakKeyDictionary()  # loop -> key -> Future
+
+    def _loop_calls(self):
+        loop = asyncio.get_running_loop()
+        calls = self._calls.get(loop)
+        if calls is None:
+            calls = self._calls[loop] = {}
+        return loop, calls
+
+    async def do(self, key, fn, timeout=None):
+        """
+        Returns await fn() for key, awaiting it only if no call for key is in flight
+
+        A cancelled leader doesn't cancel its followers: they retry, and one
+        of them becomes the new leader.
+
+        Raises:
+            TimeoutError: A follower waited longer than timeout
+        """
+        loop, calls = self._loop_calls()
+        deadline = None if timeout is None else loop.time() + timeout
+        while (future := calls.get(key)) is not None:
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                # shield: a follower timing out must not cancel the leader's call
+                return await asyncio.wait_for(asyncio.shield(future), remaining)
+            except _LeaderCancelled:
+                continue
+
+        future = calls[key] = loop.create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, so an unwatched failure isn't logged
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del calls[key]
+
+    def in_flight(self, key):
+        try:
+            _, calls = self._loop_calls()
+        except RuntimeError:
+            return False
+        return key in calls
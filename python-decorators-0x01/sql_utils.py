@@ -0,0 +1,193 @@
+import re
+import pickle
+import hashlib
+import functools
+
+
+# Primary key column per table, for row-level cache dependencies
+PRIMARY_KEYS = {'users': 'id'}
+DEFAULT_PRIMARY_KEY = 'id'
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IDENT = r'[`"\[]?(\w+)[`"\]]?'
+_FROM_LIST = re.compile(
+    r"\bfrom\s+(?=(.+?)(?=\bwhere\b|\bjoin\b|\binner\b|\bleft\b|\bright\b|\bcross\b|\bnatural\b"
+    r"|\bgroup\b|\border\b|\blimit\b|\bunion\b|\bhaving\b|\)|;|$))",
+    re.S,
+)
+_JOIN = re.compile(r"\bjoin\s+" + _IDENT)
+_WRITE = re.compile(
+    r"^\s*(?:update(?:\s+or\s+\w+)?|insert(?:\s+or\s+\w+)?\s+into|replace\s+into|delete\s+from"
+    r"|drop\s+table(?:\s+if\s+exists)?|alter\s+table|create\s+table(?:\s+if\s+not\s+exists)?)\s+"
+    + _IDENT
+)
+_WHERE = re.compile(r"\bwhere\b(.*)$", re.S | re.I)
+_VALUE = r"(\?|'(?:[^']|'')*'|-?\d+(?:\.\d+)?)"
+
+
+def _mask(sql):
+    """Lower-cases sql with comments removed and string literals blanked"""
+    return _STRING.sub("''", _COMMENT.sub(" ", sql)).lower()
+
+
+def referenced_tables(sql):
+    """Returns the set of table names a statement reads or writes"""
+    masked = _mask(sql)
+    tables = set()
+    for from_list in _FROM_LIST.findall(masked):
+        for item in from_list.split(','):
+            words = item.split()
+            if words and words[0] != '(' and not words[0].startswith('('):
+                tables.add(words[0].strip('`"[]'))
+    tables.update(_JOIN.findall(masked))
+    write = _WRITE.match(masked)
+    if write:
+        tables.add(write.group(1))
+    return tables
+
+
+def written_table(sql):
+    """Returns the table a write statement modifies, or None for reads"""
+    match = _WRITE.match(_mask(sql))
+    return match.group(1) if match else None
+
+
+def _literal(token, params, index):
+    """Value of a matched placeholder or literal, normalised to text"""
+    if token == '?':
+        if params is None or index >= len(params):
+            return None
+        return str(params[index])
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'")
+    return token
+
+
+def _blank_strings(sql):
+    """Lower-cases sql with string literals blanked, keeping every offset"""
+    return _STRING.sub(lambda m: "'" + " " * (len(m.group()) - 2) + "'", sql).lower()
+
+
+_SELECT = re.compile(r"\bselect\b")
+
+
+def primary_key_value(sql, params=None, table=None):
+    """
+    Returns the primary key a statement is restricted to, if it is
+
+    Only a top-level WHERE that is nothing but `id = <value>` (optionally
+    followed by LIMIT) counts, the value being a literal or a `?`
+    placeholder bound in params. Subqueries, NOT, OR, AND, parentheses and
+    UPDATEs that assign the key itself all return None, so callers fall
+    back to depending on the whole table.
+
+    Args:
+        sql: SQL statement
+        params: Sequence of bound parameters
+        table: Table whose primary key column to look for
+
+    Returns:
+        str: The key value as text, or None
+    """
+    sql = _COMMENT.sub(" ", sql)
+    masked = _blank_strings(sql)
+    selects = len(_SELECT.findall(masked))
+    if selects > (1 if masked.lstrip().startswith('select') else 0):
+        return None
+    where = _WHERE.search(masked)
+    if not where:
+        return None
+    column = re.escape(PRIMARY_KEYS.get(table, DEFAULT_PRIMARY_KEY))
+    if masked.lstrip().startswith('update') and re.search(
+            r"\bset\b.*(?<![\w.])(?:\w+\.)?" + column + r"\s*=", masked[:where.start()], re.S):
+        return None
+    match = re.compile(
+        r"\s*(?:\w+\.)?" + column + r"\s*=\s*" + _VALUE + r"\s*(?:limit\s+\d+\s*)?;?\s*"
+    ).fullmatch(masked, where.start(1))
+    if not match:
+        return None
+    token = sql[match.start(1):match.end(1)]
+    return _literal(token, params, masked[:match.start(1)].count('?'))
+
+
+def query_dependencies(sql, params=None):
+    """
+    Returns the (table, row) pairs a cached read depends on
+
+    A primary-key lookup on a single table depends on that row only; any
+    other query depends on its whole tables (row None).
+    """
+    tables = referenced_tables(sql)
+    if len(tables) == 1:
+        table = next(iter(tables))
+        row = primary_key_value(sql, params, table)
+        if row is not None:
+            return {(table, row)}
+    return {(table, None) for table in tables}
+
+
+def write_target(sql, params=None):
+    """
+    Returns the (table, row) a write statement affects, or None for reads
+
+    row is None unless the write is restricted to one primary key.
+    """
+    table = written_table(sql)
+    if table is None:
+        return None
+    if not _mask(sql).lstrip().startswith(('update', 'delete')):
+        return table, None
+    return table, primary_key_value(sql, params, table)
+
+
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """
+    Canonical form of a statement for cache keys
+
+    Collapses whitespace, lower-cases everything outside quoted literals and
+    identifiers and drops a trailing semicolon. Memoised, so repeated
+    queries cost one dict lookup.
+    """
+    parts = _QUOTED.split(sql)
+    for index in range(0, len(parts), 2):
+        parts[index] = _SPACE.sub(" ", parts[index]).lower()
+    return "".join(parts).strip().rstrip(";").rstrip()
+
+
+def freeze_params(value):
+    """
+    Hashable, deterministic stand-in for bound parameters and extra arguments
+
+    Hashable values (the usual tuple of scalars) are used as they are; lists,
+    dicts and sets are converted recursively, and anything else unhashable is
+    replaced by a BLAKE2 digest of its pickle.
+    """
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        pass
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_params(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze_params(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze_params(item) for item in value)
+    digest = hashlib.blake2b(pickle.dumps(value, protocol=4), digest_size=16).hexdigest()
+    return ('#blake2b', digest)
+
+
+def make_cache_key(query, params=None, database=None):
+    """
+    Cache key for a query: target database, normalized SQL and parameters
+
+    Equivalent statements that differ only in whitespace or keyword case
+    share a key, while different parameter values never collide.
+    """
+    return (database, normalize_sql(query), freeze_params(params) if params is not None else ())
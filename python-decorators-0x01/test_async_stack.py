@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Concurrency tests for the coroutine versions of the decorators"""
+
+import asyncio
+import importlib
+import os
+import sqlite3
+import tempfile
+import unittest
+import connection_manager
+from cache_backends import LRUTTLCache
+from connection_manager import AsyncConnectionPool, close_async_pool, with_db_connection
+from query_metrics import fingerprint, metrics
+
+log_queries = importlib.import_module('0-log_queries').log_queries
+transactional = importlib.import_module('2-transactional').transactional
+cache_query = importlib.import_module('4-cache_query').cache_query
+
+USERS = 20
+AGE_QUERY = "SELECT age FROM users WHERE id = ?"
+
+
+class AsyncStackTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+        conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                         ((f"user{i}", f"user{i}@example.com", 20) for i in range(USERS)))
+        conn.commit()
+        conn.close()
+        connection_manager.configure(self.path)
+
+    async def asyncTearDown(self):
+        await close_async_pool()
+
+    def tearDown(self):
+        connection_manager.configure(connection_manager.DEFAULT_DATABASE)
+        self.tmp.cleanup()
+
+    def ages(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return dict(conn.execute("SELECT id, age FROM users"))
+        finally:
+            conn.close()
+
+
+class TestAsyncConnectionPool(AsyncStackTestCase):
+    async def asyncSetUp(self):
+        self.pool = AsyncConnectionPool(self.path, size=1, checkout_timeout=0.05)
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        await super().asyncTearDown()
+
+    async def test_checkout_times_out(self):
+        db = await self.pool.acquire()
+        with self.assertRaises(TimeoutError):
+            await self.pool.acquire()
+        await self.pool.release(db)
+
+    async def test_waiter_is_woken_on_release(self):
+        db = await self.pool.acquire()
+        waiter = asyncio.ensure_future(self.pool.acquire(timeout=1))
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiter.done())
+        await self.pool.release(db)
+        self.assertIs(await waiter, db)
+        await self.pool.release(db)
+
+    async def test_waiter_is_woken_when_a_broken_connection_is_dropped(self):
+        db = await self.pool.acquire()
+        waiter = asyncio.ensure_future(self.pool.acquire(timeout=1))
+        await asyncio.sleep(0.01)
+        await db.close()
+        await self.pool.release(db)
+        fresh = await waiter
+        self.assertIsNot(fresh, db)
+        await self.pool.release(fresh)
+
+    async def test_close_fails_waiters(self):
+        db = await self.pool.acquire()
+        waiter = asyncio.ensure_future(self.pool.acquire(timeout=1))
+        await asyncio.sleep(0.01)
+        await self.pool.close()
+        with self.assertRaises(RuntimeError):
+            await waiter
+        await self.pool.release(db)
+
+
+class TestConcurrentTransactions(AsyncStackTestCase):
+    async def test_failed_transactions_roll_back_independently(self):
+        @with_db_connection
+        @transactional
+        async def set_age(db, user_id, age, fail):
+            await db.execute("UPDATE users SET age = ? WHERE id = ?", (age, user_id))
+            await asyncio.sleep(0)
+            if fail:
+                raise ValueError(user_id)
+
+        results = await asyncio.gather(
+            *(set_age(user_id, 99, user_id % 2 == 1) for user_id in range(1, USERS + 1)),
+            return_exceptions=True,
+        )
+        self.assertEqual([isinstance(result, ValueError) for result in results],
+                         [user_id % 2 == 1 for user_id in range(1, USERS + 1)])
+        self.assertEqual(self.ages(), {user_id: 20 if user_id % 2 else 99
+                                       for user_id in range(1, USERS + 1)})
+
+    async def test_nested_failure_only_undoes_its_savepoint(self):
+        @transactional
+        async def inner(db, user_id):
+            await db.execute("UPDATE users SET age = 0 WHERE id = ?", (user_id,))
+            raise ValueError(user_id)
+
+        @with_db_connection
+        @transactional
+        async def outer(db, user_id):
+            await db.execute("UPDATE users SET age = 50 WHERE id = ?", (user_id,))
+            with self.assertRaises(ValueError):
+                await inner(db, user_id)
+
+        await asyncio.gather(*(outer(user_id) for user_id in range(1, 6)))
+        ages = self.ages()
+        self.assertEqual([ages[user_id] for user_id in range(1, 6)], [50] * 5)
+
+
+class TestCacheUnderConcurrentWrites(AsyncStackTestCase):
+    async def test_cached_reads_follow_concurrent_writes(self):
+        cache = LRUTTLCache(ttl=60)
+
+        @with_db_connection
+        @log_queries(sample_rate=0)
+        @cache_query(cache=cache, verbose=False)
+        async def get_age(db, query, params):
+            async with db.execute(query, params) as cursor:
+                return (await cursor.fetchone())[0]
+
+        @with_db_connection
+        @transactional
+        async def set_age(db, user_id, age):
+            await db.execute("UPDATE users SET age = ? WHERE id = ?", (age, user_id))
+
+        calls_before = metrics.snapshot().get(fingerprint(AGE_QUERY), {}).get('calls', 0)
+        for round_ in range(1, 6):
+            readers = [get_age(AGE_QUERY, (user_id,))
+                       for user_id in range(1, USERS + 1) for _ in range(3)]
+            writers = [set_age(user_id, 20 + round_) for user_id in range(1, USERS + 1, 2)]
+            await asyncio.gather(*readers, *writers)
+            ages = self.ages()
+            for user_id in range(1, USERS + 1):
+                self.assertEqual(await get_age(AGE_QUERY, (user_id,)), ages[user_id])
+
+        self.assertGreater(cache.stats.hits, 0)
+        self.assertGreater(cache.stats.invalidations, 0)
+        calls = metrics.snapshot()[fingerprint(AGE_QUERY)]['calls'] - calls_before
+        self.assertEqual(calls, 5 * USERS * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Unit tests for batch_loader.py"""
+
+import asyncio
+import gc
+import sqlite3
+import unittest
+from parameterized import parameterized
+from batch_loader import BatchLoader, fetch_by_ids
+
+
+class Recorder:
+    """batch_fn that records the keys of every call"""
+
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def __call__(self, keys):
+        self.calls.append(list(keys))
+        if self.error is not None:
+            raise self.error
+        return {key: key * 10 for key in keys if key != 0}
+
+
+class TestBatchLoader(unittest.TestCase):
+    @parameterized.expand([
+        (100, [1, 2, 3, 2, 1], 1),
+        (2, [1, 2, 3, 4, 5], 3),
+        (1, [7, 7, 7], 1),
+    ])
+    def test_load_many_coalesces_keys(self, max_batch, keys, batches):
+        recorder = Recorder()
+        loader = BatchLoader(recorder, max_batch=max_batch)
+        self.assertEqual(loader.load_many(keys), [key * 10 for key in keys])
+        self.assertEqual(len(recorder.calls), batches)
+        self.assertEqual(loader.batches, batches)
+
+    def test_missing_key_loads_as_none(self):
+        self.assertIsNone(BatchLoader(Recorder()).load(0).result())
+
+    def test_cached_key_is_not_loaded_again(self):
+        recorder = Recorder()
+        loader = BatchLoader(recorder)
+        loader.load_many([1, 2])
+        loader.load_many([2, 3])
+        self.assertEqual(recorder.calls, [[1, 2], [3]])
+
+    def test_failed_keys_are_retried(self):
+        recorder = Recorder(error=ValueError("boom"))
+        loader = BatchLoader(recorder)
+        with self.assertRaises(ValueError):
+            loader.load(1).result()
+        recorder.error = None
+        self.assertEqual(loader.load(1).result(), 10)
+
+    def test_fetch_by_ids_chunks_the_in_list(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)", ((i, f"user{i}") for i in range(10)))
+        found = fetch_by_ids(conn, [1, 5, 9, 42], chunk_size=2)
+        self.assertEqual(sorted(found), [1, 5, 9])
+        self.assertEqual(tuple(found[5]), (5, 'user5'))
+        conn.close()
+
+
+class TestAsyncBatchLoader(unittest.IsolatedAsyncioTestCase):
+    async def test_same_tick_loads_share_one_batch(self):
+        recorder = Recorder()
+        loader = BatchLoader(recorder)
+        self.assertEqual(await loader.aload_many([1, 2, 3]), [10, 20, 30])
+        self.assertEqual(recorder.calls, [[1, 2, 3]])
+
+    async def test_coroutine_batch_fn(self):
+        async def batch_fn(keys):
+            await asyncio.sleep(0)
+            return {key: -key for key in keys}
+
+        self.assertEqual(await BatchLoader(batch_fn).aload_many([1, 2]), [-1, -2])
+
+    async def test_dispatch_task_survives_garbage_collection(self):
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def batch_fn(keys):
+            started.set()
+            await release.wait()
+            return {key: key for key in keys}
+
+        loader = BatchLoader(batch_fn)
+        pending = asyncio.ensure_future(loader.aload(1))
+        await started.wait()
+        self.assertEqual(len(loader._dispatch_tasks), 1)
+        gc.collect()
+        release.set()
+        self.assertEqual(await asyncio.wait_for(pending, 1), 1)
+        await asyncio.sleep(0)
+        self.assertEqual(loader._dispatch_tasks, set())
+
+    async def test_failure_reaches_every_waiter(self):
+        loader = BatchLoader(Recorder(error=ValueError("boom")))
+        results = await asyncio.gather(loader.aload(1), loader.aload(2), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Unit tests for cache_backends.py"""
+
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from parameterized import parameterized
+from cache_backends import (_MISSING, LRUTTLCache, SQLiteCache, invalidate, set_if_unchanged,
+                            track_writes, write_generation)
+
+BACKENDS = [('memory',), ('sqlite',)]
+
+
+class TestCacheBackends(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make(self, backend, **kwargs):
+        if backend == 'memory':
+            return LRUTTLCache(**kwargs)
+        return SQLiteCache(os.path.join(self.tmp.name, 'cache.db'), **kwargs)
+
+    @parameterized.expand(BACKENDS)
+    def test_set_and_get(self, backend):
+        cache = self.make(backend)
+        cache.set(('db', 'select 1', ()), [(1,)])
+        self.assertEqual(cache.get(('db', 'select 1', ())), [(1,)])
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual((cache.stats.hits, cache.stats.misses), (1, 1))
+        with self.assertRaises(KeyError):
+            cache['missing']
+
+    @parameterized.expand(BACKENDS)
+    def test_expired_entry_is_a_miss_unless_stale_allowed(self, backend):
+        cache = self.make(backend, ttl=0.05)
+        cache['k'] = 'v'
+        time.sleep(0.1)
+        self.assertNotIn('k', cache)
+        self.assertEqual(cache.lookup('k', stale_ttl=10), ('v', True))
+        self.assertEqual(cache.lookup('k'), (_MISSING, False))
+        self.assertEqual(cache.stats.stale_hits, 1)
+
+    @parameterized.expand(BACKENDS)
+    def test_least_recently_used_entry_is_evicted(self, backend):
+        cache = self.make(backend, max_entries=2)
+        cache['a'] = 1
+        time.sleep(0.01)
+        cache['b'] = 2
+        time.sleep(0.01)
+        cache.get('a')
+        time.sleep(0.01)
+        cache['c'] = 3
+        self.assertEqual([key in cache for key in 'abc'], [True, False, True])
+        self.assertEqual(cache.stats.evictions, 1)
+
+    @parameterized.expand([
+        (backend, row, survivors)
+        for backend, in BACKENDS
+        for row, survivors in [
+            (None, {'row1': False, 'row2': False, 'table': False, 'other': True}),
+            ('1', {'row1': False, 'row2': True, 'table': False, 'other': True}),
+        ]
+    ])
+    def test_invalidate_by_tags(self, backend, row, survivors):
+        cache = self.make(backend)
+        cache.set('row1', 1, tags=[('users', '1')])
+        cache.set('row2', 2, tags=[('users', '2')])
+        cache.set('table', 3, tags=[('users', None)])
+        cache.set('other', 4, tags=[('orders', None)])
+        cache.invalidate('users', row)
+        self.assertEqual({key: key in cache for key in survivors}, survivors)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_memory_cache_respects_max_bytes(self):
+        cache = LRUTTLCache(max_bytes=100, sizeof=len)
+        cache['a'] = 'x' * 60
+        cache['b'] = 'y' * 60
+        self.assertEqual(list(key in cache for key in 'ab'), [False, True])
+        cache['c'] = 'z' * 200  # larger than the whole cache: not stored
+        self.assertNotIn('c', cache)
+        self.assertEqual(cache.size_bytes, 60)
+
+
+class TestInvalidation(unittest.TestCase):
+    def test_invalidate_reaches_every_cache(self):
+        caches = [LRUTTLCache(), LRUTTLCache()]
+        for cache in caches:
+            cache.set('k', 1, tags=[('accounts', None)])
+        invalidate('accounts')
+        self.assertEqual([len(cache) for cache in caches], [0, 0])
+
+    def test_set_if_unchanged_skips_results_read_before_a_write(self):
+        cache = LRUTTLCache()
+        generation = write_generation({'accounts'})
+        self.assertTrue(set_if_unchanged(cache, 'fresh', 1, {'accounts'}, generation))
+        invalidate('accounts')
+        self.assertFalse(set_if_unchanged(cache, 'stale', 1, {'accounts'}, generation))
+        self.assertEqual((('fresh' in cache), ('stale' in cache)), (True, False))
+
+    def test_track_writes_records_bound_write_statements(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        with track_writes(conn) as outer:
+            conn.execute("INSERT INTO users (name) VALUES (?)", ('a',))
+            with track_writes(conn) as inner:
+                conn.execute("UPDATE users SET name = ? WHERE id = ?", ('b', 1))
+                conn.execute("SELECT * FROM users").fetchall()
+        conn.execute("DELETE FROM users")
+        self.assertEqual(inner, ["UPDATE users SET name = 'b' WHERE id = 1"])
+        self.assertEqual(outer, ["INSERT INTO users (name) VALUES ('a')", inner[0]])
+        conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Unit tests for 4-cache_query.py and single_flight.py"""
+
+import asyncio
+import importlib
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from cache_backends import LRUTTLCache, invalidate
+from single_flight import AsyncSingleFlight, SingleFlight
+
+cache_query = importlib.import_module('4-cache_query').cache_query
+
+QUERY = "SELECT * FROM users WHERE age > ?"
+
+
+class Source:
+    """Stands in for the database: counts calls and can hold them until released"""
+
+    def __init__(self, value='v1'):
+        self.value = value
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.error = None
+
+    def read(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def conn(in_transaction=False):
+    return SimpleNamespace(in_transaction=in_transaction)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_run(self):
+        flight = SingleFlight()
+        source = Source()
+        source.release.clear()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do('k', source.read)))
+                   for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        source.started.wait(5)
+        time.sleep(0.05)
+        source.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['v1'] * 5)
+        self.assertEqual(source.calls, 1)
+        self.assertFalse(flight.in_flight('k'))
+
+    def test_follower_times_out(self):
+        flight = SingleFlight()
+        source = Source()
+        source.release.clear()
+        leader = threading.Thread(target=flight.do, args=('k', source.read))
+        leader.start()
+        source.started.wait(5)
+        with self.assertRaises(TimeoutError):
+            flight.do('k', source.read, timeout=0.01)
+        source.release.set()
+        leader.join(5)
+
+
+class TestCacheQuery(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUTTLCache(ttl=60)
+        self.source = Source()
+
+        @cache_query(cache=self.cache, verbose=False)
+        def fetch(conn, query, params=()):
+            return self.source.read()
+
+        self.fetch = fetch
+
+    def test_followers_share_the_leaders_result(self):
+        self.source.release.clear()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.fetch(conn(), QUERY, (25,))))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        self.source.started.wait(5)
+        time.sleep(0.05)
+        self.source.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['v1'] * 4)
+        self.assertEqual(self.source.calls, 1)
+
+    def test_leader_failure_reaches_followers_and_is_not_cached(self):
+        self.source.release.clear()
+        self.source.error = ValueError("boom")
+        errors = []
+
+        def call():
+            try:
+                self.fetch(conn(), QUERY, (25,))
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.source.started.wait(5)
+        time.sleep(0.05)
+        self.source.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(self.source.calls, 1)
+
+        self.source.error = None
+        self.assertEqual(self.fetch(conn(), QUERY, (25,)), 'v1')
+        self.assertEqual(self.source.calls, 2)
+
+    def test_caller_in_a_transaction_runs_its_own_query(self):
+        self.source.release.clear()
+        leader = threading.Thread(target=self.fetch, args=(conn(), QUERY, (25,)))
+        leader.start()
+        self.assertTrue(self.source.started.wait(5))
+        self.source.started.clear()
+        own = threading.Thread(target=self.fetch, args=(conn(in_transaction=True), QUERY, (25,)))
+        own.start()
+        # Reaches the source while the leader is still blocked in it
+        self.assertTrue(self.source.started.wait(5))
+        self.source.release.set()
+        leader.join(5)
+        own.join(5)
+        self.assertEqual(self.source.calls, 2)
+
+    def test_result_read_before_a_write_is_not_cached(self):
+        def read_then_write():
+            value = self.source.value
+            invalidate('users')  # a write committed while the query ran
+            self.source.calls += 1
+            return value
+
+        self.source.read = read_then_write
+        self.assertEqual(self.fetch(conn(), QUERY, (25,)), 'v1')
+        self.assertEqual(len(self.cache), 0)
+        self.source.read = lambda: self.source.value
+        self.fetch(conn(), QUERY, (25,))
+        self.assertEqual(len(self.cache), 1)
+
+    def test_write_invalidates_the_cached_result(self):
+        self.fetch(conn(), QUERY, (25,))
+        self.source.value = 'v2'
+        self.assertEqual(self.fetch(conn(), QUERY, (25,)), 'v1')
+        invalidate('users')
+        self.assertEqual(self.fetch(conn(), QUERY, (25,)), 'v2')
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        cache = LRUTTLCache(ttl=0.05)
+
+        @cache_query(cache=cache, verbose=False, stale_ttl=10)
+        def fetch(conn, query, params=()):
+            return self.source.read()
+
+        self.assertEqual(fetch(conn(), QUERY, (25,)), 'v1')
+        time.sleep(0.1)
+        self.source.value = 'v2'
+        self.assertEqual(fetch(conn(), QUERY, (25,)), 'v1')
+        deadline = time.monotonic() + 5
+        while fetch(conn(), QUERY, (25,)) != 'v2' and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(fetch(conn(), QUERY, (25,)), 'v2')
+        self.assertEqual(cache.stats.stale_hits, 1)
+
+
+class TestAsyncCacheQuery(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = LRUTTLCache(ttl=60)
+        self.calls = 0
+        self.value = 'v1'
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+        @cache_query(cache=self.cache, verbose=False)
+        async def fetch(conn, query, params=()):
+            self.calls += 1
+            await self.gate.wait()
+            return self.value
+
+        self.fetch = fetch
+
+    async def test_followers_share_the_leaders_result(self):
+        self.gate.clear()
+        tasks = [asyncio.ensure_future(self.fetch(conn(), QUERY, (25,))) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        self.gate.set()
+        self.assertEqual(await asyncio.gather(*tasks), ['v1'] * 4)
+        self.assertEqual(self.calls, 1)
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        self.gate.clear()
+        leader = asyncio.ensure_future(self.fetch(conn(), QUERY, (25,)))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(self.fetch(conn(), QUERY, (25,))) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        self.gate.set()
+        self.assertEqual(await asyncio.gather(*followers), ['v1'] * 3)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(self.calls, 2)
+
+    async def test_leader_failure_reaches_followers(self):
+        flight = AsyncSingleFlight()
+        gate = asyncio.Event()
+
+        async def fail():
+            await gate.wait()
+            raise ValueError("boom")
+
+        tasks = [asyncio.ensure_future(flight.do('k', fail)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertFalse(flight.in_flight('k'))
+
+    async def test_stale_entry_is_served_while_refreshing(self):
+        cache = LRUTTLCache(ttl=0.05)
+
+        @cache_query(cache=cache, verbose=False, stale_ttl=10)
+        async def fetch(conn, query, params=()):
+            return self.value
+
+        self.assertEqual(await fetch(conn(), QUERY, (25,)), 'v1')
+        await asyncio.sleep(0.1)
+        self.value = 'v2'
+        self.assertEqual(await fetch(conn(), QUERY, (25,)), 'v1')
+        await asyncio.sleep(0.01)
+        self.assertEqual(await fetch(conn(), QUERY, (25,)), 'v2')
+
+
+if __name__ == "__main__":
+    unittest.main()
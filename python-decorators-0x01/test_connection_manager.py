@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Unit tests for the synchronous side of connection_manager.py"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from parameterized import parameterized
+import connection_manager
+from cache_backends import LRUTTLCache
+from connection_manager import ConnectionManager, savepoint, with_db_connection
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('ann')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def names(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in conn.execute("SELECT name FROM users ORDER BY id")]
+        finally:
+            conn.close()
+
+
+class TestConnectionManager(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager = ConnectionManager(self.path)
+
+    def tearDown(self):
+        self.manager.close_all()
+        super().tearDown()
+
+    def test_one_connection_per_thread(self):
+        first = self.manager.connection()
+        self.assertIs(self.manager.connection(), first)
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.manager.connection()))
+        thread.start()
+        thread.join(5)
+        self.assertIsNot(other[0], first)
+
+    @parameterized.expand([
+        ('journal_mode', 'wal'),
+        ('synchronous', 1),
+        ('busy_timeout', 5000),
+    ])
+    def test_pragmas_are_applied(self, name, expected):
+        self.assertEqual(self.manager.connection().execute(f"PRAGMA {name}").fetchone()[0],
+                         expected)
+
+    def test_close_all_closes_every_thread_connection(self):
+        conns = [self.manager.connection()]
+        thread = threading.Thread(target=lambda: conns.append(self.manager.connection()))
+        thread.start()
+        thread.join(5)
+        self.manager.close_all()
+        for conn in conns:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+        self.assertIsNot(self.manager.connection(), conns[0])
+
+    def test_forked_child_gets_a_fresh_connection(self):
+        parent = self.manager.connection()
+        with patch.object(connection_manager.os, 'getpid', return_value=os.getpid() + 1):
+            self.assertIsNot(self.manager.connection(), parent)
+
+    def test_savepoint_rolls_back_only_its_block(self):
+        conn = self.manager.connection()
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO users (name) VALUES ('bob')")
+        with self.assertRaises(ValueError):
+            with savepoint(conn):
+                conn.execute("INSERT INTO users (name) VALUES ('eve')")
+                raise ValueError
+        conn.commit()
+        self.assertEqual(self.names(), ['ann', 'bob'])
+
+
+class TestWithDbConnection(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        connection_manager.configure(self.path)
+
+    def tearDown(self):
+        connection_manager.configure(connection_manager.DEFAULT_DATABASE)
+        super().tearDown()
+
+    def test_uncommitted_work_is_rolled_back_on_return(self):
+        @with_db_connection
+        def insert(conn, name):
+            conn.execute("INSERT INTO users (name) VALUES (?)", (name,))
+
+        insert('bob')
+        self.assertEqual(self.names(), ['ann'])
+
+    def test_nested_calls_share_the_connection_and_transaction(self):
+        seen = []
+
+        @with_db_connection
+        def inner(conn):
+            seen.append(conn)
+            conn.execute("INSERT INTO users (name) VALUES ('bob')")
+
+        @with_db_connection
+        def outer(conn):
+            seen.append(conn)
+            inner()
+            self.assertTrue(conn.in_transaction)
+            conn.commit()
+
+        outer()
+        self.assertIs(seen[0], seen[1])
+        self.assertEqual(self.names(), ['ann', 'bob'])
+
+    def test_committed_write_invalidates_cached_reads(self):
+        cache = LRUTTLCache()
+        cache.set('names', ['ann'], tags=[('users', None)])
+
+        @with_db_connection
+        def rename(conn):
+            conn.execute("UPDATE users SET name = 'amy' WHERE id = 1")
+            conn.commit()
+
+        rename()
+        self.assertNotIn('names', cache)
+        self.assertEqual(self.names(), ['amy'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Unit tests for query_metrics.py"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+from parameterized import parameterized
+from query_metrics import JSONLinesSink, QueryMetrics, fingerprint, instrument
+
+
+class TestFingerprint(unittest.TestCase):
+    @parameterized.expand([
+        ("SELECT * FROM users WHERE id = 1", "SELECT * FROM users WHERE id = 42"),
+        ("select * from users where name = 'ann'", "SELECT *  FROM users WHERE name = 'bob';"),
+        ("SELECT * FROM users WHERE id IN (1, 2, 3)", "SELECT * FROM users WHERE id IN (?)"),
+    ])
+    def test_literals_share_a_fingerprint(self, left, right):
+        self.assertEqual(fingerprint(left), fingerprint(right))
+
+    def test_identifiers_with_digits_are_kept(self):
+        self.assertNotEqual(fingerprint("SELECT * FROM t1"), fingerprint("SELECT * FROM t2"))
+
+
+class TestQueryMetrics(unittest.TestCase):
+    def test_record_aggregates_per_fingerprint(self):
+        registry = QueryMetrics()
+        registry.record("SELECT * FROM users WHERE id = 1", 0.0015, rows=1)
+        registry.record("SELECT * FROM users WHERE id = 2", 0.003, rows=1)
+        registry.record("SELECT * FROM users WHERE id = 3", 0.2, error=True)
+        stats = registry.snapshot()[fingerprint("SELECT * FROM users WHERE id = 1")]
+        self.assertEqual((stats['calls'], stats['errors'], stats['rows']), (3, 1, 2))
+        self.assertEqual(stats['p50_ms'], 5)
+        self.assertEqual(stats['histogram'], {'le_2ms': 1, 'le_5ms': 1, 'le_200ms': 1})
+        registry.reset()
+        self.assertEqual(registry.snapshot(), {})
+
+
+class TestInstrument(unittest.TestCase):
+    def setUp(self):
+        self.registry = QueryMetrics()
+        self.sink = MagicMock()
+
+    def test_every_call_is_recorded_and_sampled_calls_are_emitted(self):
+        @instrument(registry=self.registry, sample_rate=1.0, sink=self.sink)
+        def fetch(conn, query):
+            return [(1,), (2,)]
+
+        fetch(None, "SELECT id FROM users")
+        self.assertEqual(self.registry.snapshot()["select id from users"]['rows'], 2)
+        event = self.sink.emit.call_args[0][0]
+        self.assertEqual((event['query'], event['rows'], event['error']),
+                         ("SELECT id FROM users", 2, None))
+
+    def test_unsampled_calls_emit_nothing(self):
+        @instrument(registry=self.registry, sample_rate=0, sink=self.sink)
+        def fetch(conn, query):
+            return []
+
+        for _ in range(100):
+            fetch(None, query="SELECT 1")
+        self.sink.emit.assert_not_called()
+        self.assertEqual(self.registry.snapshot()["select ?"]['calls'], 100)
+
+    def test_errors_are_counted_and_reraised(self):
+        @instrument(registry=self.registry, sample_rate=0)
+        def fetch(conn, query):
+            raise ValueError(query)
+
+        with self.assertRaises(ValueError):
+            fetch(None, "SELECT 1")
+        self.assertEqual(self.registry.snapshot()["select ?"]['errors'], 1)
+
+    def test_calls_without_a_query_are_not_recorded(self):
+        @instrument(registry=self.registry)
+        def ping(conn):
+            return True
+
+        self.assertTrue(ping(None))
+        self.assertEqual(self.registry.snapshot(), {})
+
+
+class TestJSONLinesSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'queries.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def lines(self):
+        with open(self.path, encoding='utf-8') as handle:
+            return [json.loads(line) for line in handle]
+
+    def test_close_writes_events_and_a_final_snapshot(self):
+        registry = QueryMetrics()
+        registry.record("SELECT 1", 0.001)
+        sink = JSONLinesSink(self.path, registry, interval=60)
+        sink.emit({'query': 'a'})
+        sink.emit({'query': 'b'})
+        sink.close()
+        lines = self.lines()
+        self.assertEqual(lines[:2], [{'query': 'a'}, {'query': 'b'}])
+        self.assertEqual(lines[2]['metrics']['select ?']['calls'], 1)
+
+    def test_sink_without_metrics_waits_instead_of_spinning(self):
+        sink = JSONLinesSink(self.path)
+        start = time.process_time()
+        time.sleep(0.2)
+        busy = time.process_time() - start
+        sink.emit({'query': 'a'})
+        sink.close()
+        self.assertLess(busy, 0.1)
+        self.assertEqual(self.lines(), [{'query': 'a'}])
+
+    def test_full_queue_drops_events(self):
+        sink = JSONLinesSink(self.path, max_queue=1)
+        # The writer may drain some of them; every event is written or counted
+        for index in range(1000):
+            sink.emit({'index': index})
+        sink.close()
+        self.assertEqual(len(self.lines()) + sink.dropped, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Unit tests for retry_policy.py"""
+
+import asyncio
+import sqlite3
+import time
+import unittest
+from unittest.mock import patch
+from parameterized import parameterized
+from retry_policy import (CircuitBreaker, CircuitOpenError, backoff_delay, is_transient,
+                          retry_on_failure)
+
+
+class Flaky:
+    """Fails with the given errors, then returns 'ok'"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+class MySQLError(Exception):
+    def __init__(self, errno):
+        super().__init__(errno, "mysql")
+        self.errno = errno
+
+
+class TestIsTransient(unittest.TestCase):
+    @parameterized.expand([
+        (sqlite3.OperationalError("database is locked"), True),
+        (sqlite3.OperationalError("no such table: users"), False),
+        (sqlite3.IntegrityError("UNIQUE constraint failed"), False),
+        (MySQLError(1213), True),
+        (MySQLError(1062), False),
+        (Exception(2006, "gone away"), True),
+        (ConnectionResetError(), True),
+        (TimeoutError(), True),
+        (CircuitOpenError(), False),
+        (ValueError("bad"), False),
+    ])
+    def test_classification(self, exc, expected):
+        self.assertEqual(is_transient(exc), expected)
+
+
+class TestBackoff(unittest.TestCase):
+    @parameterized.expand([(0, 0.5), (3, 4.0), (10, 5.0)])
+    def test_delay_is_capped_full_jitter(self, attempt, bound):
+        delays = [backoff_delay(attempt, 0.5, 5.0) for _ in range(200)]
+        self.assertTrue(all(0 <= delay <= bound for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+
+@patch('time.sleep')
+class TestRetryOnFailure(unittest.TestCase):
+    def test_transient_errors_are_retried(self, sleep):
+        flaky = Flaky(sqlite3.OperationalError("database is locked"), TimeoutError())
+        self.assertEqual(retry_on_failure(retries=3, delay=0.01, verbose=False)(flaky)(), 'ok')
+        self.assertEqual((flaky.calls, sleep.call_count), (3, 2))
+
+    def test_permanent_error_is_raised_at_once(self, sleep):
+        flaky = Flaky(sqlite3.IntegrityError("constraint"))
+        with self.assertRaises(sqlite3.IntegrityError):
+            retry_on_failure(retries=5, verbose=False)(flaky)()
+        self.assertEqual((flaky.calls, sleep.call_count), (1, 0))
+
+    def test_last_error_is_raised_after_all_attempts(self, sleep):
+        flaky = Flaky(*(TimeoutError(n) for n in range(3)))
+        with self.assertRaises(TimeoutError) as raised:
+            retry_on_failure(retries=3, delay=0.01, verbose=False)(flaky)()
+        self.assertEqual(raised.exception.args, (2,))
+
+    def test_deadline_stops_retrying(self, sleep):
+        flaky = Flaky(TimeoutError(), TimeoutError())
+        with patch('retry_policy.backoff_delay', return_value=10):
+            with self.assertRaises(TimeoutError):
+                retry_on_failure(retries=5, deadline=1, verbose=False)(flaky)()
+        self.assertEqual(flaky.calls, 1)
+
+    @parameterized.expand([(0,), (-1,)])
+    def test_rejects_fewer_than_one_attempt(self, sleep, retries):
+        with self.assertRaises(ValueError):
+            retry_on_failure(retries=retries)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_the_threshold_and_fails_fast(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        flaky = Flaky(*(TimeoutError() for _ in range(10)))
+        call = retry_on_failure(retries=1, breaker=breaker, verbose=False)(flaky)
+        for _ in range(2):
+            with self.assertRaises(TimeoutError):
+                call()
+        self.assertEqual(breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            call()
+        self.assertEqual(flaky.calls, 2)
+
+    def test_half_open_trial_closes_or_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertEqual(breaker.state, 'half-open')
+        self.assertTrue(breaker.before_call())
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()  # only one trial at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        time.sleep(0.02)
+        self.assertTrue(breaker.before_call())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertFalse(breaker.before_call())
+
+    def test_permanent_error_counts_as_an_answer(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        call = retry_on_failure(retries=1, breaker=breaker, verbose=False)(
+            Flaky(TimeoutError(), ValueError(), TimeoutError()))
+        for error in (TimeoutError, ValueError, TimeoutError):
+            with self.assertRaises(error):
+                call()
+        self.assertEqual(breaker.state, 'closed')
+
+
+class TestAsyncRetry(unittest.IsolatedAsyncioTestCase):
+    async def test_awaits_between_attempts(self):
+        flaky = Flaky(ConnectionResetError())
+
+        @retry_on_failure(retries=2, delay=0.001, verbose=False)
+        async def call():
+            return flaky()
+
+        self.assertEqual(await call(), 'ok')
+        self.assertEqual(flaky.calls, 2)
+
+    async def test_cancelled_trial_lets_the_next_one_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        gate = asyncio.Event()
+
+        @retry_on_failure(retries=1, breaker=breaker, verbose=False)
+        async def call():
+            await gate.wait()
+            return 'ok'
+
+        trial = asyncio.ensure_future(call())
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+        gate.set()
+        self.assertEqual(await call(), 'ok')
+        self.assertEqual(breaker.state, 'closed')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Unit tests for sql_utils.py"""
+
+import unittest
+from parameterized import parameterized
+from sql_utils import (make_cache_key, normalize_sql, primary_key_value, query_dependencies,
+                       write_target)
+
+
+class TestQueryDependencies(unittest.TestCase):
+    @parameterized.expand([
+        ("SELECT * FROM users WHERE id = ?", (7,), {('users', '7')}),
+        ("SELECT * FROM users WHERE users.id = 7 LIMIT 1", None, {('users', '7')}),
+        ("SELECT * FROM users WHERE name = 'a' AND id = ?", (7,), {('users', None)}),
+        ("SELECT * FROM users WHERE age > (SELECT age FROM users WHERE id = 1)", None,
+         {('users', None)}),
+        ("SELECT * FROM users WHERE NOT id = 1", None, {('users', None)}),
+        ("SELECT * FROM users WHERE id = 1 OR id = 2", None, {('users', None)}),
+        ("SELECT * FROM users WHERE (id = 1)", None, {('users', None)}),
+        ("SELECT * FROM users WHERE uid = 1", None, {('users', None)}),
+        ("SELECT * FROM users WHERE name = 'where id = 1'", None, {('users', None)}),
+    ])
+    def test_query_dependencies(self, sql, params, expected):
+        self.assertEqual(query_dependencies(sql, params), expected)
+
+
+class TestWriteTarget(unittest.TestCase):
+    @parameterized.expand([
+        ("DELETE FROM users WHERE id = ?", (1,), ('users', '1')),
+        ("UPDATE users SET name = ? WHERE id = ?", ('x', 3), ('users', '3')),
+        ("UPDATE users SET name = 'id = 5' WHERE id = 3", None, ('users', '3')),
+        ("DELETE FROM users WHERE NOT id = 1", None, ('users', None)),
+        ("UPDATE users SET age = 1 WHERE age > (SELECT age FROM users WHERE id = 1)", None,
+         ('users', None)),
+        ("UPDATE users SET id = 2 WHERE id = 1", None, ('users', None)),
+        ("UPDATE users SET age = 1, users.id = ? WHERE id = ?", (2, 1), ('users', None)),
+        ("INSERT INTO users (id, name) VALUES (1, 'a')", None, ('users', None)),
+        ("SELECT * FROM users WHERE id = 1", None, None),
+    ])
+    def test_write_target(self, sql, params, expected):
+        self.assertEqual(write_target(sql, params), expected)
+
+    def test_placeholder_index_skips_earlier_placeholders(self):
+        sql = "UPDATE users SET name = ?, email = ? WHERE id = ?"
+        self.assertEqual(primary_key_value(sql, ('a', 'b', 9), 'users'), '9')
+
+
+class TestCacheKeys(unittest.TestCase):
+    @parameterized.expand([
+        ("SELECT *\n  FROM users   WHERE age > ?;", "select * from users where age > ?"),
+        ("select * from users where name = 'Ann  Lee'", "select * from users where name = 'Ann  Lee'"),
+        ('SELECT "Name" FROM Users', 'select "Name" from users'),
+    ])
+    def test_normalize_sql(self, sql, expected):
+        self.assertEqual(normalize_sql(sql), expected)
+
+    def test_equivalent_sql_shares_a_key(self):
+        self.assertEqual(make_cache_key("SELECT * FROM users WHERE age > ?", (25,), 'users.db'),
+                         make_cache_key("select *  from users where age > ?;", (25,), 'users.db'))
+
+    @parameterized.expand([
+        ((26,), 'users.db'),
+        ((25,), 'other.db'),
+        (('25',), 'users.db'),
+    ])
+    def test_different_params_or_database_never_collide(self, params, database):
+        key = make_cache_key("SELECT * FROM users WHERE age > ?", (25,), 'users.db')
+        self.assertNotEqual(make_cache_key("SELECT * FROM users WHERE age > ?", params, database),
+                            key)
+
+    @parameterized.expand([
+        ([1, 2],),
+        ({'ids': [1, 2], 'flags': {'a'}},),
+        (bytearray(b'blob'),),
+    ])
+    def test_unhashable_params_give_stable_hashable_keys(self, params):
+        key = make_cache_key("SELECT * FROM users WHERE id IN (?, ?)", params)
+        hash(key)
+        self.assertEqual(key, make_cache_key("SELECT * FROM users WHERE id IN (?, ?)", params))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Unit tests for write_batcher.py"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from write_batcher import WriteBatcher
+from connection_manager import DEFAULT_PRAGMAS
+
+
+def insert_child(conn, parent_id):
+    conn.execute("INSERT INTO child (parent_id) VALUES (?)", (parent_id,))
+    return parent_id
+
+
+class TestWriteBatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'users.db')
+        conn = sqlite3.connect(self.path)
+        conn.executescript("""
+            CREATE TABLE parent (id INTEGER PRIMARY KEY);
+            CREATE TABLE child (
+                id INTEGER PRIMARY KEY,
+                parent_id INTEGER REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED
+            );
+            INSERT INTO parent (id) VALUES (1);
+        """)
+        conn.close()
+        pragmas = dict(DEFAULT_PRAGMAS, foreign_keys='ON')
+        self.batcher = WriteBatcher(self.path, window=0.05, pragmas=pragmas)
+
+    def tearDown(self):
+        self.batcher.close(timeout=5)
+        self.tmp.cleanup()
+
+    def rows(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in conn.execute("SELECT parent_id FROM child ORDER BY id")]
+        finally:
+            conn.close()
+
+    def test_operations_commit_together(self):
+        futures = [self.batcher.submit(insert_child, 1) for _ in range(5)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [1] * 5)
+        self.assertEqual(self.rows(), [1] * 5)
+
+    def test_failing_operation_is_rolled_back_alone(self):
+        good = self.batcher.submit(insert_child, 1)
+        bad = self.batcher.submit(lambda conn: conn.execute("INSERT INTO missing VALUES (1)"))
+        self.assertEqual(good.result(timeout=5), 1)
+        with self.assertRaises(sqlite3.OperationalError):
+            bad.result(timeout=5)
+        self.assertEqual(self.rows(), [1])
+
+    def test_failed_commit_keeps_the_writer_running(self):
+        # The deferred foreign key is only checked (and fails) at COMMIT
+        futures = [self.batcher.submit(insert_child, 1), self.batcher.submit(insert_child, 99)]
+        for future in futures:
+            with self.assertRaises(sqlite3.IntegrityError):
+                future.result(timeout=5)
+        self.assertEqual(self.batcher.stats()['failures'], 2)
+
+        self.assertEqual(self.batcher.call(insert_child, 1), 1)
+        self.assertEqual(self.rows(), [1])
+        self.assertEqual(self.batcher.stats()['batches'], 1)
+
+    def test_submit_after_close_raises(self):
+        self.batcher.close(timeout=5)
+        with self.assertRaises(RuntimeError):
+            self.batcher.submit(insert_child, 1)
+
+    @patch('threading.excepthook')
+    def test_writer_that_cannot_connect_fails_calls(self, excepthook):
+        batcher = WriteBatcher(os.path.join(self.tmp.name, 'missing', 'users.db'))
+        batcher._thread.join(5)
+        excepthook.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            batcher.call(insert_child, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,237 @@
+import os
+import time
+import queue
+import sqlite3
+import functools
+import threading
+from concurrent.futures import Future
+
+from cache_backends import invalidate_statements, track_writes
+from connection_manager import DEFAULT_PRAGMAS, get_manager, savepoint
+
+
+class WriteBatcher:
+    """
+    Group commit for write operations
+
+    Operations submitted from any thread are queued and run by one writer
+    thread, which packs everything that arrives within `window` seconds (up
+    to `max_batch` operations) into a single transaction and commits it
+    with one fsync. Each operation runs in its own savepoint, so a failing
+    operation is rolled back on its own and only its caller sees the error;
+    the others still commit.
+
+    Operations are called as func(conn, *args, **kwargs) and must not
+    commit or roll back themselves (transactional-decorated functions are
+    fine: inside a batch they use a savepoint instead of committing).
+    """
+
+    def __init__(self, path=None, max_batch=256, window=0.0, pragmas=None):
+        """
+        Args:
+            path: SQLite database file (defaults to with_db_connection's)
+            max_batch: Most operations committed together
+            window: Seconds to wait for more operations after the first one;
+                0 batches whatever queued up while the last commit ran
+            pragmas: PRAGMAs for the writer connection (DEFAULT_PRAGMAS)
+        """
+        self.path = get_manager().path if path is None else path
+        self.max_batch = max_batch
+        self.window = window
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.batches = 0
+        self.operations = 0
+        self.failures = 0
+        self._conn = None
+        self._closed = False
+        self._error = None  # why the writer thread died, if it did
+        self._lock = threading.Lock()  # orders submit() against close()'s sentinel
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='write-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queues func(conn, *args, **kwargs) for the next group commit
+
+        Called from inside another batched operation, func runs at once in
+        a nested savepoint of the same transaction.
+
+        Returns:
+            Future: Resolves to func's result once its batch has committed,
+            or to its exception (or the commit's) if it failed
+
+        Raises:
+            RuntimeError: If the batcher is closed or its writer has stopped
+        """
+        future = Future()
+        if threading.current_thread() is self._thread:
+            try:
+                with savepoint(self._conn):
+                    future.set_result(func(self._conn, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self._lock:
+            if self._error is not None:
+                raise RuntimeError("WriteBatcher writer stopped") from self._error
+            if self._closed:
+                raise RuntimeError("WriteBatcher is closed")
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func, *args, **kwargs):
+        """Runs func in the next group commit and returns its result"""
+        return self.submit(func, *args, **kwargs).result()
+
+    def _connect(self):
+        # Autocommit mode: the writer issues BEGIN/COMMIT itself
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _run(self):
+        error = None
+        try:
+            self._conn = self._connect()
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 \
+                            else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit(batch)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._stop(error)
+
+    def _stop(self, error):
+        """Closes the batcher and fails whatever is still queued when the writer exits"""
+        with self._lock:
+            self._closed = True
+            self._error = error
+        stopped = RuntimeError("WriteBatcher writer stopped")
+        stopped.__cause__ = error
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[0].set_running_or_notify_cancel():
+                item[0].set_exception(stopped)
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _commit(self, batch):
+        """Runs one batch in a single transaction and settles its futures"""
+        conn = self._conn
+        done = []
+        try:
+            with track_writes(conn) as writes:
+                conn.execute("BEGIN IMMEDIATE")
+                for future, func, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with savepoint(conn):
+                            result = func(conn, *args, **kwargs)
+                    except Exception as e:
+                        self.failures += 1
+                        future.set_exception(e)
+                    else:
+                        done.append((future, result))
+                conn.execute("COMMIT")
+        except BaseException as e:
+            # BEGIN or COMMIT failed (or the writer is being interrupted):
+            # nothing in the batch was written. Settle the futures even if
+            # the ROLLBACK itself fails and takes the writer down.
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            finally:
+                # Operations that succeeded are still pending: each future
+                # gets the batch's error exactly once
+                for future, func, args, kwargs in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self.failures += len(done)
+            if not isinstance(e, Exception):
+                raise
+            return
+        self.batches += 1
+        self.operations += len(done)
+        invalidate_statements(writes)
+        for future, result in done:
+            future.set_result(result)
+
+    def stats(self):
+        """
+        Returns:
+            dict: batches committed, operations committed, failed operations
+            and the mean batch size
+        """
+        return {
+            'batches': self.batches,
+            'operations': self.operations,
+            'failures': self.failures,
+            'mean_batch': self.operations / self.batches if self.batches else 0.0,
+        }
+
+    def close(self, timeout=None):
+        """Commits everything already queued and stops the writer thread"""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._queue.put(None)
+        self._thread.join(timeout)
+
+
+_batcher = None
+_batcher_pid = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Returns the process-wide WriteBatcher, starting it on first use"""
+    global _batcher, _batcher_pid
+    with _batcher_lock:
+        if _batcher is None or _batcher_pid != os.getpid():
+            _batcher = WriteBatcher()
+            _batcher_pid = os.getpid()
+        return _batcher
+
+
+def group_commit(func=None, *, batcher=None):
+    """Decorator to commit a write together with other callers' writes
+
+    The decorated function takes a connection first, like a transactional
+    one, but is called without it: the call is queued on `batcher` (the
+    process-wide one by default) and blocks until its batch has committed,
+    returning the function's result or raising its error.
+    """
+    if func is None:
+        return lambda f: group_commit(f, batcher=batcher)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return (get_batcher() if batcher is None else batcher).call(func, *args, **kwargs)
+
+    return wrapper
@@ -1,33 +1,57 @@
 #!/usr/bin/python3
-from seed import connect_to_prodev
+from seed import keyset_after, keyset_page_query, pooled_connection
+from query_spec import QuerySpec, stream_batches
+from columnar import UserColumns
 
-def stream_users_in_batches(batch_size):
-    """Generator that yields rows from user_data table in batches of batch_size."""
-    connection = connect_to_prodev()
-    if not connection:
-        return
+def stream_users_in_batches(batch_size, keyset=False, key_column='user_id',
+                            columnar=False):
+    """Generator that yields rows from user_data table in batches of batch_size.
+
+    With keyset=True each batch seeks past the last key of the previous one
+    instead of using OFFSET, so late batches cost as much as early ones.
+    With columnar=True each batch is a UserColumns instead of a list of dicts.
+    """
+    with pooled_connection() as connection:
+        if not connection:
+            return
+
+        cursor = connection.cursor(dictionary=not columnar)
+        offset = 0
+        after = None
 
-    cursor = connection.cursor(dictionary=True)
-    offset = 0
+        while True:
+            if keyset:
+                cursor.execute(*keyset_page_query(batch_size, after, key_column))
+            else:
+                cursor.execute(
+                    "SELECT * FROM user_data LIMIT %s OFFSET %s;",
+                    (batch_size, offset)
+                )
+            batch = cursor.fetchall()
+            if not batch:
+                break
+            yield UserColumns.from_rows(batch) if columnar else batch
+            offset += batch_size
+            if keyset:
+                after = keyset_after(batch[-1], key_column)
 
-    while True:
-        cursor.execute(
-            "SELECT * FROM user_data LIMIT %s OFFSET %s;",
-            (batch_size, offset)
-        )
-        batch = cursor.fetchall()
-        if not batch:
-            break
-        yield batch
-        offset += batch_size
+        cursor.close()
 
-    cursor.close()
-    connection.close()
 
+def batch_processing(batch_size, columnar=False):
+    """Processes each batch to filter users over the age of 25.
+
+    The age filter runs in MySQL, so only matching rows are transferred.
+    With columnar=True the filter is instead applied to each UserColumns
+    batch as one vectorized comparison.
+    """
+    if columnar:
+        for batch in stream_users_in_batches(batch_size, keyset=True, columnar=True):
+            for user in batch.where_age('>', 25):
+                print(user.as_dict())
+        return
 
-def batch_processing(batch_size):
-    """Processes each batch to filter users over the age of 25."""
-    for batch in stream_users_in_batches(batch_size):
+    spec = QuerySpec(filters=[('age', '>', 25)])
+    for batch in stream_batches(spec, batch_size):
         for user in batch:
-            if user['age'] > 25:
-                print(user)
+            print(user)
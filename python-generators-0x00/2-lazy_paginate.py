@@ -1,24 +1,151 @@
 #!/usr/bin/python3
-from seed import connect_to_prodev
+import queue
+import threading
+import time
+
+from seed import keyset_after, keyset_page_query, pooled_connection
 
 def paginate_users(page_size, offset):
     """Fetch a page of users starting at offset with page_size."""
-    connection = connect_to_prodev()
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset))
-    rows = cursor.fetchall()
-    cursor.close()
-    connection.close()
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset))
+        rows = cursor.fetchall()
+        cursor.close()
+    return rows
+
+
+def seek_users(page_size, after=None, key_column='user_id'):
+    """Fetch the page of users that follows the seek key `after`."""
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(*keyset_page_query(page_size, after, key_column))
+        rows = cursor.fetchall()
+        cursor.close()
     return rows
 
 
-def lazy_pagination(page_size):
-    """Generator that lazily loads pages of users."""
+class PrefetchStats:
+    """Queue-depth and stall metrics collected by a prefetching lazy_pagination."""
+
+    def __init__(self):
+        self.pages = 0
+        self.depth_total = 0
+        self.max_depth = 0
+        self.stalls = 0
+        self.stall_time = 0.0
+        self.producer_blocked_time = 0.0
+
+    @property
+    def mean_depth(self):
+        """Average number of ready pages seen by the consumer."""
+        return self.depth_total / self.pages if self.pages else 0.0
+
+    def as_dict(self):
+        return {
+            'pages': self.pages,
+            'mean_depth': self.mean_depth,
+            'max_depth': self.max_depth,
+            'stalls': self.stalls,
+            'stall_time': self.stall_time,
+            'producer_blocked_time': self.producer_blocked_time,
+        }
+
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries an exception raised by the prefetch thread to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _fetch_pages(page_size, keyset, key_column):
+    """Generator that fetches pages on demand."""
     offset = 0
+    after = None
 
     while True:  # single loop
-        page = paginate_users(page_size, offset)
+        if keyset:
+            page = seek_users(page_size, after, key_column)
+        else:
+            page = paginate_users(page_size, offset)
         if not page:
             break
         yield page
         offset += page_size
+        if keyset:
+            after = keyset_after(page[-1], key_column)
+
+
+def _prefetch(pages, depth, stats):
+    """Generator that drains `pages` on a background thread, `depth` pages ahead.
+
+    The producer blocks once `depth` pages are waiting (backpressure). When the
+    consumer stops early, raises, or the generator is closed, the producer is
+    told to stop and joined before the generator exits.
+    """
+    ready = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def offer(item):
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for page in pages:
+                start = time.monotonic()
+                delivered = offer(page)
+                stats.producer_blocked_time += time.monotonic() - start
+                if not delivered:
+                    return
+            offer(_DONE)
+        except Exception as e:
+            offer(_Failure(e))
+        finally:
+            pages.close()
+
+    producer = threading.Thread(target=produce, name="lazy-pagination-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            depth_now = ready.qsize()
+            start = time.monotonic()
+            item = ready.get()
+            if depth_now == 0:
+                stats.stalls += 1
+                stats.stall_time += time.monotonic() - start
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            stats.pages += 1
+            stats.depth_total += depth_now
+            stats.max_depth = max(stats.max_depth, depth_now)
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def lazy_pagination(page_size, keyset=False, key_column='user_id', prefetch=0,
+                    stats=None):
+    """Generator that lazily loads pages of users.
+
+    With keyset=True pages are fetched with seek_users, ordered by key_column.
+    With prefetch=N up to N pages are fetched ahead on a background thread
+    while the consumer works; pass a PrefetchStats as stats to record queue
+    depth and consumer stall time.
+    """
+    pages = _fetch_pages(page_size, keyset, key_column)
+    if prefetch:
+        pages = _prefetch(pages, prefetch, stats if stats is not None else PrefetchStats())
+    yield from pages
@@ -1,34 +1,93 @@
 #!/usr/bin/python3
-from seed import connect_to_prodev
+from functools import partial
+
+from seed import pooled_connection
+from query_spec import QuerySpec, aggregate, _check_column
+from parallel_scan import DEFAULT_SHARD_SIZE, parallel_aggregate, parallel_map_reduce
+from stream_stats import StreamingStats
 
 def stream_user_ages():
     """Generator that yields user ages one by one from the database."""
-    connection = connect_to_prodev()
-    if not connection:
-        return
-
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT age FROM user_data;")
-    
-    for row in cursor:  # single loop
-        yield row['age']
-    
-    cursor.close()
-    connection.close()
-
-
-def calculate_average_age():
-    """Calculates the average age using the generator without loading all data into memory."""
-    total = 0
-    count = 0
-
-    for age in stream_user_ages():  # second loop
-        total += age
-        count += 1
-
-    if count == 0:
+    with pooled_connection() as connection:
+        if not connection:
+            return
+
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute("SELECT age FROM user_data;")
+
+        for row in cursor:  # single loop
+            yield row['age']
+
+        cursor.close()
+
+
+def calculate_average_age(workers=None, shard_size=DEFAULT_SHARD_SIZE):
+    """Calculates the average age without loading all data into memory.
+
+    COUNT and SUM are computed by MySQL, so no ages cross the network;
+    the division stays in Python, so the result is the same exact float
+    as summing the streamed ages (MySQL's AVG would be a rounded DECIMAL).
+    With workers set, user_id shards are aggregated in parallel processes
+    and their partial sums and counts reduced into the average.
+    """
+    spec = QuerySpec(aggregates=[('count', '*'), ('sum', 'age')])
+    if workers:
+        result = parallel_aggregate(spec, shard_size, workers)
+    else:
+        result = aggregate(spec)
+
+    if not result.get('count'):
         return 0
-    return total / count
+    return result['sum_age'] / result['count']
+
+
+def stream_column_batches(column='age', batch_size=10000):
+    """Generator that yields lists of a numeric column's values, batch_size at a time."""
+    query = f"SELECT {_check_column(column)} FROM user_data"
+    with pooled_connection() as connection:
+        if not connection:
+            return
+
+        cursor = connection.cursor()
+        cursor.execute(query)
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [row[0] for row in rows]
+
+        cursor.close()
+
+
+def _shard_stats(bin_width, rows):
+    """Builds the StreamingStats of one parallel_scan shard."""
+    stats = StreamingStats(bin_width)
+    stats.update_batch([row[0] for row in rows])
+    return stats
+
+
+def calculate_column_stats(column='age', bin_width=10, batch_size=10000,
+                           workers=None, shard_size=DEFAULT_SHARD_SIZE):
+    """Computes mean, variance, min/max, histogram and p50/p95/p99 in one pass.
+
+    With workers set, each user_id shard is summarised in its own process and
+    the partial StreamingStats are merged.
+    """
+    if workers:
+        return parallel_map_reduce(
+            partial(_shard_stats, bin_width),
+            StreamingStats.merge,
+            StreamingStats(bin_width),
+            QuerySpec(columns=[column]),
+            shard_size,
+            workers,
+        ).summary()
+
+    stats = StreamingStats(bin_width)
+    for values in stream_column_batches(column, batch_size):
+        stats.update_batch(values)
+    return stats.summary()
 
 
 if __name__ == "__main__":
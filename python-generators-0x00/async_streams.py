@@ -0,0 +1,162 @@
+#!/usr/bin/python3
+"""
+asyncio versions of the user_data streaming generators
+
+Built on aiomysql, so several streams can run concurrently on one event
+loop without blocking it. Every coroutine borrows from a per-event-loop
+aiomysql pool. If a stream is abandoned or cancelled part way through, its
+connection is closed instead of being drained and returned, so cancelling
+a long stream is cheap and never hands a half-read connection to the next
+borrower. Close abandoned streams promptly with contextlib.aclosing.
+"""
+
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+import aiomysql
+
+from seed import keyset_after, keyset_page_query
+
+DB_CONFIG = {
+    'host': 'localhost',
+    'user': 'root',      # Change as per your MySQL setup
+    'password': '',      # Change as per your MySQL setup
+    'db': 'ALX_prodev',
+}
+
+_pools = weakref.WeakKeyDictionary()  # event loop -> Task creating its pool
+
+
+async def get_async_pool(maxsize=10):
+    """
+    Returns the aiomysql pool of the running event loop, creating it once
+
+    Args:
+        maxsize: Maximum connections of the pool when it is first created
+
+    Returns:
+        aiomysql.Pool: The shared pool
+    """
+    loop = asyncio.get_running_loop()
+    creating = _pools.get(loop)
+    if creating is None:
+        creating = loop.create_task(
+            aiomysql.create_pool(minsize=1, maxsize=maxsize, autocommit=True, **DB_CONFIG)
+        )
+        _pools[loop] = creating
+        creating.add_done_callback(lambda task: _forget_failed(loop, task))
+    return await asyncio.shield(creating)
+
+
+def _forget_failed(loop, task):
+    """Drops a pool creation that failed so the next get_async_pool retries"""
+    if (task.cancelled() or task.exception() is not None) and _pools.get(loop) is task:
+        del _pools[loop]
+
+
+async def close_async_pool():
+    """Closes the running loop's pool, if one was created"""
+    creating = _pools.pop(asyncio.get_running_loop(), None)
+    if creating is not None:
+        try:
+            pool = await creating
+        except (OSError, aiomysql.Error):
+            return  # never opened
+        pool.close()
+        await pool.wait_closed()
+
+
+@asynccontextmanager
+async def _borrow():
+    """Borrows a pooled connection, discarding it if the block did not finish"""
+    pool = await get_async_pool()
+    connection = await pool.acquire()
+    finished = False
+    try:
+        yield connection
+        finished = True
+    finally:
+        if not finished:
+            # Cancelled or abandoned mid-stream: drop the socket rather than
+            # reading the rest of the result set
+            connection.close()
+        pool.release(connection)
+
+
+async def async_stream_users():
+    """Async generator that yields rows from user_data one by one as dictionaries."""
+    async with _borrow() as connection:
+        # Not `async with`: closing an unbuffered cursor early would drain it
+        cursor = await connection.cursor(aiomysql.SSDictCursor)
+        await cursor.execute("SELECT * FROM user_data")
+        while True:
+            row = await cursor.fetchone()
+            if row is None:
+                break
+            yield row
+        await cursor.close()
+
+
+async def async_stream_users_in_batches(batch_size, keyset=False, key_column='user_id'):
+    """Async generator that yields rows from user_data in batches of batch_size."""
+    async with _borrow() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            offset = 0
+            after = None
+            while True:
+                if keyset:
+                    await cursor.execute(*keyset_page_query(batch_size, after, key_column))
+                else:
+                    await cursor.execute(
+                        "SELECT * FROM user_data LIMIT %s OFFSET %s", (batch_size, offset)
+                    )
+                batch = await cursor.fetchall()
+                if not batch:
+                    break
+                yield list(batch)
+                offset += batch_size
+                if keyset:
+                    after = keyset_after(batch[-1], key_column)
+
+
+async def async_paginate_users(page_size, offset=0, after=None, keyset=False,
+                               key_column='user_id'):
+    """Fetch one page of users, by offset or following the seek key `after`."""
+    async with _borrow() as connection:
+        async with connection.cursor(aiomysql.DictCursor) as cursor:
+            if keyset:
+                await cursor.execute(*keyset_page_query(page_size, after, key_column))
+            else:
+                await cursor.execute(
+                    "SELECT * FROM user_data LIMIT %s OFFSET %s", (page_size, offset)
+                )
+            return list(await cursor.fetchall())
+
+
+async def async_lazy_pagination(page_size, keyset=False, key_column='user_id'):
+    """Async generator that lazily loads pages of users."""
+    offset = 0
+    after = None
+    while True:
+        page = await async_paginate_users(page_size, offset, after, keyset, key_column)
+        if not page:
+            break
+        yield page
+        offset += page_size
+        if keyset:
+            after = keyset_after(page[-1], key_column)
+
+
+async def async_stream_user_ages():
+    """Async generator that yields user ages one by one from the database."""
+    async with _borrow() as connection:
+        # Not `async with`: closing an unbuffered cursor early would drain it
+        cursor = await connection.cursor(aiomysql.SSCursor)
+        await cursor.execute("SELECT age FROM user_data")
+        while True:
+            row = await cursor.fetchone()
+            if row is None:
+                break
+            yield row[0]
+        await cursor.close()
@@ -0,0 +1,310 @@
+#!/usr/bin/python3
+"""
+Benchmarks for the user_data streaming generators
+
+Run against a seeded ALX_prodev database:
+
+    python3 benchmark.py pagination --page-size 1000 --pages 200
+
+    python3 benchmark.py scan --shard-size 50000
+    python3 benchmark.py prefetch --page-size 1000 --consumer-ms 5
+    python3 benchmark.py async --streams 1 4 16
+
+The columnar and stats benchmarks run on generated data and need no database:
+
+    python3 benchmark.py columnar --rows 1000000 --batch-size 10000
+    python3 benchmark.py stats --values 1000000 --shards 8
+"""
+
+import argparse
+import asyncio
+import bisect
+import importlib
+import os
+import random
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import seed
+from columnar import UserColumns
+from parallel_scan import parallel_map_reduce
+from query_spec import QuerySpec
+from stream_stats import StreamingStats
+
+
+def _timed_page(cursor, query, params):
+    """Runs one page query and returns (rows, seconds)"""
+    start = time.perf_counter()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    return rows, time.perf_counter() - start
+
+
+def bench_pagination(args):
+    """Per-page latency of OFFSET paging versus keyset paging"""
+    connection = seed.connect_to_prodev()
+    if not connection:
+        return
+    cursor = connection.cursor()
+    columns = ', '.join(seed.USER_DATA_COLUMNS)
+    offset_query = f"SELECT {columns} FROM user_data LIMIT %s OFFSET %s"
+
+    offset_times = []
+    keyset_times = []
+    after = None
+    for page in range(args.pages):
+        rows, elapsed = _timed_page(
+            cursor, offset_query, (args.page_size, page * args.page_size)
+        )
+        offset_times.append(elapsed)
+
+        rows, elapsed = _timed_page(
+            cursor, *seed.keyset_page_query(args.page_size, after, args.key_column)
+        )
+        keyset_times.append(elapsed)
+        if not rows:
+            break
+        after = seed.keyset_after(rows[-1], args.key_column)
+
+    cursor.close()
+    connection.close()
+
+    print(f"{'page':>6} {'offset':>10} {'offset ms':>10} {'keyset ms':>10}")
+    step = max(1, len(keyset_times) // 10)
+    for page in range(0, len(keyset_times), step):
+        print(f"{page:>6} {page * args.page_size:>10} "
+              f"{offset_times[page] * 1000:>10.2f} {keyset_times[page] * 1000:>10.2f}")
+    print(f"total  offset {sum(offset_times):.3f}s  keyset {sum(keyset_times):.3f}s")
+
+
+def bench_prefetch(args):
+    """Sweep time, queue depth and consumer stalls for several prefetch depths"""
+    lazy_paginate = importlib.import_module('2-lazy_paginate')
+    print(f"{'depth':>5} {'seconds':>8} {'mean depth':>10} {'stalls':>7} {'stall s':>8}")
+    for depth in args.depths:
+        stats = lazy_paginate.PrefetchStats()
+        start = time.perf_counter()
+        for _ in lazy_paginate.lazy_pagination(args.page_size, keyset=True,
+                                               prefetch=depth, stats=stats):
+            time.sleep(args.consumer_ms / 1000)
+        elapsed = time.perf_counter() - start
+        print(f"{depth:>5} {elapsed:>8.2f} {stats.mean_depth:>10.2f} "
+              f"{stats.stalls:>7} {stats.stall_time:>8.2f}")
+
+
+def _sync_count_ages():
+    stream_ages = importlib.import_module('4-stream_ages')
+    return sum(1 for _ in stream_ages.stream_user_ages())
+
+
+async def _async_count_ages(streams):
+    import async_streams
+
+    async def count():
+        total = 0
+        async for _ in async_streams.async_stream_user_ages():
+            total += 1
+        return total
+
+    await async_streams.get_async_pool(maxsize=streams)
+    try:
+        return await asyncio.gather(*(count() for _ in range(streams)))
+    finally:
+        await async_streams.close_async_pool()
+
+
+def bench_async(args):
+    """Concurrent full age streams: asyncio on one loop versus sync generators in threads"""
+    print(f"{'streams':>7} {'threads s':>10} {'asyncio s':>10}")
+    for streams in args.streams:
+        seed.configure_pool(max_size=streams)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=streams) as executor:
+            list(executor.map(lambda _: _sync_count_ages(), range(streams)))
+        threaded = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(_async_count_ages(streams))
+        concurrent = time.perf_counter() - start
+        print(f"{streams:>7} {threaded:>10.2f} {concurrent:>10.2f}")
+
+
+def _count_rows(rows):
+    return len(rows)
+
+
+def _add(total, partial):
+    return total + partial
+
+
+def bench_scan(args):
+    """Full-table scan time as the number of worker processes grows"""
+    spec = QuerySpec(columns=['user_id', 'age'])
+    workers = 1
+    baseline = None
+    print(f"{'workers':>7} {'rows':>10} {'seconds':>8} {'speedup':>8}")
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        rows = parallel_map_reduce(_count_rows, _add, 0, spec, args.shard_size, workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{workers:>7} {rows:>10} {elapsed:>8.2f} {baseline / elapsed:>7.2f}x")
+        workers *= 2
+
+
+def _generated_rows(count):
+    """Random user_data tuples shaped like the cursor output"""
+    rng = random.Random(42)
+    return [
+        (str(uuid.UUID(int=rng.getrandbits(128))), f"User {i}", f"user{i}@example.com",
+         rng.randint(18, 90))
+        for i in range(count)
+    ]
+
+
+def _dict_batches(rows, batch_size):
+    """Dict-row batches, as cursor(dictionary=True) produces them"""
+    columns = seed.USER_DATA_COLUMNS
+    for start in range(0, len(rows), batch_size):
+        yield [dict(zip(columns, row)) for row in rows[start:start + batch_size]]
+
+
+def _columnar_batches(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        yield UserColumns.from_rows(rows[start:start + batch_size])
+
+
+def _batch_memory(build):
+    """Bytes allocated to hold one built batch"""
+    tracemalloc.start()
+    batch = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del batch
+    return size
+
+
+def bench_columnar(args):
+    """Build + age > 25 filter cost of dict-row batches versus UserColumns"""
+    rows = _generated_rows(args.rows)
+
+    start = time.perf_counter()
+    kept_dicts = 0
+    for batch in _dict_batches(rows, args.batch_size):
+        kept_dicts += sum(1 for user in batch if user['age'] > 25)
+    dict_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    kept_columns = 0
+    for batch in _columnar_batches(rows, args.batch_size):
+        kept_columns += len(batch.where_age('>', 25))
+    columnar_seconds = time.perf_counter() - start
+
+    assert kept_dicts == kept_columns
+    sample = rows[:args.batch_size]
+    dict_bytes = _batch_memory(lambda: next(_dict_batches(sample, args.batch_size)))
+    columnar_bytes = _batch_memory(lambda: UserColumns.from_rows(sample))
+
+    print(f"{args.rows} rows, batches of {args.batch_size}, {kept_dicts} kept")
+    print(f"{'mode':<10} {'rows/s':>12} {'batch KiB':>10}")
+    print(f"{'dict':<10} {args.rows / dict_seconds:>12,.0f} {dict_bytes / 1024:>10.1f}")
+    print(f"{'columnar':<10} {args.rows / columnar_seconds:>12,.0f} {columnar_bytes / 1024:>10.1f}")
+
+
+def _rank_error(ordered, estimate, q):
+    """Distance, in quantile units, between an estimate's true rank and q"""
+    low = bisect.bisect_left(ordered, estimate) / len(ordered)
+    high = bisect.bisect_right(ordered, estimate) / len(ordered)
+    return 0.0 if low <= q <= high else min(abs(low - q), abs(high - q))
+
+
+def _check_stats(label, stats, values, seconds):
+    ordered = sorted(values)
+    count = len(values)
+    mean = sum(values) / count
+    variance = sum((value - mean) ** 2 for value in values) / count
+    errors = " ".join(
+        f"p{p}:{_rank_error(ordered, stats.percentile(p), p / 100):.4f}" for p in (50, 95, 99)
+    )
+    print(f"{label:<26} {count / seconds:>12,.0f} {abs(stats.mean - mean):>10.2e} "
+          f"{abs(stats.variance - variance) / variance:>10.2e}  {errors}")
+
+
+def bench_stats(args):
+    """Accuracy and throughput of StreamingStats against exact results"""
+    rng = random.Random(7)
+    datasets = {
+        'age': [rng.randint(18, 90) for _ in range(args.values)],
+        'lognormal': [rng.lognormvariate(3, 1) for _ in range(args.values)],
+    }
+    print(f"{'dataset / mode':<26} {'values/s':>12} {'mean err':>10} {'var relerr':>10}  "
+          f"percentile rank error")
+    for name, values in datasets.items():
+        start = time.perf_counter()
+        per_value = StreamingStats()
+        for value in values:
+            per_value.update(value)
+        _check_stats(f"{name} per-value", per_value, values, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batched = StreamingStats()
+        for offset in range(0, len(values), args.batch_size):
+            batched.update_batch(values[offset:offset + args.batch_size])
+        _check_stats(f"{name} batched", batched, values, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        merged = StreamingStats()
+        shard_size = -(-len(values) // args.shards)
+        for offset in range(0, len(values), shard_size):
+            shard = StreamingStats()
+            shard.update_batch(values[offset:offset + shard_size])
+            merged.merge(shard)
+        _check_stats(f"{name} {args.shards} merged shards", merged, values,
+                     time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    pagination = commands.add_parser("pagination", help=bench_pagination.__doc__)
+    pagination.add_argument("--page-size", type=int, default=1000)
+    pagination.add_argument("--pages", type=int, default=200)
+    pagination.add_argument("--key-column", default="user_id")
+    pagination.set_defaults(func=bench_pagination)
+
+    scan = commands.add_parser("scan", help=bench_scan.__doc__)
+    scan.add_argument("--shard-size", type=int, default=50000)
+    scan.add_argument("--max-workers", type=int, default=os.cpu_count())
+    scan.set_defaults(func=bench_scan)
+
+    prefetch = commands.add_parser("prefetch", help=bench_prefetch.__doc__)
+    prefetch.add_argument("--page-size", type=int, default=1000)
+    prefetch.add_argument("--consumer-ms", type=float, default=5.0,
+                          help="simulated work per page")
+    prefetch.add_argument("--depths", type=int, nargs="+", default=[0, 1, 2, 4, 8])
+    prefetch.set_defaults(func=bench_prefetch)
+
+    async_streams = commands.add_parser("async", help=bench_async.__doc__)
+    async_streams.add_argument("--streams", type=int, nargs="+", default=[1, 4, 16])
+    async_streams.set_defaults(func=bench_async)
+
+    columnar = commands.add_parser("columnar", help=bench_columnar.__doc__)
+    columnar.add_argument("--rows", type=int, default=1000000)
+    columnar.add_argument("--batch-size", type=int, default=10000)
+    columnar.set_defaults(func=bench_columnar)
+
+    stats = commands.add_parser("stats", help=bench_stats.__doc__)
+    stats.add_argument("--values", type=int, default=1000000)
+    stats.add_argument("--batch-size", type=int, default=10000)
+    stats.add_argument("--shards", type=int, default=8)
+    stats.set_defaults(func=bench_stats)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+"""
+Column-oriented batches of user_data rows
+
+A UserColumns batch keeps one sequence per column instead of one dict per
+row: the string columns are the tuples produced by transposing the fetched
+rows (no per-row containers survive) and age is a packed int32 column, a
+NumPy array when NumPy is installed and an array('i') otherwise. Filters on
+age then run as a single vectorized comparison.
+"""
+
+import operator
+from array import array
+
+from seed import USER_DATA_COLUMNS
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+COMPARISONS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+class UserRow:
+    """Lightweight user_data row, readable by attribute or by column name"""
+
+    __slots__ = USER_DATA_COLUMNS
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __getitem__(self, column):
+        return getattr(self, column)
+
+    def __iter__(self):
+        return (getattr(self, column) for column in USER_DATA_COLUMNS)
+
+    def __eq__(self, other):
+        return isinstance(other, UserRow) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return f"UserRow{tuple(self)!r}"
+
+    def as_dict(self):
+        """Returns the row as the dict a dictionary cursor would produce"""
+        return dict(zip(USER_DATA_COLUMNS, self))
+
+
+class UserColumns:
+    """A batch of user_data rows stored column by column"""
+
+    __slots__ = USER_DATA_COLUMNS
+
+    def __init__(self, user_id=(), name=(), email=(), age=None):
+        """
+        Args:
+            user_id, name, email: Sequences of column values
+            age: int32 NumPy array or array('i') (built from any iterable otherwise)
+        """
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = _int_column(age if age is not None else ())
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Builds a batch from tuples in USER_DATA_COLUMNS order
+
+        Args:
+            rows: Sequence of (user_id, name, email, age) tuples
+
+        Returns:
+            UserColumns: The transposed batch
+        """
+        if not rows:
+            return cls()
+        user_id, name, email, age = zip(*rows)
+        return cls(user_id, name, email, age)
+
+    def __len__(self):
+        return len(self.user_id)
+
+    def __iter__(self):
+        return (UserRow(*values)
+                for values in zip(self.user_id, self.name, self.email, self.age_values()))
+
+    def age_values(self):
+        """Ages as plain Python ints"""
+        return self.age.tolist()
+
+    def age_mask(self, op, value):
+        """
+        Evaluates `age <op> value` over the whole batch
+
+        Returns:
+            NumPy bool array, or a list of bools without NumPy
+        """
+        compare = COMPARISONS[op]
+        if np is not None:
+            return compare(self.age, value)
+        return [compare(age, value) for age in self.age]
+
+    def where_age(self, op, value):
+        """
+        Returns the rows whose age satisfies `age <op> value`
+
+        Args:
+            op: Comparison operator, e.g. '>'
+            value: Operand
+
+        Returns:
+            UserColumns: Filtered batch
+        """
+        return self.take(self.age_mask(op, value))
+
+    def take(self, mask):
+        """Selects rows by a boolean mask"""
+        if np is not None:
+            indices = np.flatnonzero(mask).tolist()
+            age = self.age[mask]
+        else:
+            indices = [i for i, keep in enumerate(mask) if keep]
+            age = array('i', (self.age[i] for i in indices))
+        return UserColumns(
+            tuple(self.user_id[i] for i in indices),
+            tuple(self.name[i] for i in indices),
+            tuple(self.email[i] for i in indices),
+            age,
+        )
+
+
+def _int_column(values):
+    """Packs ages into an int32 column"""
+    if np is not None:
+        return np.asarray(values, dtype=np.int32)
+    if isinstance(values, array):
+        return values
+    return array('i', values)
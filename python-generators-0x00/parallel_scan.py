@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+"""
+Parallel sharded scans over user_data
+
+The table is split into user_id key ranges of roughly shard_size rows and
+every range is streamed by a process-pool worker on its own connection
+(each worker process gets its own seed pool). Results come back per shard,
+either in key order or as soon as each shard finishes.
+
+Filters, projections and aggregates are described with query_spec.QuerySpec.
+Residual (Python callable) predicates and map_reduce mappers run inside the
+workers, so they must be picklable module-level functions.
+"""
+
+import os
+from collections import deque
+from itertools import islice
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from seed import pooled_connection
+from query_spec import QuerySpec, aggregate_name, _group_name, _plain
+
+DEFAULT_SHARD_SIZE = 100000
+
+
+def shard_ranges(shard_size=DEFAULT_SHARD_SIZE, spec=None):
+    """
+    Splits user_data into user_id ranges of about shard_size rows
+
+    Boundaries are found by walking the primary key index one shard at a
+    time, which reads keys only.
+
+    Args:
+        shard_size: Target number of rows per shard
+        spec: Optional QuerySpec whose filters narrow the rows being split
+
+    Returns:
+        list: (after, upto) pairs, meaning after < user_id <= upto, where
+        None stands for an open end
+    """
+    boundaries = []
+    with pooled_connection() as connection:
+        if not connection:
+            return []
+        cursor = connection.cursor()
+        after = None
+        while True:
+            keys = QuerySpec(columns=['user_id'], filters=spec.filters if spec else ())
+            extra = [("user_id > %s", (after,))] if after is not None else []
+            query, params = keys.compile(extra_where=extra, order_by='user_id')
+            cursor.execute(f"{query} LIMIT 1 OFFSET %s", params + (shard_size - 1,))
+            row = cursor.fetchone()
+            if row is None:
+                break
+            after = row[0]
+            boundaries.append(after)
+        cursor.close()
+
+    ranges = []
+    lower = None
+    for upper in boundaries:
+        ranges.append((lower, upper))
+        lower = upper
+    ranges.append((lower, None))
+    return ranges
+
+
+def _range_where(shard):
+    """WHERE clauses selecting one shard"""
+    after, upto = shard
+    clauses = []
+    if after is not None:
+        clauses.append(("user_id > %s", (after,)))
+    if upto is not None:
+        clauses.append(("user_id <= %s", (upto,)))
+    return clauses
+
+
+def scan_shard(shard, spec):
+    """
+    Worker: reads every row of one shard that matches the spec
+
+    Args:
+        shard: (after, upto) user_id range
+        spec: QuerySpec without aggregates
+
+    Returns:
+        list: Row tuples in spec.columns order, sorted by user_id
+    """
+    query, params = spec.compile(extra_where=_range_where(shard), order_by='user_id')
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=bool(spec.residual))
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+    if spec.residual:
+        rows = [tuple(row[c] for c in spec.columns) for row in rows if spec.matches(row)]
+    return rows
+
+
+def _map_shard(shard, spec, mapper):
+    """Worker: applies mapper to the rows of one shard"""
+    return mapper(scan_shard(shard, spec))
+
+
+def _run_shards(func, shards, args, workers, ordered, max_pending=None):
+    """
+    Runs func(shard, *args) for every shard and yields the results
+
+    At most max_pending shards (2 per worker by default) are queued,
+    running or finished-but-unconsumed at a time; the next shard is only
+    submitted as a result is taken, so a slow consumer throttles the
+    workers instead of letting finished shards pile up in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    shards = iter(shards)
+
+    def submit_next(count=1):
+        return [executor.submit(func, shard, *args) for shard in islice(shards, count)]
+
+    try:
+        initial = submit_next(max_pending or 2 * workers)
+        if ordered:
+            window = deque(initial)
+            while window:
+                result = window.popleft().result()
+                window.extend(submit_next())
+                yield result
+        else:
+            running = set(initial)
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    running.update(submit_next())
+                    yield result
+    finally:
+        # Consumer stopped early or a shard failed: drop the queued shards
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def parallel_scan(spec=None, shard_size=DEFAULT_SHARD_SIZE, workers=None, ordered=True):
+    """
+    Generator that streams user_data rows scanned in parallel shards
+
+    Args:
+        spec: QuerySpec (filters/projection) for the scan, all rows by default
+        shard_size: Target number of rows per shard
+        workers: Number of worker processes (defaults to the CPU count)
+        ordered: Yield in user_id order; False yields each shard as soon as
+            it completes
+
+    Yields:
+        tuple: A row in spec.columns order
+    """
+    spec = spec or QuerySpec()
+    if spec.aggregates:
+        raise ValueError("Use parallel_aggregate for QuerySpecs with aggregates")
+    for rows in _run_shards(scan_shard, shard_ranges(shard_size, spec), (spec,), workers, ordered):
+        yield from rows
+
+
+def parallel_map_reduce(mapper, reducer, initial, spec=None,
+                        shard_size=DEFAULT_SHARD_SIZE, workers=None):
+    """
+    Maps every shard in a worker and folds the partial results
+
+    Args:
+        mapper: Picklable function turning a shard's row list into a partial result
+        reducer: Function combining (accumulated, partial); partials arrive
+            in completion order, so it must be commutative
+        initial: Starting accumulated value
+        spec: QuerySpec (filters/projection) for the rows given to mapper
+        shard_size: Target number of rows per shard
+        workers: Number of worker processes
+
+    Returns:
+        The reduced result
+    """
+    spec = spec or QuerySpec()
+    result = initial
+    shards = shard_ranges(shard_size, spec)
+    for partial in _run_shards(_map_shard, shards, (spec, mapper), workers, ordered=False):
+        result = reducer(result, partial)
+    return result
+
+
+def _partial_aggregates(aggregates):
+    """Rewrites aggregates into forms that can be combined across shards"""
+    partial = []
+    for func, column in aggregates:
+        needed = [('sum', column), ('count', column)] if func == 'avg' else [(func, column)]
+        for item in needed:
+            if item not in partial:
+                partial.append(item)
+    return partial
+
+
+def _aggregate_shard(shard, spec):
+    """Worker: runs the partial aggregates for one shard on the server"""
+    query, params = spec.compile(extra_where=_range_where(shard))
+    with pooled_connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = [{key: _plain(value) for key, value in row.items()} for row in cursor.fetchall()]
+        cursor.close()
+    return rows
+
+
+def _combine(func, left, right):
+    """Reducer for one partial aggregate value (None means no rows)"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if func in ('count', 'sum'):
+        return left + right
+    return min(left, right) if func == 'min' else max(left, right)
+
+
+def parallel_aggregate(spec, shard_size=DEFAULT_SHARD_SIZE, workers=None):
+    """
+    Computes a QuerySpec's aggregates shard by shard and combines them
+
+    Each worker runs count/sum/min/max on the server for its key range (avg
+    is split into sum and count); the parent reduces the partial rows.
+
+    Args:
+        spec: QuerySpec with aggregates and only SQL-translatable filters
+        shard_size: Target number of rows per shard
+        workers: Number of worker processes
+
+    Returns:
+        dict or list: Same shape as query_spec.aggregate
+    """
+    if not spec.aggregates or not spec.pushdown:
+        raise ValueError("parallel_aggregate needs SQL-only filters and at least one aggregate")
+    partial_spec = QuerySpec(filters=spec.filters, aggregates=_partial_aggregates(spec.aggregates),
+                             group_by=spec.group_by)
+    group = _group_name(spec.group_by) if spec.group_by is not None else None
+
+    merged = {}
+    shards = shard_ranges(shard_size, spec)
+    for rows in _run_shards(_aggregate_shard, shards, (partial_spec,), workers, ordered=False):
+        for row in rows:
+            key = row.get(group) if group else None
+            totals = merged.setdefault(key, {})
+            for func, column in partial_spec.aggregates:
+                name = aggregate_name(func, column)
+                totals[name] = _combine(func, totals.get(name), row[name])
+
+    results = []
+    for key in sorted(merged, key=lambda k: (k is None, k)):
+        totals = merged[key]
+        values = {group: key} if group else {}
+        for func, column in spec.aggregates:
+            if func == 'avg':
+                count = totals.get(aggregate_name('count', column)) or 0
+                total = totals.get(aggregate_name('sum', column))
+                values[aggregate_name(func, column)] = total / count if count else None
+            else:
+                values[aggregate_name(func, column)] = totals.get(aggregate_name(func, column))
+        results.append(values)
+
+    if group:
+        return results
+    if results:
+        return results[0]
+    return {aggregate_name(func, column): 0 if func == 'count' else None
+            for func, column in spec.aggregates}
@@ -0,0 +1,318 @@
+#!/usr/bin/python3
+"""
+Query specifications for the user_data generators
+
+A QuerySpec describes which rows (filters), which columns (projection) and
+which summaries (aggregates, optionally grouped) a caller needs. Everything
+that can be expressed in SQL is compiled into the query so MySQL does the
+work and only the result crosses the network; predicates given as Python
+callables cannot be translated and are evaluated on the streamed rows.
+"""
+
+from decimal import Decimal
+
+from seed import USER_DATA_COLUMNS, pooled_connection
+
+
+# SQL operator -> Python evaluation, for rows filtered client side
+OPERATORS = {
+    '=': lambda value, operand: value == operand,
+    '!=': lambda value, operand: value != operand,
+    '<': lambda value, operand: value < operand,
+    '<=': lambda value, operand: value <= operand,
+    '>': lambda value, operand: value > operand,
+    '>=': lambda value, operand: value >= operand,
+    'in': lambda value, operand: value in operand,
+    'between': lambda value, operand: operand[0] <= value <= operand[1],
+}
+
+AGGREGATES = ('count', 'sum', 'avg', 'min', 'max')
+
+
+def _check_column(column):
+    """Rejects anything that is not a user_data column (they are inlined in SQL)"""
+    if column not in USER_DATA_COLUMNS:
+        raise ValueError(f"Unknown user_data column: {column}")
+    return column
+
+
+class Filter:
+    """A column comparison that can run in SQL or in Python"""
+
+    def __init__(self, column, op, value):
+        """
+        Args:
+            column: user_data column name
+            op: One of OPERATORS
+            value: Operand (a sequence for 'in', a (low, high) pair for 'between')
+        """
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        self.column = _check_column(column)
+        self.op = op
+        self.value = value
+
+    def to_sql(self):
+        """Returns (sql, params) for a WHERE clause"""
+        if self.op == 'in':
+            if not self.value:
+                # IN () is a syntax error in MySQL; an empty set matches nothing
+                return "1 = 0", ()
+            placeholders = ", ".join(["%s"] * len(self.value))
+            return f"{self.column} IN ({placeholders})", tuple(self.value)
+        if self.op == 'between':
+            return f"{self.column} BETWEEN %s AND %s", tuple(self.value)
+        return f"{self.column} {self.op} %s", (self.value,)
+
+    def __call__(self, row):
+        return OPERATORS[self.op](row[self.column], self.value)
+
+
+class AgeBucket:
+    """Group key that buckets ages into fixed-width ranges (e.g. 20, 30, 40)"""
+
+    name = 'age_bucket'
+
+    def __init__(self, width=10):
+        self.width = int(width)
+
+    def to_sql(self):
+        return f"FLOOR(age / {self.width}) * {self.width}"
+
+    def __call__(self, row):
+        return row['age'] // self.width * self.width
+
+
+class QuerySpec:
+    """Filters, projection and aggregates for a scan over user_data"""
+
+    def __init__(self, columns=None, filters=(), aggregates=(), group_by=None):
+        """
+        Args:
+            columns: Columns to return (None for all); ignored when aggregating
+            filters: Filter objects, (column, op, value) tuples or callables
+                taking a row dict; callables are evaluated in Python
+            aggregates: (function, column) pairs, e.g. ('avg', 'age') or ('count', '*')
+            group_by: Column name or AgeBucket to group the aggregates by
+        """
+        self.columns = tuple(_check_column(c) for c in columns) if columns else USER_DATA_COLUMNS
+        self.filters = []
+        self.residual = []
+        for item in filters:
+            if isinstance(item, tuple):
+                item = Filter(*item)
+            if isinstance(item, Filter):
+                self.filters.append(item)
+            elif callable(item):
+                self.residual.append(item)
+            else:
+                raise TypeError(f"Unsupported filter: {item!r}")
+        self.aggregates = []
+        for func, column in aggregates:
+            if func not in AGGREGATES:
+                raise ValueError(f"Unsupported aggregate: {func}")
+            if column != '*':
+                _check_column(column)
+            self.aggregates.append((func, column))
+        if isinstance(group_by, str):
+            _check_column(group_by)
+        self.group_by = group_by
+
+    @property
+    def pushdown(self):
+        """True when the whole spec runs on the server"""
+        return not self.residual
+
+    def compile(self, extra_where=(), order_by=None):
+        """
+        Compiles the spec into SQL
+
+        With residual predicates the aggregates cannot run on the server, so
+        the query only applies the translatable filters and selects every
+        column the residual callables might look at.
+
+        Args:
+            extra_where: Additional (clause, params) pairs AND-ed to the filters
+            order_by: Column list to order plain row scans by
+
+        Returns:
+            tuple: (query, params)
+        """
+        where = ""
+        params = ()
+        clauses = []
+        for item in self.filters:
+            clause, clause_params = item.to_sql()
+            clauses.append(clause)
+            params += clause_params
+        for clause, clause_params in extra_where:
+            clauses.append(f"({clause})")
+            params += tuple(clause_params)
+        if clauses:
+            where = " WHERE " + " AND ".join(clauses)
+
+        if self.aggregates and self.pushdown:
+            select = [f"{_sql_aggregate(func, column)} AS {aggregate_name(func, column)}"
+                      for func, column in self.aggregates]
+            group = ""
+            if self.group_by is not None:
+                key_sql = _group_sql(self.group_by)
+                select.insert(0, f"{key_sql} AS {_group_name(self.group_by)}")
+                group = f" GROUP BY {key_sql} ORDER BY {key_sql}"
+            return f"SELECT {', '.join(select)} FROM user_data{where}{group}", params
+
+        columns = USER_DATA_COLUMNS if self.residual else self.columns
+        order = f" ORDER BY {order_by}" if order_by else ""
+        return f"SELECT {', '.join(columns)} FROM user_data{where}{order}", params
+
+    def matches(self, row):
+        """Evaluates the residual predicates on a row dict"""
+        return all(predicate(row) for predicate in self.residual)
+
+
+def aggregate_name(func, column):
+    """Result key of an aggregate, e.g. avg_age or count"""
+    return func if column == '*' else f"{func}_{column}"
+
+
+def _sql_aggregate(func, column):
+    return f"{func.upper()}({column})"
+
+
+def _group_sql(group_by):
+    return group_by.to_sql() if isinstance(group_by, AgeBucket) else group_by
+
+
+def _group_name(group_by):
+    return group_by.name if isinstance(group_by, AgeBucket) else group_by
+
+
+def _group_key(group_by, row):
+    return group_by(row) if isinstance(group_by, AgeBucket) else row[group_by]
+
+
+def _plain(value, fractional=False):
+    """Converts MySQL DECIMAL aggregates to int/float"""
+    if isinstance(value, Decimal):
+        if fractional or value != value.to_integral_value():
+            return float(value)
+        return int(value)
+    return value
+
+
+def stream_batches(spec, batch_size=1000):
+    """
+    Generator that yields batches of row dicts matching the spec
+
+    A single query is streamed with fetchmany, so only one batch is held in
+    memory; residual predicates are applied to each batch before it is yielded.
+
+    Args:
+        spec: QuerySpec without aggregates
+        batch_size: Rows fetched per round trip
+
+    Yields:
+        list: Non-empty batch of matching rows
+    """
+    query, params = spec.compile()
+    with pooled_connection() as connection:
+        if not connection:
+            return
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            if spec.residual:
+                batch = [row for row in batch if spec.matches(row)]
+                if not batch:
+                    continue
+                if spec.columns != USER_DATA_COLUMNS:
+                    batch = [{c: row[c] for c in spec.columns} for row in batch]
+            yield batch
+        cursor.close()
+
+
+def aggregate(spec, batch_size=1000):
+    """
+    Computes the spec's aggregates, on the server whenever possible
+
+    Args:
+        spec: QuerySpec with aggregates
+        batch_size: Rows fetched per round trip when evaluating in Python
+
+    Returns:
+        dict or list: One dict of aggregate values, or a list of dicts (one
+        per group, ordered by group key) when group_by is set
+    """
+    if not spec.aggregates:
+        raise ValueError("QuerySpec has no aggregates")
+
+    if spec.pushdown:
+        query, params = spec.compile()
+        with pooled_connection() as connection:
+            if not connection:
+                return [] if spec.group_by is not None else {}
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query, params)
+            rows = [{key: _plain(value, key.startswith('avg')) for key, value in row.items()}
+                    for row in cursor.fetchall()]
+            cursor.close()
+        return rows if spec.group_by is not None else rows[0]
+
+    groups = {}
+    for batch in stream_batches(QuerySpec(filters=spec.filters + spec.residual), batch_size):
+        for row in batch:
+            key = _group_key(spec.group_by, row) if spec.group_by is not None else None
+            groups.setdefault(key, _Accumulator(spec.aggregates)).add(row)
+
+    if spec.group_by is None:
+        return groups.get(None, _Accumulator(spec.aggregates)).result()
+    name = _group_name(spec.group_by)
+    return [dict({name: key}, **groups[key].result()) for key in sorted(groups)]
+
+
+class _Accumulator:
+    """Python fallback for the SQL aggregate functions"""
+
+    def __init__(self, aggregates):
+        self.aggregates = aggregates
+        self.columns = {column for _, column in aggregates if column != '*'}
+        self.summed = {column for func, column in aggregates if func in ('sum', 'avg')}
+        self.rows = 0
+        self.counts = dict.fromkeys(self.columns, 0)
+        self.sums = dict.fromkeys(self.summed, 0)
+        self.mins = {}
+        self.maxs = {}
+
+    def add(self, row):
+        self.rows += 1
+        for column in self.columns:
+            value = row[column]
+            if value is None:
+                continue
+            self.counts[column] += 1
+            if column in self.summed:
+                self.sums[column] += value
+            if column not in self.mins or value < self.mins[column]:
+                self.mins[column] = value
+            if column not in self.maxs or value > self.maxs[column]:
+                self.maxs[column] = value
+
+    def result(self):
+        values = {}
+        for func, column in self.aggregates:
+            name = aggregate_name(func, column)
+            count = self.rows if column == '*' else self.counts[column]
+            if func == 'count':
+                values[name] = count
+            elif func == 'sum':
+                values[name] = self.sums[column] if count else None
+            elif func == 'avg':
+                values[name] = self.sums[column] / count if count else None
+            elif func == 'min':
+                values[name] = self.mins.get(column)
+            else:
+                values[name] = self.maxs.get(column)
+        return values
@@ -4,12 +4,22 @@ Database Seeding Module for ALX Python Generators Project
 """
 
 import mysql.connector
+import base64
 import csv
+import json
 import uuid
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from mysql.connector import Error
 
 
+# Column order of the user_data table, used for explicit SELECT lists
+USER_DATA_COLUMNS = ('user_id', 'name', 'email', 'age')
+
+
 def connect_db():
     """
     Connects to the MySQL database server
@@ -55,12 +65,7 @@ def connect_to_prodev():
         connection: MySQL connection object or None if failed
     """
     try:
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',      # Change as per your MySQL setup
-            password='',      # Change as per your MySQL setup
-            database='ALX_prodev'
-        )
+        connection = _open_prodev()
         if connection.is_connected():
             print("Connected to ALX_prodev database successfully")
             return connection
@@ -69,6 +74,268 @@ def connect_to_prodev():
         return None
 
 
+def _open_prodev():
+    """Opens a new ALX_prodev connection without logging, raising Error on failure"""
+    return mysql.connector.connect(
+        host='localhost',
+        user='root',      # Change as per your MySQL setup
+        password='',      # Change as per your MySQL setup
+        database='ALX_prodev'
+    )
+
+
+class PoolTimeoutError(Error):
+    """Raised when no pooled connection becomes free within the checkout timeout"""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of ALX_prodev connections shared by the generator modules
+
+    Connections are health-checked (pinged) on checkout and replaced once
+    they are older than max_lifetime seconds. When every connection is
+    checked out, callers wait up to checkout_timeout seconds for one to be
+    released.
+    """
+
+    def __init__(self, max_size=5, max_lifetime=3600, checkout_timeout=30,
+                 connect=_open_prodev):
+        """
+        Initialize an empty pool; connections are opened lazily
+
+        Args:
+            max_size: Maximum number of open connections
+            max_lifetime: Seconds after which a connection is recycled
+            checkout_timeout: Seconds to wait for a free connection
+            connect: Callable opening a new connection
+        """
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self._connect = connect
+        self._idle = deque()  # (connection, created_at) pairs
+        self._size = 0
+        self._lock = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'unhealthy': 0,
+        }
+        self._born = {}
+
+    def acquire(self, timeout=None):
+        """
+        Checks out a healthy connection, opening one if the pool has room
+
+        Args:
+            timeout: Seconds to wait for a free connection (defaults to checkout_timeout)
+
+        Returns:
+            connection: MySQL connection object
+
+        Raises:
+            PoolTimeoutError: If no connection became free in time
+            Error: If a new connection could not be opened
+        """
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                connection = self._next_idle_or_slot(deadline)
+            if connection is None:
+                try:
+                    connection = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._born[id(connection)] = time.monotonic()
+                    self._stats['created'] += 1
+                    self._stats['checkouts'] += 1
+                return connection
+            if self._usable(connection):
+                with self._lock:
+                    self._stats['checkouts'] += 1
+                return connection
+            self._discard(connection)
+
+    def _next_idle_or_slot(self, deadline):
+        """Pops an idle connection or reserves a slot (returns None); caller holds the lock"""
+        waited = False
+        start = time.monotonic()
+        while not self._idle and self._size >= self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._stats['timeouts'] += 1
+                raise PoolTimeoutError(
+                    f"No pooled connection available after waiting {time.monotonic() - start:.1f}s"
+                )
+            waited = True
+            self._lock.wait(remaining)
+        if waited:
+            self._stats['waits'] += 1
+            self._stats['wait_time'] += time.monotonic() - start
+        if self._idle:
+            return self._idle.pop()
+        self._size += 1
+        return None
+
+    def _usable(self, connection):
+        """Checks lifetime and liveness of an idle connection"""
+        born = self._born.get(id(connection), 0)
+        if time.monotonic() - born > self.max_lifetime:
+            with self._lock:
+                self._stats['recycled'] += 1
+            return False
+        try:
+            healthy = connection.is_connected()
+        except Error:
+            healthy = False
+        if not healthy:
+            with self._lock:
+                self._stats['unhealthy'] += 1
+        return healthy
+
+    def _discard(self, connection, abort=False):
+        """Closes a connection (abort: drops the socket without a QUIT) and frees its slot"""
+        try:
+            if abort:
+                connection.shutdown()
+            else:
+                connection.close()
+        except Error:
+            pass
+        with self._lock:
+            self._born.pop(id(connection), None)
+            self._size -= 1
+            self._lock.notify()
+
+    def release(self, connection):
+        """
+        Returns a connection to the pool
+
+        Any open transaction is rolled back so the next borrower starts from
+        a clean session. A connection with an unread result set (a stream
+        abandoned part way) is dropped instead: draining it would read every
+        remaining row, and closing the socket makes the server stop the query.
+
+        Args:
+            connection: Connection previously returned by acquire
+        """
+        try:
+            if connection.unread_result:
+                self._discard(connection, abort=True)
+                return
+            connection.rollback()
+        except Error:
+            self._discard(connection)
+            return
+        with self._lock:
+            self._idle.append(connection)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Context manager that borrows a connection and always releases it"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self):
+        """
+        Returns a snapshot of the pool counters
+
+        Returns:
+            dict: checkouts, waits, wait_time, timeouts, created, recycled,
+            unhealthy, plus the current size and idle count
+        """
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['size'] = self._size
+            snapshot['idle'] = len(self._idle)
+        return snapshot
+
+    def close(self):
+        """Closes every idle connection"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for connection in idle:
+            self._discard(connection)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide ALX_prodev connection pool
+
+    A forked child gets a fresh pool instead of sharing its parent's sockets.
+
+    Returns:
+        ConnectionPool: The shared pool
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool()
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def configure_pool(**kwargs):
+    """
+    Replaces the shared pool with one built from the given ConnectionPool arguments
+
+    Returns:
+        ConnectionPool: The new shared pool
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = ConnectionPool(**kwargs)
+        _pool_pid = os.getpid()
+        return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Borrows a connection from the shared pool for the duration of a with block
+
+    Yields:
+        connection: MySQL connection object or None if it could not be opened
+
+    Raises:
+        PoolTimeoutError: If every pooled connection stayed checked out
+    """
+    pool = get_pool()
+    try:
+        connection = pool.acquire()
+    except PoolTimeoutError:
+        raise
+    except Error as e:
+        print(f"Error connecting to ALX_prodev database: {e}")
+        yield None
+        return
+    try:
+        yield connection
+    finally:
+        pool.release(connection)
+
+
 def create_table(connection):
     """
     Creates a table user_data if it does not exist with the required fields
@@ -84,7 +351,8 @@ def create_table(connection):
             name VARCHAR(255) NOT NULL,
             email VARCHAR(255) NOT NULL,
             age INT NOT NULL,
-            INDEX idx_user_id (user_id)
+            INDEX idx_user_id (user_id),
+            INDEX idx_age (age)
         )
         """
         cursor.execute(create_table_query)
@@ -94,77 +362,409 @@ def create_table(connection):
         print(f"Error creating table: {e}")
 
 
-def insert_data(connection, csv_file_path):
+def read_csv_batches(csv_file_path, batch_size=1000, skip_records=0):
+    """
+    Generator that parses the user CSV file in fixed-size chunks
+
+    Only one chunk is held in memory at a time, whatever the file size.
+
+    Args:
+        csv_file_path: Path to the CSV file containing user data
+        batch_size: Number of CSV records per chunk
+        skip_records: Number of data records to skip (used when resuming)
+
+    Yields:
+        tuple: (records_read, rows) where records_read counts every data
+        record consumed so far and rows holds the valid (user_id, name,
+        email, age) tuples of this chunk
+    """
+    with open(csv_file_path, 'r', newline='') as file:
+        csv_reader = csv.reader(file)
+        next(csv_reader, None)  # Skip header row
+
+        records_read = 0
+        for _ in range(skip_records):
+            if next(csv_reader, None) is None:
+                return
+            records_read += 1
+
+        rows = []
+        for row in csv_reader:
+            records_read += 1
+            if len(row) >= 4:
+                user_id = row[0] if row[0] else str(uuid.uuid4())
+                try:
+                    age = int(row[3])
+                except ValueError:
+                    age = 0  # Default value if age is not valid
+                rows.append((user_id, row[1], row[2], age))
+            if records_read % batch_size == 0:
+                yield records_read, rows
+                rows = []
+        if rows or records_read % batch_size:
+            yield records_read, rows
+
+
+def _read_checkpoint(checkpoint_path):
+    """Returns the number of CSV records already committed, None if there is no checkpoint"""
+    try:
+        with open(checkpoint_path, 'r') as file:
+            return int(file.read().strip() or 0)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        return 0
+
+
+def _write_checkpoint(checkpoint_path, value):
+    """Atomically replaces the checkpoint file's content with value"""
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(str(value))
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _multi_row_insert(row_count):
+    """Builds one INSERT IGNORE statement carrying row_count rows"""
+    values = ", ".join(["(%s, %s, %s, %s)"] * row_count)
+    return f"INSERT IGNORE INTO user_data (user_id, name, email, age) VALUES {values}"
+
+
+def _load_data_infile(connection, cursor, csv_file_path):
+    """
+    Bulk loads the CSV with LOAD DATA LOCAL INFILE
+
+    Returns:
+        int: Number of rows loaded, or None if the server does not allow it
+    """
+    cursor.execute("SHOW VARIABLES LIKE 'local_infile'")
+    setting = cursor.fetchone()
+    if not setting or str(setting[1]).upper() not in ('ON', '1'):
+        return None
+    try:
+        cursor.execute(
+            """
+            LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            IGNORE 1 LINES
+            (@user_id, name, email, @age)
+            SET user_id = IF(@user_id = '', UUID(), @user_id),
+                age = IF(@age REGEXP '^-?[0-9]+$', @age, 0)
+            """,
+            (os.path.abspath(csv_file_path),)
+        )
+    except Error as e:
+        # Client side refused (connection opened without allow_local_infile)
+        print(f"LOAD DATA LOCAL INFILE unavailable ({e}), using batched inserts")
+        connection.rollback()
+        return None
+    connection.commit()
+    return cursor.rowcount
+
+
+def insert_data(connection, csv_file_path, batch_size=1000, use_load_data=False,
+                checkpoint_path=None, report_every=100000):
     """
     Inserts data in the database from CSV file if it does not exist
+
+    The file is streamed in chunks of batch_size records, each sent as a
+    single multi-row INSERT and committed on its own. A 0 checkpoint is
+    written to checkpoint_path before the first batch and the number of
+    records consumed after every commit, so an interrupted load (even one
+    that died between its first commit and checkpoint) resumes from the last
+    checkpoint instead of skipping the file because the table is no longer
+    empty. Re-sending batches committed after that checkpoint is harmless
+    thanks to INSERT IGNORE.
     
     Args:
         connection: MySQL connection object
         csv_file_path: Path to the CSV file containing user data
+        batch_size: Number of CSV records per INSERT/commit
+        use_load_data: Try LOAD DATA LOCAL INFILE first when the server allows it
+        checkpoint_path: Progress file (defaults to csv_file_path + '.checkpoint')
+        report_every: Print progress every this many records
+
+    Returns:
+        int: Number of rows sent to the database
     """
+    if checkpoint_path is None:
+        checkpoint_path = f"{csv_file_path}.checkpoint"
+    inserted = 0
     try:
-        # Check if data already exists to avoid duplicates
+        if not os.path.exists(csv_file_path):
+            raise FileNotFoundError(csv_file_path)
+
         cursor = connection.cursor()
-        cursor.execute("SELECT COUNT(*) FROM user_data")
-        count = cursor.fetchone()[0]
-        
-        if count > 0:
-            print("Data already exists in the table. Skipping insertion.")
-            cursor.close()
-            return
-        
-        # Read and insert data from CSV
-        with open(csv_file_path, 'r') as file:
-            csv_reader = csv.reader(file)
-            next(csv_reader)  # Skip header row
-            
-            insert_query = """
-            INSERT IGNORE INTO user_data (user_id, name, email, age)
-            VALUES (%s, %s, %s, %s)
-            """
-            
-            data_to_insert = []
-            for row in csv_reader:
-                if len(row) >= 4:
-                    user_id = row[0] if row[0] else str(uuid.uuid4())
-                    name = row[1]
-                    email = row[2]
-                    try:
-                        age = int(row[3])
-                    except ValueError:
-                        age = 0  # Default value if age is not valid
-                    
-                    data_to_insert.append((user_id, name, email, age))
-            
-            # Insert in batches to handle large datasets
-            batch_size = 100
-            for i in range(0, len(data_to_insert), batch_size):
-                batch = data_to_insert[i:i + batch_size]
-                cursor.executemany(insert_query, batch)
+        resume_from = _read_checkpoint(checkpoint_path)
+
+        if resume_from is not None:
+            print(f"Resuming insertion after {resume_from} records")
+        else:
+            # Check if data already exists to avoid duplicates
+            cursor.execute("SELECT COUNT(*) FROM user_data")
+            count = cursor.fetchone()[0]
+
+            if count > 0:
+                print("Data already exists in the table. Skipping insertion.")
+                cursor.close()
+                return 0
+
+            if use_load_data:
+                loaded = _load_data_infile(connection, cursor, csv_file_path)
+                if loaded is not None:
+                    print(f"Inserted {loaded} records successfully")
+                    cursor.close()
+                    return loaded
+
+            resume_from = 0
+            _write_checkpoint(checkpoint_path, resume_from)
+
+        full_batch_query = _multi_row_insert(batch_size)
+        next_report = resume_from + report_every
+        for records_read, rows in read_csv_batches(csv_file_path, batch_size, resume_from):
+            if rows:
+                query = full_batch_query if len(rows) == batch_size else _multi_row_insert(len(rows))
+                cursor.execute(query, [value for row in rows for value in row])
                 connection.commit()
-            
-            print(f"Inserted {len(data_to_insert)} records successfully")
-        
+                inserted += len(rows)
+            _write_checkpoint(checkpoint_path, records_read)
+            if records_read >= next_report:
+                print(f"Processed {records_read} records")
+                next_report = records_read + report_every
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        print(f"Inserted {inserted} records successfully")
         cursor.close()
         
     except FileNotFoundError:
         print(f"CSV file {csv_file_path} not found")
     except Error as e:
         print(f"Error inserting data: {e}")
+    return inserted
+
+
+def keyset_columns(key_column='user_id'):
+    """
+    Returns the ordering columns used to seek on key_column
+
+    user_id is unique, so it is used on its own; any other column gets
+    user_id appended as a tie-breaker to keep the ordering stable.
+
+    Args:
+        key_column: Indexed user_data column to seek on
+
+    Returns:
+        tuple: Column names making up the seek key
+    """
+    if key_column not in USER_DATA_COLUMNS:
+        raise ValueError(f"Unknown user_data column: {key_column}")
+    if key_column == 'user_id':
+        return ('user_id',)
+    return (key_column, 'user_id')
+
+
+def keyset_page_query(page_size, after=None, key_column='user_id',
+                      columns=USER_DATA_COLUMNS):
+    """
+    Builds a keyset (seek) page query over user_data
+
+    Instead of LIMIT/OFFSET, which makes MySQL scan and discard every
+    earlier row, each page starts right after the key of the previous
+    page's last row, so every page costs the same index seek.
+
+    Args:
+        page_size: Number of rows per page
+        after: Seek key of the previous page's last row, None for the first page
+        key_column: Indexed user_data column to seek on
+        columns: Columns to select
+
+    Returns:
+        tuple: (query, params) ready for cursor.execute
+    """
+    keys = keyset_columns(key_column)
+    where = ""
+    params = ()
+    if after is not None:
+        if len(keys) == 1:
+            where = f" WHERE {keys[0]} > %s"
+            params = tuple(after)
+        else:
+            # Expanded form of (key, user_id) > (%s, %s) that MySQL can
+            # always turn into an index range scan
+            where = f" WHERE {keys[0]} > %s OR ({keys[0]} = %s AND user_id > %s)"
+            params = (after[0], after[0], after[1])
+    query = (
+        f"SELECT {', '.join(columns)} FROM user_data{where} "
+        f"ORDER BY {', '.join(keys)} LIMIT %s"
+    )
+    return query, params + (page_size,)
+
+
+def keyset_after(row, key_column='user_id', columns=USER_DATA_COLUMNS):
+    """
+    Extracts the seek key from the last row of a page
 
+    Args:
+        row: Row as a dictionary or a tuple in the order of columns
+        key_column: Column the page was seeked on
+        columns: Columns the row was selected with
+
+    Returns:
+        tuple: Seek key to pass as `after` for the next page
+    """
+    keys = keyset_columns(key_column)
+    if isinstance(row, dict):
+        return tuple(row[key] for key in keys)
+    return tuple(row[columns.index(key)] for key in keys)
+
+
+def encode_resume_token(after, batch, key_column='user_id'):
+    """
+    Builds an opaque continuation token for a resumable stream
+
+    Args:
+        after: Seek key of the last row handed out (None before the first row)
+        batch: Number of batches fetched so far
+        key_column: Column the stream seeks on
+
+    Returns:
+        str: URL-safe token
+    """
+    state = {'key': key_column, 'after': list(after) if after is not None else None,
+             'batch': batch}
+    return base64.urlsafe_b64encode(json.dumps(state).encode()).decode()
 
-def stream_users_generator(connection, batch_size=100):
+
+def decode_resume_token(token):
+    """
+    Decodes a token produced by encode_resume_token
+
+    Returns:
+        dict: key, after and batch
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token.encode()))
+        after = tuple(state['after']) if state['after'] is not None else None
+        return {'key': state['key'], 'after': after, 'batch': int(state['batch'])}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid resume token: {token!r}") from e
+
+
+def read_resume_checkpoint(checkpoint_path):
+    """
+    Reads the token saved by a ResumableUserStream
+
+    Returns:
+        str: The token, or None if there is no checkpoint file
+    """
+    try:
+        with open(checkpoint_path, 'r') as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class ResumableUserStream:
+    """
+    Iterable over user_data rows that can continue where a previous run stopped
+
+    Rows are read with keyset pagination on key_column, so a position is just
+    the key of the last row handed out. `token` always describes the position
+    after the last yielded row; passing it to a new stream continues with the
+    next row, with no duplicates or gaps. With checkpoint_path set, the token
+    is also saved every checkpoint_interval batches once the consumer has
+    asked for the row after them (i.e. finished with them), and when the
+    stream is exhausted.
+    """
+
+    def __init__(self, connection, batch_size=100, token=None, checkpoint_path=None,
+                 checkpoint_interval=10, key_column='user_id'):
+        """
+        Args:
+            connection: MySQL connection object
+            batch_size: Number of rows to fetch at a time
+            token: Continuation token of an earlier run, None to start from the beginning
+            checkpoint_path: File the token is periodically written to
+            checkpoint_interval: Batches between checkpoint writes
+            key_column: Indexed column the stream seeks on
+        """
+        self.connection = connection
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.key_column = key_column
+        self.after = None
+        self.batch = 0
+        if token is not None:
+            state = decode_resume_token(token)
+            if state['key'] != key_column:
+                raise ValueError(
+                    f"Token was issued for key {state['key']!r}, not {key_column!r}"
+                )
+            self.after = state['after']
+            self.batch = state['batch']
+
+    @property
+    def token(self):
+        """Continuation token for the position after the last yielded row"""
+        return encode_resume_token(self.after, self.batch, self.key_column)
+
+    def checkpoint(self):
+        """Writes the current token to checkpoint_path"""
+        if self.checkpoint_path:
+            _write_checkpoint(self.checkpoint_path, self.token)
+
+    def __iter__(self):
+        cursor = self.connection.cursor()
+        try:
+            while True:
+                cursor.execute(*keyset_page_query(self.batch_size, self.after, self.key_column))
+                batch = cursor.fetchall()
+                if not batch:
+                    break
+                self.batch += 1
+
+                for row in batch:
+                    self.after = keyset_after(row, self.key_column)
+                    yield row
+
+                if self.batch % self.checkpoint_interval == 0:
+                    self.checkpoint()
+            self.checkpoint()
+        finally:
+            cursor.close()
+
+
+def stream_users_generator(connection, batch_size=100, keyset=False,
+                           key_column='user_id', resume_token=None,
+                           checkpoint_path=None, checkpoint_interval=10):
     """
     Generator function that streams rows from user_data table one by one
+
+    Passing resume_token or checkpoint_path streams through a
+    ResumableUserStream (keyset order), continuing after the token's position
+    and saving tokens to checkpoint_path as it goes.
     
     Args:
         connection: MySQL connection object
         batch_size: Number of rows to fetch at a time
+        keyset: Seek on key_column instead of paging with OFFSET
+        key_column: Indexed column used for keyset pagination
+        resume_token: Token from an earlier run (see read_resume_checkpoint)
+        checkpoint_path: File to save continuation tokens to
+        checkpoint_interval: Batches between checkpoint writes
     
     Yields:
         tuple: A row from the user_data table
     """
     try:
+        if resume_token is not None or checkpoint_path is not None:
+            yield from ResumableUserStream(connection, batch_size, resume_token,
+                                           checkpoint_path, checkpoint_interval, key_column)
+            return
+
         cursor = connection.cursor()
         
         # Get total count for progress tracking
@@ -175,11 +775,15 @@ def stream_users_generator(connection, batch_size=100):
         
         # Fetch data in batches using generator approach
         offset = 0
+        after = None
         while True:
-            cursor.execute(
-                "SELECT user_id, name, email, age FROM user_data LIMIT %s OFFSET %s",
-                (batch_size, offset)
-            )
+            if keyset:
+                cursor.execute(*keyset_page_query(batch_size, after, key_column))
+            else:
+                cursor.execute(
+                    "SELECT user_id, name, email, age FROM user_data LIMIT %s OFFSET %s",
+                    (batch_size, offset)
+                )
             
             batch = cursor.fetchall()
             if not batch:
@@ -189,6 +793,8 @@ def stream_users_generator(connection, batch_size=100):
                 yield row
             
             offset += batch_size
+            if keyset:
+                after = keyset_after(batch[-1], key_column)
             print(f"Processed {min(offset, total_rows)}/{total_rows} users")
         
         cursor.close()
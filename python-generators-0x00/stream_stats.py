@@ -0,0 +1,272 @@
+#!/usr/bin/python3
+"""
+One-pass, mergeable statistics for streamed numeric columns
+
+StreamingStats keeps count, mean and variance (Welford, with Chan's formula
+to fold in whole batches or other accumulators), min/max, a fixed-width
+histogram and a t-digest for approximate percentiles. Every part can be
+merged, so shards scanned in parallel can each build their own accumulator
+and the parent combines them without a second pass over the data.
+
+Batches are processed with NumPy when it is installed.
+"""
+
+import math
+from itertools import groupby
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+
+class TDigest:
+    """
+    Merging t-digest for approximate quantiles
+
+    Values are buffered and periodically compressed into at most about
+    compression / 2 centroids, which are kept small near the tails (k1
+    scale function) so extreme percentiles stay accurate.
+    """
+
+    def __init__(self, compression=100):
+        """
+        Args:
+            compression: Accuracy/size trade-off (delta); more is more accurate
+        """
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.total = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+        self._buffer_limit = 10 * compression
+
+    def update(self, value):
+        """Adds one value"""
+        self._buffer.append(value)
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+
+    def update_batch(self, values):
+        """Adds a sequence of values"""
+        self._buffer.extend(values.tolist() if np is not None and isinstance(values, np.ndarray)
+                            else values)
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+
+    def merge(self, other):
+        """Folds another digest into this one"""
+        other._compress()
+        self._compress()
+        self._compress(other.means, other.weights)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _k_bucket(self, q):
+        """Index of the k1-scale unit a cumulative quantile falls into"""
+        return math.floor(self.compression / (2 * math.pi) * math.asin(2 * q - 1))
+
+    def _compress(self, extra_means=(), extra_weights=()):
+        """Merges the buffer (and extra centroids) into the centroid list"""
+        if not self._buffer and not extra_means:
+            return
+        if self._buffer:
+            self.min = min(self.min, min(self._buffer))
+            self.max = max(self.max, max(self._buffer))
+        means = self.means + list(extra_means) + self._buffer
+        weights = self.weights + list(extra_weights) + [1] * len(self._buffer)
+        self._buffer = []
+        total = sum(weights)
+
+        if np is not None:
+            self._compress_arrays(np.asarray(means, dtype=float),
+                                  np.asarray(weights, dtype=float), total)
+        else:
+            pairs = sorted(zip(means, weights))
+            cumulative = 0
+            keyed = []
+            for mean, weight in pairs:
+                keyed.append((self._k_bucket(cumulative / total), mean, weight))
+                cumulative += weight
+            self.means, self.weights = [], []
+            for _, group in groupby(keyed, key=lambda item: item[0]):
+                group = list(group)
+                weight = sum(item[2] for item in group)
+                self.means.append(sum(item[1] * item[2] for item in group) / weight)
+                self.weights.append(weight)
+        self.total = total
+
+    def _compress_arrays(self, means, weights, total):
+        """Vectorized _compress: groups sorted values by k1-scale unit"""
+        order = np.argsort(means, kind='stable')
+        means = means[order]
+        weights = weights[order]
+        left = (np.cumsum(weights) - weights) / total
+        buckets = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * left - 1))
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        bucket_weights = np.add.reduceat(weights, starts)
+        bucket_means = np.add.reduceat(means * weights, starts) / bucket_weights
+        self.means = bucket_means.tolist()
+        self.weights = bucket_weights.tolist()
+
+    def quantile(self, q):
+        """
+        Estimates the q-th quantile (0 <= q <= 1)
+
+        Returns:
+            float: Estimate, or None if no values were added
+        """
+        self._compress()
+        if not self.means:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        target = q * self.total
+        # Interpolate between centroid centres; the ends anchor on min/max
+        previous_center, previous_mean = 0.0, self.min
+        cumulative = 0.0
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0.0
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_center, previous_mean = center, mean
+            cumulative += weight
+        span = self.total - previous_center
+        fraction = (target - previous_center) / span if span else 0.0
+        return previous_mean + fraction * (self.max - previous_mean)
+
+
+class StreamingStats:
+    """Count, mean, variance, min/max, histogram and percentiles in one pass"""
+
+    def __init__(self, bin_width=10, compression=100):
+        """
+        Args:
+            bin_width: Width of the histogram bins (bins start at multiples of it)
+            compression: t-digest compression used for percentiles
+        """
+        self.bin_width = bin_width
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.histogram = {}
+        self.digest = TDigest(compression)
+
+    def update(self, value):
+        """Adds one value (Welford's update)"""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+        bucket = value // self.bin_width * self.bin_width
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+        self.digest.update(value)
+
+    def update_batch(self, values):
+        """
+        Adds a batch of values
+
+        The batch's own count/mean/M2, extremes and histogram are computed
+        in one go (vectorized with NumPy) and folded in with Chan's formula.
+        """
+        if np is not None:
+            array = np.asarray(values)
+            if not array.size:
+                return
+            buckets, counts = np.unique(array // self.bin_width * self.bin_width,
+                                        return_counts=True)
+            batch_mean = float(array.mean())
+            self._combine(int(array.size), batch_mean,
+                          float(((array - batch_mean) ** 2).sum()),
+                          array.min().item(), array.max().item(),
+                          zip(buckets.tolist(), counts.tolist()))
+            self.digest.update_batch(array)
+            return
+
+        values = list(values)
+        if not values:
+            return
+        batch_mean = sum(values) / len(values)
+        histogram = {}
+        for value in values:
+            bucket = value // self.bin_width * self.bin_width
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        self._combine(len(values), batch_mean,
+                      sum((value - batch_mean) ** 2 for value in values),
+                      min(values), max(values), histogram.items())
+        self.digest.update_batch(values)
+
+    def merge(self, other):
+        """
+        Folds another accumulator (e.g. from a parallel shard) into this one
+
+        Returns:
+            StreamingStats: self
+        """
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max,
+                          other.histogram.items())
+            self.digest.merge(other.digest)
+        return self
+
+    def _combine(self, count, mean, m2, minimum, maximum, histogram):
+        """Chan et al. parallel combination of (count, mean, M2) plus extremes"""
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = minimum if self.min is None or minimum < self.min else self.min
+        self.max = maximum if self.max is None or maximum > self.max else self.max
+        for bucket, bucket_count in histogram:
+            self.histogram[bucket] = self.histogram.get(bucket, 0) + bucket_count
+
+    @property
+    def variance(self):
+        """Population variance"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def sample_variance(self):
+        """Sample (n - 1) variance"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance)
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0-100)"""
+        return self.digest.quantile(p / 100)
+
+    def summary(self):
+        """
+        Returns the statistics as a dict
+
+        Returns:
+            dict: count, mean, variance, stddev, min, max, p50, p95, p99 and
+            the histogram (bin start -> count)
+        """
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else None,
+            'variance': self.variance,
+            'stddev': self.stddev,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'histogram': dict(sorted(self.histogram.items())),
+        }
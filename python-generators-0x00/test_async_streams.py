@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Unit tests for async_streams.py"""
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import aiomysql
+import async_streams
+
+
+def fake_pool(rows=()):
+    connection = MagicMock()
+    cursor = MagicMock()
+    cursor.execute = AsyncMock()
+    cursor.fetchone = AsyncMock(side_effect=list(rows) + [None])
+    cursor.close = AsyncMock()
+    connection.cursor = AsyncMock(return_value=cursor)
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=connection)
+    pool.wait_closed = AsyncMock()
+    return pool, connection
+
+
+class TestGetAsyncPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await async_streams.close_async_pool()
+
+    async def test_pool_is_created_once_per_loop(self):
+        pool, _ = fake_pool()
+        with patch('aiomysql.create_pool', AsyncMock(return_value=pool)) as create:
+            self.assertIs(await async_streams.get_async_pool(), pool)
+            self.assertIs(await async_streams.get_async_pool(), pool)
+        create.assert_awaited_once()
+
+    async def test_failed_creation_is_retried(self):
+        pool, _ = fake_pool()
+        error = aiomysql.OperationalError(2003, "Can't connect")
+        with patch('aiomysql.create_pool', AsyncMock(side_effect=[error, pool])) as create:
+            with self.assertRaises(aiomysql.OperationalError):
+                await async_streams.get_async_pool()
+            self.assertIs(await async_streams.get_async_pool(), pool)
+        self.assertEqual(create.await_count, 2)
+
+
+class TestBorrow(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pool, self.connection = fake_pool(rows=[{'user_id': 1}, {'user_id': 2}])
+        patcher = patch.object(async_streams, 'get_async_pool', AsyncMock(return_value=self.pool))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_finished_stream_returns_its_connection(self):
+        rows = [row async for row in async_streams.async_stream_users()]
+        self.assertEqual(rows, [{'user_id': 1}, {'user_id': 2}])
+        self.connection.close.assert_not_called()
+        self.pool.release.assert_called_once_with(self.connection)
+
+    async def test_abandoned_stream_closes_its_connection(self):
+        stream = async_streams.async_stream_users()
+        self.assertEqual(await stream.__anext__(), {'user_id': 1})
+        await stream.aclose()
+        self.connection.close.assert_called_once()
+        self.pool.release.assert_called_once_with(self.connection)
+
+
+if __name__ == "__main__":
+    unittest.main()
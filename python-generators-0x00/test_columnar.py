@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Unit tests for columnar.py, with and without NumPy"""
+
+import unittest
+from array import array
+from unittest.mock import patch
+from parameterized import parameterized
+import columnar
+from columnar import UserColumns, UserRow
+
+ROWS = [(f"id-{i}", f"user{i}", f"user{i}@example.com", age)
+        for i, age in enumerate([18, 25, 31, 47, 52])]
+
+BACKENDS = [('numpy', columnar.np), ('array', None)]
+
+
+class TestUserColumns(unittest.TestCase):
+    @parameterized.expand(BACKENDS)
+    def test_round_trips_rows(self, _, np):
+        with patch.object(columnar, 'np', np):
+            batch = UserColumns.from_rows(ROWS)
+            self.assertEqual(len(batch), 5)
+            self.assertEqual([tuple(row) for row in batch], ROWS)
+            self.assertEqual(batch.age_values(), [18, 25, 31, 47, 52])
+            if np is None:
+                self.assertIsInstance(batch.age, array)
+
+    @parameterized.expand([
+        (name, np, op, value, expected)
+        for name, np in BACKENDS
+        for op, value, expected in [('>', 30, ['id-2', 'id-3', 'id-4']),
+                                    ('=', 25, ['id-1']),
+                                    ('<', 0, [])]
+    ])
+    def test_where_age(self, _, np, op, value, expected):
+        with patch.object(columnar, 'np', np):
+            selected = UserColumns.from_rows(ROWS).where_age(op, value)
+            self.assertEqual(list(selected.user_id), expected)
+            self.assertEqual(selected.age_values(), [row[3] for row in ROWS if row[0] in expected])
+
+    def test_empty_batch(self):
+        batch = UserColumns.from_rows([])
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(list(batch), [])
+
+    def test_user_row_reads_like_a_dict_row(self):
+        row = UserRow(*ROWS[0])
+        self.assertEqual(row['age'], 18)
+        self.assertEqual(row.as_dict(), dict(zip(columnar.USER_DATA_COLUMNS, ROWS[0])))
+        self.assertEqual(row, UserRow(*ROWS[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Unit tests for 2-lazy_paginate.py"""
+
+import importlib
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from parameterized import parameterized
+
+paginate = importlib.import_module('2-lazy_paginate')
+
+USERS = [{'user_id': f"id-{i:02d}", 'age': 20 + i} for i in range(23)]
+
+
+class FakeTable:
+    """Stands in for paginate_users / seek_users and counts the queries"""
+
+    def __init__(self, fail_at=None):
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def _count(self):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise ConnectionError("lost connection")
+
+    def paginate_users(self, page_size, offset):
+        self._count()
+        return USERS[offset:offset + page_size]
+
+    def seek_users(self, page_size, after=None, key_column='user_id'):
+        self._count()
+        rows = [row for row in USERS if after is None or row['user_id'] > after[0]]
+        return rows[:page_size]
+
+
+def producers():
+    return [t for t in threading.enumerate() if t.name == "lazy-pagination-prefetch"]
+
+
+class TestLazyPagination(unittest.TestCase):
+    def setUp(self):
+        self.table = FakeTable()
+        for name in ('paginate_users', 'seek_users'):
+            patcher = patch.object(paginate, name, getattr(self.table, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @parameterized.expand([
+        (False, 0),
+        (False, 1),
+        (True, 0),
+        (True, 3),
+    ])
+    def test_pages_match_the_table(self, keyset, prefetch):
+        pages = list(paginate.lazy_pagination(5, keyset=keyset, prefetch=prefetch))
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertEqual([row for page in pages for row in page], USERS)
+
+    def test_prefetch_is_bounded_by_its_depth(self):
+        stats = paginate.PrefetchStats()
+        pages = paginate.lazy_pagination(2, prefetch=2, stats=stats)
+        next(pages)
+        time.sleep(0.3)
+        # Two pages waiting in the queue plus one the producer is holding
+        self.assertLessEqual(self.table.calls, 4)
+        pages.close()
+        self.assertEqual(stats.pages, 1)
+
+    def test_closing_early_stops_the_producer(self):
+        pages = paginate.lazy_pagination(1, prefetch=1)
+        next(pages)
+        pages.close()
+        self.assertEqual(producers(), [])
+        calls = self.table.calls
+        time.sleep(0.2)
+        self.assertEqual(self.table.calls, calls)
+
+    def test_producer_error_reaches_the_consumer(self):
+        self.table.fail_at = 3
+        pages = paginate.lazy_pagination(5, prefetch=2)
+        self.assertEqual(len(next(pages)), 5)
+        self.assertEqual(len(next(pages)), 5)
+        with self.assertRaises(ConnectionError):
+            next(pages)
+        self.assertEqual(producers(), [])
+
+    def test_stats_count_every_page(self):
+        stats = paginate.PrefetchStats()
+        list(paginate.lazy_pagination(5, prefetch=2, stats=stats))
+        self.assertEqual(stats.pages, 5)
+        self.assertLessEqual(stats.max_depth, 2)
+        self.assertGreaterEqual(stats.as_dict()['mean_depth'], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Unit tests for parallel_scan.py"""
+
+import time
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+from parameterized import parameterized
+import parallel_scan
+from parallel_scan import _combine, _partial_aggregates, _run_shards, shard_ranges
+from query_spec import AgeBucket, QuerySpec
+
+AGES = {f"id-{i:02d}": 18 + i * 3 % 40 for i in range(20)}
+
+
+def slow_square(shard, delay):
+    """Worker used by the _run_shards tests; the first shard finishes last"""
+    time.sleep(delay if shard == 0 else 0)
+    return shard * shard
+
+
+def fail_on_two(shard):
+    if shard == 2:
+        raise ValueError(shard)
+    return shard
+
+
+def serial_shards(func, shards, args, workers, ordered, max_pending=None):
+    """In-process stand-in for _run_shards"""
+    for shard in shards:
+        yield func(shard, *args)
+
+
+def fake_aggregate_shard(shard, spec):
+    """Runs the partial aggregates of one shard over AGES in Python"""
+    after, upto = shard
+    ages = [age for key, age in AGES.items()
+            if (after is None or key > after) and (upto is None or key <= upto)
+            and all(item(dict(age=age)) for item in spec.filters)]
+    groups = {}
+    for age in ages:
+        key = spec.group_by(dict(age=age)) if spec.group_by is not None else None
+        groups.setdefault(key, []).append(age)
+    rows = []
+    for key, values in groups.items():
+        row = {'age_bucket': key} if key is not None else {}
+        for func, column in spec.aggregates:
+            name = func if column == '*' else f"{func}_{column}"
+            row[name] = {'sum': sum, 'count': len, 'min': min, 'max': max}[func](values)
+        rows.append(row)
+    return rows
+
+
+class TestShardRanges(unittest.TestCase):
+    def test_walks_the_key_index(self):
+        cursor = MagicMock()
+        cursor.fetchone.side_effect = [('id-04',), ('id-09',), None]
+        connection = MagicMock()
+        connection.cursor.return_value = cursor
+
+        @contextmanager
+        def pooled_connection():
+            yield connection
+
+        with patch.object(parallel_scan, 'pooled_connection', pooled_connection):
+            ranges = shard_ranges(5, QuerySpec(filters=[('age', '>', 20)]))
+        self.assertEqual(ranges, [(None, 'id-04'), ('id-04', 'id-09'), ('id-09', None)])
+        query, params = cursor.execute.call_args_list[1][0]
+        self.assertEqual(query, "SELECT user_id FROM user_data WHERE age > %s AND (user_id > %s) "
+                                "ORDER BY user_id LIMIT 1 OFFSET %s")
+        self.assertEqual(params, (20, 'id-04', 4))
+
+
+class TestRunShards(unittest.TestCase):
+    @parameterized.expand([
+        (True, [0, 1, 4, 9, 16, 25]),
+        (False, [1, 4, 9, 16, 25, 0]),
+    ])
+    def test_result_order(self, ordered, expected):
+        results = list(_run_shards(slow_square, range(6), (0.5,), 2, ordered, max_pending=6))
+        self.assertEqual(results, expected)
+
+    @parameterized.expand([(True,), (False,)])
+    def test_window_bounds_the_shards_taken(self, ordered):
+        taken = []
+
+        def shards():
+            for shard in range(10):
+                taken.append(shard)
+                yield shard
+
+        results = _run_shards(slow_square, shards(), (0,), 1, ordered, max_pending=2)
+        next(results)
+        self.assertLessEqual(len(taken), 3)
+        results.close()
+        self.assertLessEqual(len(taken), 3)
+
+    def test_worker_error_propagates(self):
+        with self.assertRaises(ValueError):
+            list(_run_shards(fail_on_two, range(5), (), 2, True))
+
+
+class TestParallelAggregate(unittest.TestCase):
+    def test_avg_is_split_into_sum_and_count(self):
+        self.assertEqual(_partial_aggregates([('avg', 'age'), ('count', 'age'), ('max', 'age')]),
+                         [('sum', 'age'), ('count', 'age'), ('max', 'age')])
+
+    @parameterized.expand([
+        ('count', 2, 3, 5),
+        ('sum', None, 3, 3),
+        ('min', 4, 2, 2),
+        ('max', 4, None, 4),
+    ])
+    def test_combine(self, func, left, right, expected):
+        self.assertEqual(_combine(func, left, right), expected)
+
+    @parameterized.expand([
+        (None,),
+        (AgeBucket(10),),
+    ])
+    def test_matches_a_single_pass(self, group_by):
+        spec = QuerySpec(filters=[('age', '>', 20)], group_by=group_by,
+                         aggregates=[('avg', 'age'), ('count', '*'), ('min', 'age')])
+        ranges = [(None, 'id-05'), ('id-05', 'id-13'), ('id-13', None)]
+        with patch.object(parallel_scan, 'shard_ranges', return_value=ranges), \
+                patch.object(parallel_scan, '_run_shards', serial_shards), \
+                patch.object(parallel_scan, '_aggregate_shard', fake_aggregate_shard):
+            result = parallel_scan.parallel_aggregate(spec)
+
+        ages = [age for age in AGES.values() if age > 20]
+        groups = {}
+        for age in ages:
+            groups.setdefault(group_by(dict(age=age)) if group_by else None, []).append(age)
+        expected = [dict({'age_bucket': key} if group_by else {}, avg_age=sum(v) / len(v),
+                         count=len(v), min_age=min(v))
+                    for key, v in sorted(groups.items(), key=lambda item: (item[0] is None, item[0]))]
+        self.assertEqual(result, expected if group_by else expected[0])
+
+    def test_rejects_residual_predicates(self):
+        with self.assertRaises(ValueError):
+            parallel_scan.parallel_aggregate(QuerySpec(filters=[len], aggregates=[('count', '*')]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Unit tests for query_spec.py"""
+
+import unittest
+from contextlib import contextmanager
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+from parameterized import parameterized
+import query_spec
+from query_spec import AgeBucket, Filter, QuerySpec, aggregate, stream_batches
+
+ROWS = [
+    {'user_id': f"id-{i}", 'name': f"user{i}", 'email': f"user{i}@example.com", 'age': age}
+    for i, age in enumerate([18, 25, 31, 47, 52, 25, 39])
+]
+
+
+def serve(rows):
+    """Patches pooled_connection with a connection whose cursor returns rows"""
+    cursor = MagicMock()
+    remaining = list(rows)
+
+    def fetchmany(size):
+        batch = remaining[:size]
+        del remaining[:size]
+        return batch
+
+    cursor.fetchmany.side_effect = fetchmany
+    cursor.fetchall.side_effect = lambda: fetchmany(len(remaining))
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+
+    @contextmanager
+    def pooled_connection():
+        yield connection
+
+    return patch.object(query_spec, 'pooled_connection', pooled_connection), cursor
+
+
+class TestFilter(unittest.TestCase):
+    @parameterized.expand([
+        (('age', '>', 30), "age > %s", (30,)),
+        (('name', 'in', ['a', 'b']), "name IN (%s, %s)", ('a', 'b')),
+        (('name', 'in', []), "1 = 0", ()),
+        (('age', 'between', (20, 40)), "age BETWEEN %s AND %s", (20, 40)),
+    ])
+    def test_to_sql(self, args, sql, params):
+        self.assertEqual(Filter(*args).to_sql(), (sql, params))
+
+    @parameterized.expand([
+        (('age', '>', 30), False),
+        (('age', 'between', (20, 30)), True),
+        (('name', 'in', ['user1']), True),
+        (('name', 'in', []), False),
+    ])
+    def test_call_matches_the_sql(self, args, expected):
+        self.assertEqual(Filter(*args)(ROWS[1]), expected)
+
+    @parameterized.expand([
+        (('password', '=', 'x'),),
+        (('age', 'like', '%'),),
+    ])
+    def test_rejects_unknown_columns_and_operators(self, args):
+        with self.assertRaises(ValueError):
+            Filter(*args)
+
+
+class TestQuerySpec(unittest.TestCase):
+    def test_pushdown_compiles_grouped_aggregates(self):
+        spec = QuerySpec(filters=[('age', '>=', 18)], aggregates=[('avg', 'age'), ('count', '*')],
+                         group_by=AgeBucket(10))
+        query, params = spec.compile()
+        self.assertEqual(query, "SELECT FLOOR(age / 10) * 10 AS age_bucket, AVG(age) AS avg_age, "
+                                "COUNT(*) AS count FROM user_data WHERE age >= %s "
+                                "GROUP BY FLOOR(age / 10) * 10 ORDER BY FLOOR(age / 10) * 10")
+        self.assertEqual(params, (18,))
+
+    def test_residual_predicates_select_every_column(self):
+        spec = QuerySpec(columns=['name'], filters=[('age', '>', 20), lambda row: True],
+                         aggregates=[('max', 'age')])
+        self.assertFalse(spec.pushdown)
+        query, params = spec.compile(extra_where=[("user_id > %s", ('id-3',))], order_by='user_id')
+        self.assertEqual(query, "SELECT user_id, name, email, age FROM user_data "
+                                "WHERE age > %s AND (user_id > %s) ORDER BY user_id")
+        self.assertEqual(params, (20, 'id-3'))
+
+    @parameterized.expand([
+        ({'aggregates': [('median', 'age')]},),
+        ({'columns': ['secret']},),
+        ({'group_by': 'secret'},),
+    ])
+    def test_rejects_invalid_specs(self, kwargs):
+        with self.assertRaises(ValueError):
+            QuerySpec(**kwargs)
+
+
+class TestScans(unittest.TestCase):
+    def test_stream_batches_applies_residuals_and_projection(self):
+        spec = QuerySpec(columns=['name'], filters=[lambda row: row['age'] % 2 == 1])
+        patcher, _ = serve(ROWS)
+        with patcher:
+            batches = list(stream_batches(spec, batch_size=3))
+        self.assertEqual(batches, [[{'name': 'user1'}, {'name': 'user2'}],
+                                   [{'name': 'user3'}, {'name': 'user5'}],
+                                   [{'name': 'user6'}]])
+
+    def test_pushdown_aggregate_converts_decimals(self):
+        spec = QuerySpec(aggregates=[('avg', 'age'), ('sum', 'age')])
+        patcher, cursor = serve([{'avg_age': Decimal('33.0000'), 'sum_age': Decimal('237')}])
+        with patcher:
+            result = aggregate(spec)
+        self.assertEqual(result, {'avg_age': 33.0, 'sum_age': 237})
+        self.assertIsInstance(result['avg_age'], float)
+        self.assertIsInstance(result['sum_age'], int)
+        cursor.fetchmany.assert_not_called()
+
+    def test_python_fallback_matches_the_sql_aggregates(self):
+        spec = QuerySpec(filters=[lambda row: row['age'] >= 25],
+                         aggregates=[('count', '*'), ('avg', 'age'), ('min', 'age'), ('max', 'age')],
+                         group_by=AgeBucket(20))
+        patcher, _ = serve(ROWS)
+        with patcher:
+            result = aggregate(spec, batch_size=2)
+        self.assertEqual(result, [
+            {'age_bucket': 20, 'count': 4, 'avg_age': 30.0, 'min_age': 25, 'max_age': 39},
+            {'age_bucket': 40, 'count': 2, 'avg_age': 49.5, 'min_age': 47, 'max_age': 52},
+        ])
+
+    def test_python_fallback_without_rows(self):
+        spec = QuerySpec(filters=[lambda row: False], aggregates=[('count', '*'), ('avg', 'age')])
+        patcher, _ = serve(ROWS)
+        with patcher:
+            self.assertEqual(aggregate(spec), {'count': 0, 'avg_age': None})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Unit tests for the ConnectionPool, CSV loading and resumable streams in seed.py"""
+
+import os
+import tempfile
+import threading
+import unittest
+from itertools import islice
+from unittest.mock import MagicMock, patch
+from mysql.connector import Error
+from parameterized import parameterized
+import seed
+from seed import ConnectionPool, PoolTimeoutError
+
+
+def fake_connection():
+    connection = MagicMock()
+    connection.unread_result = False
+    connection.is_connected.return_value = True
+    return connection
+
+
+class TestConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+        def connect():
+            connection = fake_connection()
+            self.opened.append(connection)
+            return connection
+
+        self.pool = ConnectionPool(max_size=2, checkout_timeout=0.05, connect=connect)
+
+    def test_released_connection_is_reused(self):
+        first = self.pool.acquire()
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+        first.rollback.assert_called_once()
+        self.assertEqual(self.pool.stats()['created'], 1)
+
+    def test_checkout_times_out_when_full(self):
+        self.pool.acquire()
+        self.pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            self.pool.acquire()
+        self.assertEqual(self.pool.stats()['timeouts'], 1)
+
+    def test_waiter_gets_the_released_connection(self):
+        held = [self.pool.acquire(), self.pool.acquire()]
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self.pool.acquire(timeout=5)))
+        waiter.start()
+        self.pool.release(held[0])
+        waiter.join(5)
+        self.assertEqual(got, [held[0]])
+        self.assertEqual(self.pool.stats()['waits'], 1)
+
+    def test_connection_with_unread_result_is_dropped_not_drained(self):
+        connection = self.pool.acquire()
+        connection.unread_result = True
+        self.pool.release(connection)
+        connection.consume_results.assert_not_called()
+        connection.shutdown.assert_called_once()
+        self.assertEqual(self.pool.stats()['size'], 0)
+        self.assertIsNot(self.pool.acquire(), connection)
+
+    def test_failed_rollback_discards_the_connection(self):
+        connection = self.pool.acquire()
+        connection.rollback.side_effect = Error("gone")
+        self.pool.release(connection)
+        connection.close.assert_called_once()
+        stats = self.pool.stats()
+        self.assertEqual((stats['size'], stats['idle']), (0, 0))
+
+    def test_unhealthy_idle_connection_is_replaced(self):
+        connection = self.pool.acquire()
+        self.pool.release(connection)
+        connection.is_connected.return_value = False
+        self.assertIsNot(self.pool.acquire(), connection)
+        self.assertEqual(self.pool.stats()['unhealthy'], 1)
+
+    def test_failed_connect_frees_the_slot(self):
+        pool = ConnectionPool(max_size=1, connect=MagicMock(side_effect=Error("refused")))
+        for _ in range(2):
+            with self.assertRaises(Error):
+                pool.acquire(timeout=0.05)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class TestPooledConnection(unittest.TestCase):
+    def test_timeout_propagates(self):
+        pool = MagicMock()
+        pool.acquire.side_effect = PoolTimeoutError("busy")
+        with patch.object(seed, 'get_pool', return_value=pool):
+            with self.assertRaises(PoolTimeoutError):
+                with seed.pooled_connection():
+                    pass
+
+    @patch('builtins.print')
+    def test_connect_error_yields_none(self, _):
+        pool = MagicMock()
+        pool.acquire.side_effect = Error("refused")
+        with patch.object(seed, 'get_pool', return_value=pool):
+            with seed.pooled_connection() as connection:
+                self.assertIsNone(connection)
+
+
+class FakeTable:
+    """user_data stand-in: a mock connection whose INSERT IGNOREs land in a dict"""
+
+    def __init__(self):
+        self.rows = {}
+        self.connection = MagicMock()
+        cursor = self.connection.cursor.return_value
+        cursor.execute.side_effect = self.execute
+        cursor.fetchone.side_effect = lambda: (len(self.rows),)
+
+    def execute(self, query, params=()):
+        if query.startswith("INSERT IGNORE"):
+            for i in range(0, len(params), 4):
+                self.rows.setdefault(params[i], tuple(params[i:i + 4]))
+
+
+@patch('builtins.print')
+class TestInsertData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp.name, 'user_data.csv')
+        with open(self.csv_path, 'w') as file:
+            file.write("user_id,name,email,age\n")
+            for i in range(10):
+                file.write(f"id-{i},user{i},user{i}@example.com,{20 + i}\n")
+        self.checkpoint = f"{self.csv_path}.checkpoint"
+        self.table = FakeTable()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_loads_every_row_and_removes_the_checkpoint(self, _):
+        self.assertEqual(seed.insert_data(self.table.connection, self.csv_path, batch_size=3), 10)
+        self.assertEqual(len(self.table.rows), 10)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_existing_data_without_checkpoint_is_skipped(self, _):
+        self.table.rows['id-0'] = ('id-0', 'user0', 'user0@example.com', 20)
+        self.assertEqual(seed.insert_data(self.table.connection, self.csv_path), 0)
+        self.assertEqual(len(self.table.rows), 1)
+
+    def test_crash_before_the_first_checkpoint_resumes(self, _):
+        # Dies after the first batch COMMIT, before its checkpoint is written
+        writes = []
+
+        def write_checkpoint(path, value):
+            if value:
+                raise KeyboardInterrupt
+            writes.append(value)
+            real_write(path, value)
+
+        real_write = seed._write_checkpoint
+        with patch.object(seed, '_write_checkpoint', write_checkpoint):
+            with self.assertRaises(KeyboardInterrupt):
+                seed.insert_data(self.table.connection, self.csv_path, batch_size=3)
+        self.assertEqual(writes, [0])
+        self.assertEqual(len(self.table.rows), 3)
+
+        self.assertEqual(seed.insert_data(self.table.connection, self.csv_path, batch_size=3), 10)
+        self.assertEqual(len(self.table.rows), 10)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resumes_after_the_checkpoint(self, _):
+        seed._write_checkpoint(self.checkpoint, 6)
+        self.assertEqual(seed.insert_data(self.table.connection, self.csv_path, batch_size=3), 4)
+        self.assertEqual(sorted(self.table.rows), [f"id-{i}" for i in range(6, 10)])
+
+
+class KeysetTable:
+    """Connection whose cursor answers keyset_page_query over sorted user rows"""
+
+    def __init__(self, count=23):
+        self.rows = [(f"id-{i:02d}", f"user{i}", f"user{i}@example.com", 20 + i)
+                     for i in range(count)]
+        self.queries = 0
+        self.connection = MagicMock()
+        cursor = self.connection.cursor.return_value
+        cursor.execute.side_effect = self.execute
+        cursor.fetchall.side_effect = lambda: self.page
+
+    def execute(self, query, params):
+        self.queries += 1
+        after = params[0] if "WHERE" in query else None
+        self.page = [row for row in self.rows if after is None or row[0] > after][:params[-1]]
+
+
+class TestResumeTokens(unittest.TestCase):
+    @parameterized.expand([
+        (None, 0, 'user_id'),
+        (('id-07',), 3, 'user_id'),
+        ((31, 'id-11'), 12, 'age'),
+    ])
+    def test_round_trip(self, after, batch, key_column):
+        token = seed.encode_resume_token(after, batch, key_column)
+        self.assertEqual(seed.decode_resume_token(token),
+                         {'key': key_column, 'after': after, 'batch': batch})
+
+    @parameterized.expand([('not a token',), ('e30=',), ('',)])
+    def test_invalid_token_raises_value_error(self, token):
+        with self.assertRaises(ValueError):
+            seed.decode_resume_token(token)
+
+    def test_token_for_another_key_is_rejected(self):
+        token = seed.encode_resume_token((30, 'id-10'), 1, 'age')
+        with self.assertRaises(ValueError):
+            seed.ResumableUserStream(MagicMock(), token=token)
+
+
+class TestResumableUserStream(unittest.TestCase):
+    def setUp(self):
+        self.table = KeysetTable()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.tmp.name, 'stream.checkpoint')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @parameterized.expand([(0,), (1,), (4,), (5,), (22,)])
+    def test_resuming_from_the_token_has_no_gaps_or_duplicates(self, stop_after):
+        stream = seed.ResumableUserStream(self.table.connection, batch_size=5)
+        first = list(islice(stream, stop_after))
+        rest = list(seed.ResumableUserStream(self.table.connection, batch_size=5,
+                                             token=stream.token))
+        self.assertEqual(first + rest, self.table.rows)
+
+    def test_checkpoint_resumes_an_interrupted_run(self):
+        rows = []
+        stream = seed.stream_users_generator(self.table.connection, batch_size=5,
+                                             checkpoint_path=self.checkpoint,
+                                             checkpoint_interval=2)
+        for row in stream:
+            rows.append(row)
+            if len(rows) == 13:
+                break
+        stream.close()
+        # Saved once the consumer moved past batch 2 (row 11)
+        token = seed.read_resume_checkpoint(self.checkpoint)
+        self.assertEqual(seed.decode_resume_token(token)['after'], ('id-09',))
+
+        rest = list(seed.stream_users_generator(self.table.connection, batch_size=5,
+                                                resume_token=token,
+                                                checkpoint_path=self.checkpoint))
+        self.assertEqual(rows[:10] + rest, self.table.rows)
+        final = seed.decode_resume_token(seed.read_resume_checkpoint(self.checkpoint))
+        self.assertEqual(final['after'], ('id-22',))
+
+
+if __name__ == "__main__":
+    unittest.main()
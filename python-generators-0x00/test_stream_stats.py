@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Unit tests for stream_stats.py, with and without NumPy"""
+
+import random
+import statistics
+import unittest
+from unittest.mock import patch
+from parameterized import parameterized
+import stream_stats
+from stream_stats import StreamingStats, TDigest
+
+BACKENDS = [('numpy', stream_stats.np), ('python', None)]
+
+
+def ages(count=5000, seed=7):
+    generator = random.Random(seed)
+    return [generator.randint(18, 90) for _ in range(count)]
+
+
+class TestStreamingStats(unittest.TestCase):
+    def assert_matches(self, stats, values):
+        self.assertEqual(stats.count, len(values))
+        self.assertAlmostEqual(stats.mean, statistics.fmean(values), places=9)
+        self.assertAlmostEqual(stats.variance, statistics.pvariance(values), places=6)
+        self.assertAlmostEqual(stats.sample_variance, statistics.variance(values), places=6)
+        self.assertEqual((stats.min, stats.max), (min(values), max(values)))
+        histogram = {}
+        for value in values:
+            histogram[value // 10 * 10] = histogram.get(value // 10 * 10, 0) + 1
+        self.assertEqual(stats.summary()['histogram'], dict(sorted(histogram.items())))
+
+    def test_update_one_by_one(self):
+        values = ages()
+        stats = StreamingStats()
+        for value in values:
+            stats.update(value)
+        self.assert_matches(stats, values)
+
+    @parameterized.expand(BACKENDS)
+    def test_update_in_batches(self, _, np):
+        values = ages()
+        stats = StreamingStats()
+        with patch.object(stream_stats, 'np', np):
+            for start in range(0, len(values), 700):
+                stats.update_batch(values[start:start + 700])
+            stats.update_batch([])
+        self.assert_matches(stats, values)
+
+    @parameterized.expand([(2,), (5,), (13,)])
+    def test_merged_shards_match_one_pass(self, shards):
+        values = ages()
+        parts = [StreamingStats() for _ in range(shards)]
+        for index, value in enumerate(values):
+            parts[index % shards].update(value)
+        merged = StreamingStats().merge(StreamingStats())
+        for part in parts:
+            merged.merge(part)
+        self.assert_matches(merged, values)
+
+    @parameterized.expand([(50,), (95,), (99,)])
+    def test_percentiles_are_close(self, p):
+        values = sorted(ages(20000))
+        stats = StreamingStats()
+        stats.update_batch(values)
+        exact = values[min(len(values) - 1, int(p / 100 * len(values)))]
+        self.assertLessEqual(abs(stats.percentile(p) - exact), 1.5)
+
+    def test_empty_summary(self):
+        summary = StreamingStats().summary()
+        self.assertEqual((summary['count'], summary['mean'], summary['variance']), (0, None, 0.0))
+
+
+class TestTDigest(unittest.TestCase):
+    def test_merge_keeps_the_quantiles(self):
+        left, right = TDigest(), TDigest()
+        left.update_batch(range(0, 5000))
+        right.update_batch(range(5000, 10000))
+        left.merge(right)
+        self.assertLess(abs(left.quantile(0.5) - 5000), 100)
+        self.assertLess(abs(left.quantile(0.99) - 9900), 50)
+
+
+if __name__ == "__main__":
+    unittest.main()